@@ -0,0 +1,28 @@
+"""
+Move requests that have been Closed for a while from the hot tables into archive.db.
+
+Run with: python -m app.archive_requests
+The age defaults to ARCHIVE_AFTER_DAYS (365); override with --older-than-days.
+Archived requests stay readable via GET /requests/{id} and
+GET /requests/export?include_archived=true.
+"""
+import argparse
+from datetime import timedelta
+
+from .seed_commodity_groups import init_db
+from .services.archive import ARCHIVE_AFTER, ARCHIVE_BATCH_SIZE, archive_closed_requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--older-than-days", type=int, default=ARCHIVE_AFTER.days)
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+    args = parser.parse_args()
+
+    init_db()
+    moved = archive_closed_requests(timedelta(days=args.older_than_days), args.batch_size)
+    print(f"Archived {moved} requests closed more than {args.older_than_days} days ago.")
+
+
+if __name__ == "__main__":
+    main()
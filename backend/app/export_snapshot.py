@@ -0,0 +1,33 @@
+"""
+Write a columnar snapshot of procurement_requests, order_lines and status_events.
+
+Run with: python -m app.export_snapshot --out snapshots --format parquet [--incremental]
+Each run creates snapshots/<timestamp>/ with one file per table plus manifest.json.
+"""
+import argparse
+from pathlib import Path
+
+from .seed_commodity_groups import init_db
+from .services import snapshot
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", default="snapshots", help="output directory (default: snapshots)")
+    parser.add_argument("--format", choices=sorted(snapshot.SNAPSHOT_FORMATS), default="parquet")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="only export rows changed since the previous snapshot in --out",
+    )
+    args = parser.parse_args()
+
+    init_db()
+    manifest = snapshot.write_snapshot(Path(args.out), fmt=args.format, incremental=args.incremental)
+    for table_name, info in manifest["tables"].items():
+        print(f"{table_name}: {info['rows']} rows -> {info['file']}")
+    print(f"Snapshot watermark: {manifest['watermark']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+"""
+Remove offer files in uploads/ that no attachment references any more.
+
+Run with: python -m app.gc_uploads
+Pass --dry-run to only list the files, --min-age to change the grace period (seconds).
+"""
+import argparse
+
+from .db import SessionLocal
+from .services.uploads import UPLOAD_DIR, UPLOAD_GC_MIN_AGE, collect_garbage
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="list orphaned files without deleting them")
+    parser.add_argument("--min-age", type=float, default=UPLOAD_GC_MIN_AGE, help="keep files younger than this")
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        removed = collect_garbage(db, UPLOAD_DIR, args.min_age, dry_run=args.dry_run)
+    for path in removed:
+        print(path)
+    verb = "Would remove" if args.dry_run else "Removed"
+    print(f"{verb} {len(removed)} orphaned files.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,15 @@
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
+from fastapi.responses import PlainTextResponse
 
 from .seed_commodity_groups import init_db
-from .routers import requests, commodity_groups, chat
+from .routers import requests, commodity_groups, chat, analytics
+from .db import archive_engine, engine
+from .services import metrics, query_stats
+from .services.uploads import UPLOAD_GC_INTERVAL, UploadSweeper
 
 from fastapi.middleware.cors import CORSMiddleware
 
-app = FastAPI(title="askLio Procurement Requests")
+app = FastAPI(title="askLio Procurement Requests", dependencies=[Depends(metrics.track_in_flight)])
 
 app.add_middleware(
     CORSMiddleware,
@@ -13,13 +17,39 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-DB-Query-Count", "X-DB-Time-Ms"],
 )
 
+query_stats.instrument(engine)
+query_stats.instrument(archive_engine)
+app.add_middleware(query_stats.QueryStatsMiddleware)
+query_stats.add_observer(metrics.observe_db)
+app.add_middleware(metrics.MetricsMiddleware)
+
+
+upload_sweeper = UploadSweeper(UPLOAD_GC_INTERVAL) if UPLOAD_GC_INTERVAL > 0 else None
+
 
 @app.on_event("startup")
 def on_startup():
     init_db()
+    if upload_sweeper:
+        upload_sweeper.start()
+
+
+@app.on_event("shutdown")
+def on_shutdown():
+    if upload_sweeper:
+        upload_sweeper.stop()
+
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """Prometheus scrape endpoint (text exposition format) for this process."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 
 app.include_router(requests.router)
 app.include_router(commodity_groups.router)
 app.include_router(chat.router)
+app.include_router(analytics.router)
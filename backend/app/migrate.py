@@ -0,0 +1,227 @@
+"""
+Versioned schema migrations and fast-path startup.
+
+``schema_version`` holds a single row: the number of applied migrations, a
+checksum of the mapped tables and columns, and a checksum of the seed data.
+``init_db`` (called on every worker start) reads that row and returns when all
+three match, so a current database costs one indexed SELECT. Otherwise it:
+
+- creates a fresh database from the models and stamps it as current, or
+- applies the pending ``MIGRATIONS`` in order (recording each one), then
+  creates tables that are new in the models (filling new rollup tables from
+  the existing requests) and seeds commodity groups with a single INSERT OR
+  IGNORE.
+
+Upgrades are serialized across processes (several workers may boot on an old
+database at once): the first one takes ``migration_lock``, the others wait and
+find the database current when they get it.
+
+Databases created before this runner (no ``schema_version``) start at version
+0; every migration checks the schema before changing it, so replaying them is
+safe. Any change to existing columns needs a new entry in ``MIGRATIONS``; new
+tables are picked up by the schema checksum.
+
+Run with: python -m app.migrate   (--status to only print the state)
+"""
+import argparse
+import hashlib
+import os
+import sqlite3
+from contextlib import contextmanager
+
+from sqlalchemy.orm import Session
+
+from .db import Base, engine
+from . import models  # noqa: F401  (registers the tables on Base.metadata)
+from . import (
+    migrate_add_fk_cascade,
+    migrate_add_product_field,
+    migrate_add_status_metrics,
+    migrate_add_updated_at,
+    migrate_add_version,
+    migrate_autoincrement_ids,
+    migrate_money_to_cents,
+)
+from .seed_commodity_groups import COMMODITY_GROUPS
+from .services import rollups, status_metrics
+
+# (version, name, apply(sqlite3 connection in autocommit mode)); append only
+MIGRATIONS = [
+    (1, "add_product_field", migrate_add_product_field.apply),
+    (2, "money_to_cents", migrate_money_to_cents.apply),
+    (3, "add_status_metrics", migrate_add_status_metrics.apply),
+    (4, "add_updated_at", migrate_add_updated_at.apply),
+    (5, "add_version", migrate_add_version.apply),
+    (6, "add_fk_cascade", migrate_add_fk_cascade.apply),
+    (7, "autoincrement_ids", migrate_autoincrement_ids.apply),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+MIGRATION_LOCK_TIMEOUT = float(os.getenv("MIGRATION_LOCK_TIMEOUT", "600"))  # seconds to wait for another upgrade
+
+CREATE_VERSION_TABLE = """
+CREATE TABLE IF NOT EXISTS schema_version (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL,
+    schema_checksum VARCHAR(64) NOT NULL,
+    seed_checksum VARCHAR(64) NOT NULL,
+    updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+
+def _checksum(items) -> str:
+    return hashlib.sha256(repr(list(items)).encode("utf-8")).hexdigest()
+
+
+def schema_checksum() -> str:
+    return _checksum(
+        (table.name, [column.name for column in table.columns]) for table in Base.metadata.sorted_tables
+    )
+
+
+def seed_checksum() -> str:
+    return _checksum(COMMODITY_GROUPS)
+
+
+def _connect() -> sqlite3.Connection:
+    return sqlite3.connect(engine.url.database, isolation_level=None)
+
+
+@contextmanager
+def migration_lock(timeout: float = MIGRATION_LOCK_TIMEOUT):
+    """
+    Hold the cross-process migration lock: an exclusive transaction on a small
+    SQLite file next to the database. The database itself can't be locked,
+    because the migrations run their own transactions on it.
+    """
+    lock = sqlite3.connect(f"{engine.url.database}.migrate-lock", timeout=timeout, isolation_level=None)
+    try:
+        lock.execute("BEGIN EXCLUSIVE")
+        yield
+    finally:
+        lock.close()  # rolls back, releasing the lock
+
+
+def read_state(conn: sqlite3.Connection):
+    """(version, schema_checksum, seed_checksum), or None if the database has never been stamped."""
+    try:
+        return conn.execute(
+            "SELECT version, schema_checksum, seed_checksum FROM schema_version WHERE id = 1"
+        ).fetchone()
+    except sqlite3.OperationalError:
+        return None
+
+
+def is_current(state) -> bool:
+    return state is not None and tuple(state) == (SCHEMA_VERSION, schema_checksum(), seed_checksum())
+
+
+def _stamp(conn: sqlite3.Connection, version: int, schema: str = "", seed: str = "") -> None:
+    conn.execute(CREATE_VERSION_TABLE)
+    conn.execute(
+        """
+        INSERT INTO schema_version (id, version, schema_checksum, seed_checksum, updated_at)
+        VALUES (1, ?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT (id) DO UPDATE SET
+            version = excluded.version,
+            schema_checksum = excluded.schema_checksum,
+            seed_checksum = excluded.seed_checksum,
+            updated_at = excluded.updated_at
+        """,
+        (version, schema, seed),
+    )
+
+
+def _has_table(conn: sqlite3.Connection, name: str) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).fetchone() is not None
+
+
+def seed(conn: sqlite3.Connection) -> None:
+    conn.execute("BEGIN")
+    conn.executemany("INSERT OR IGNORE INTO commodity_groups (id, category, name) VALUES (?, ?, ?)", COMMODITY_GROUPS)
+    conn.execute("COMMIT")
+
+
+# rollup tables (services.rollups, services.status_metrics) and the rebuild that fills them
+ROLLUP_TABLES = {
+    "spend_rollups": rollups.rebuild,
+    "status_counts": rollups.rebuild,
+    "status_duration_buckets": status_metrics.rebuild,
+    "status_throughput": status_metrics.rebuild,
+}
+
+
+def backfill(conn: sqlite3.Connection, created: set) -> None:
+    """Fill rollup tables that were just created on a database that already has requests."""
+    rebuilds = list(dict.fromkeys(rebuild for name, rebuild in ROLLUP_TABLES.items() if name in created))
+    if not rebuilds or conn.execute("SELECT 1 FROM procurement_requests LIMIT 1").fetchone() is None:
+        return
+    with Session(bind=engine) as db:
+        for rebuild in rebuilds:
+            rebuild(db)
+        db.commit()
+
+
+def upgrade(conn: sqlite3.Connection) -> list:
+    """Apply pending migrations, create new tables and seed. Returns the names of the applied migrations."""
+    state = read_state(conn)
+    applied = []
+    if state is None and not _has_table(conn, "procurement_requests"):
+        version = SCHEMA_VERSION  # fresh database: the models are the current schema
+    else:
+        version = state[0] if state else 0
+        for migration_version, name, apply in MIGRATIONS:
+            if migration_version <= version:
+                continue
+            apply(conn)
+            _stamp(conn, migration_version)  # checksums are filled in once everything is done
+            applied.append(name)
+            version = migration_version
+
+    missing = {table.name for table in Base.metadata.sorted_tables if not _has_table(conn, table.name)}
+    Base.metadata.create_all(bind=engine)
+    backfill(conn, missing)
+    seed(conn)
+    _stamp(conn, version, schema_checksum(), seed_checksum())
+    return applied
+
+
+def init_db() -> None:
+    """Bring the database to the current schema and seed data; one SELECT when it already is."""
+    conn = _connect()
+    try:
+        if is_current(read_state(conn)):
+            return
+        with migration_lock():
+            if not is_current(read_state(conn)):  # another worker may have upgraded it while we waited
+                upgrade(conn)
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--status", action="store_true", help="print the schema version without migrating")
+    args = parser.parse_args()
+
+    conn = _connect()
+    try:
+        state = read_state(conn)
+        current = state[0] if state else 0
+        if args.status:
+            print(f"Schema version {current} of {SCHEMA_VERSION}; {'up to date' if is_current(state) else 'pending'}.")
+            for version, name, _ in MIGRATIONS:
+                print(f"  {version:>3} {name}: {'applied' if version <= current else 'pending'}")
+            return
+        with migration_lock():
+            applied = upgrade(conn)
+    finally:
+        conn.close()
+    print(f"Applied {len(applied)} migrations: {', '.join(applied)}" if applied else "No pending migrations.")
+    print(f"Schema is at version {SCHEMA_VERSION}.")
+
+
+if __name__ == "__main__":
+    main()
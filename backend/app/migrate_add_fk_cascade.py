@@ -0,0 +1,76 @@
+"""
+Migration script to add ON DELETE CASCADE to the foreign keys of order_lines,
+attachments and status_events.
+
+SQLite cannot alter constraints, so each table is rebuilt (create new table,
+copy rows, drop, rename) inside one transaction. Rows orphaned by earlier bulk
+deletes are dropped on the way.
+Applied by `python -m app.migrate`; can still be run on its own.
+"""
+import sqlite3
+from pathlib import Path
+
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from .db import engine
+from . import models
+
+CHILD_TABLES = [models.OrderLine.__table__, models.Attachment.__table__, models.StatusEvent.__table__]
+
+
+def has_cascade(cursor, table_name: str) -> bool:
+    cursor.execute(f"PRAGMA foreign_key_list({table_name})")
+    return any(fk[2] == "procurement_requests" and fk[6] == "CASCADE" for fk in cursor.fetchall())
+
+
+def apply(conn):
+    """``conn`` must be in autocommit mode (isolation_level=None); tables are swapped in explicit transactions."""
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA foreign_keys=OFF")  # must be off while tables are swapped
+
+    for table in CHILD_TABLES:
+        if has_cascade(cursor, table.name):
+            print(f"Table '{table.name}' already cascades deletes. Skipping.")
+            continue
+
+        print(f"Rebuilding '{table.name}' with ON DELETE CASCADE...")
+        columns = ", ".join(column.name for column in table.columns)
+        create_sql = str(CreateTable(table).compile(engine)).replace(
+            f"CREATE TABLE {table.name}", f"CREATE TABLE {table.name}_new", 1
+        )
+        cursor.execute("BEGIN")
+        orphans = cursor.execute(
+            f"DELETE FROM {table.name} WHERE request_id NOT IN (SELECT id FROM procurement_requests)"
+        ).rowcount
+        cursor.execute(create_sql)
+        cursor.execute(f"INSERT INTO {table.name}_new ({columns}) SELECT {columns} FROM {table.name}")
+        cursor.execute(f"DROP TABLE {table.name}")
+        cursor.execute(f"ALTER TABLE {table.name}_new RENAME TO {table.name}")
+        for index in table.indexes:
+            cursor.execute(str(CreateIndex(index).compile(engine)).replace("CREATE INDEX", "CREATE INDEX IF NOT EXISTS", 1))
+        cursor.execute("COMMIT")
+        print(f"Rebuilt '{table.name}' ({orphans} orphaned rows removed).")
+
+    cursor.execute("PRAGMA foreign_key_check")
+    violations = cursor.fetchall()
+    if violations:
+        print(f"Warning: {len(violations)} foreign key violations remain.")
+
+
+def migrate():
+    db_path = Path(__file__).parent.parent / "local.db"
+
+    if not db_path.exists():
+        print(f"Database not found at {db_path}. Skipping migration.")
+        return
+
+    conn = sqlite3.connect(str(db_path), isolation_level=None)
+    try:
+        apply(conn)
+    finally:
+        conn.close()
+    print("Migration completed successfully.")
+
+
+if __name__ == "__main__":
+    migrate()
@@ -1,24 +1,18 @@
 """
 Migration script to add 'product' column to order_lines table.
-Run this once to update existing databases.
+Applied by `python -m app.migrate`; can still be run on its own.
 """
 import sqlite3
 from pathlib import Path
 
-def migrate():
-    db_path = Path(__file__).parent.parent / "local.db"
-    
-    if not db_path.exists():
-        print(f"Database not found at {db_path}. Skipping migration.")
-        return
-    
-    conn = sqlite3.connect(str(db_path))
+
+def apply(conn):
     cursor = conn.cursor()
-    
+
     # Check if column already exists
     cursor.execute("PRAGMA table_info(order_lines)")
     columns = [col[1] for col in cursor.fetchall()]
-    
+
     if "product" in columns:
         print("Column 'product' already exists in order_lines table. Skipping migration.")
     else:
@@ -26,8 +20,20 @@ def migrate():
         cursor.execute("ALTER TABLE order_lines ADD COLUMN product VARCHAR(250)")
         conn.commit()
         print("Migration completed successfully.")
+
+
+def migrate():
+    db_path = Path(__file__).parent.parent / "local.db"
     
-    conn.close()
+    if not db_path.exists():
+        print(f"Database not found at {db_path}. Skipping migration.")
+        return
+    
+    conn = sqlite3.connect(str(db_path))
+    try:
+        apply(conn)
+    finally:
+        conn.close()
 
 if __name__ == "__main__":
     migrate()
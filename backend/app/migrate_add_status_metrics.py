@@ -0,0 +1,76 @@
+"""
+Migration script for status-duration metrics.
+
+- adds procurement_requests.status_changed_at, backfilled in batches from the
+  latest StatusEvent of each request
+- adds indexes on status_events(to_status, changed_at) and
+  procurement_requests(current_status, status_changed_at)
+
+The metric tables themselves are created by `python -m app.migrate` (or on
+startup), which also fills them from the existing history.
+Applied by `python -m app.migrate`; can still be run on its own.
+"""
+import sqlite3
+from pathlib import Path
+
+BATCH_SIZE = 1000
+
+
+def apply(conn):
+    cursor = conn.cursor()
+
+    cursor.execute("PRAGMA table_info(procurement_requests)")
+    columns = [col[1] for col in cursor.fetchall()]
+
+    if "status_changed_at" in columns:
+        print("Column 'status_changed_at' already exists in procurement_requests table. Skipping backfill.")
+    else:
+        print("Adding 'status_changed_at' column to procurement_requests table...")
+        cursor.execute("ALTER TABLE procurement_requests ADD COLUMN status_changed_at DATETIME")
+        conn.commit()
+
+        max_id = cursor.execute("SELECT COALESCE(MAX(id), 0) FROM procurement_requests").fetchone()[0]
+        for start in range(0, max_id, BATCH_SIZE):
+            cursor.execute(
+                """
+                UPDATE procurement_requests
+                SET status_changed_at = COALESCE(
+                    (SELECT MAX(changed_at) FROM status_events WHERE status_events.request_id = procurement_requests.id),
+                    created_at
+                )
+                WHERE id > ? AND id <= ?
+                """,
+                (start, start + BATCH_SIZE),
+            )
+            conn.commit()
+        print(f"Backfilled status_changed_at up to id {max_id}.")
+
+    print("Creating status metric indexes...")
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS ix_status_events_to_status_changed_at "
+        "ON status_events (to_status, changed_at)"
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS ix_procurement_requests_status_changed_at "
+        "ON procurement_requests (current_status, status_changed_at)"
+    )
+    conn.commit()
+
+
+def migrate():
+    db_path = Path(__file__).parent.parent / "local.db"
+
+    if not db_path.exists():
+        print(f"Database not found at {db_path}. Skipping migration.")
+        return
+
+    conn = sqlite3.connect(str(db_path))
+    try:
+        apply(conn)
+    finally:
+        conn.close()
+    print("Migration completed successfully. Run `python -m app.rebuild_rollups` to backfill the metrics.")
+
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,59 @@
+"""
+Migration script to add 'updated_at' to procurement_requests.
+
+The column is the watermark for incremental snapshots; existing rows are
+backfilled in batches from status_changed_at (or created_at).
+Applied by `python -m app.migrate`; can still be run on its own.
+"""
+import sqlite3
+from pathlib import Path
+
+BATCH_SIZE = 1000
+
+
+def apply(conn):
+    cursor = conn.cursor()
+
+    cursor.execute("PRAGMA table_info(procurement_requests)")
+    columns = [col[1] for col in cursor.fetchall()]
+
+    if "updated_at" in columns:
+        print("Column 'updated_at' already exists in procurement_requests table. Skipping migration.")
+    else:
+        print("Adding 'updated_at' column to procurement_requests table...")
+        cursor.execute("ALTER TABLE procurement_requests ADD COLUMN updated_at DATETIME")
+        conn.commit()
+
+        backfill = "COALESCE(status_changed_at, created_at)" if "status_changed_at" in columns else "created_at"
+        max_id = cursor.execute("SELECT COALESCE(MAX(id), 0) FROM procurement_requests").fetchone()[0]
+        for start in range(0, max_id, BATCH_SIZE):
+            cursor.execute(
+                f"UPDATE procurement_requests SET updated_at = {backfill} WHERE id > ? AND id <= ?",
+                (start, start + BATCH_SIZE),
+            )
+            conn.commit()
+        print(f"Backfilled updated_at up to id {max_id}.")
+
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS ix_procurement_requests_updated_at ON procurement_requests (updated_at)"
+    )
+    conn.commit()
+
+
+def migrate():
+    db_path = Path(__file__).parent.parent / "local.db"
+
+    if not db_path.exists():
+        print(f"Database not found at {db_path}. Skipping migration.")
+        return
+
+    conn = sqlite3.connect(str(db_path))
+    try:
+        apply(conn)
+    finally:
+        conn.close()
+    print("Migration completed successfully.")
+
+
+if __name__ == "__main__":
+    migrate()
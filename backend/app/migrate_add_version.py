@@ -0,0 +1,39 @@
+"""
+Migration script to add the optimistic-concurrency 'version' column to procurement_requests.
+Applied by `python -m app.migrate`; can still be run on its own.
+"""
+import sqlite3
+from pathlib import Path
+
+
+def apply(conn):
+    cursor = conn.cursor()
+
+    cursor.execute("PRAGMA table_info(procurement_requests)")
+    columns = [col[1] for col in cursor.fetchall()]
+
+    if "version" in columns:
+        print("Column 'version' already exists in procurement_requests table. Skipping migration.")
+    else:
+        print("Adding 'version' column to procurement_requests table...")
+        cursor.execute("ALTER TABLE procurement_requests ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+        conn.commit()
+        print("Migration completed successfully.")
+
+
+def migrate():
+    db_path = Path(__file__).parent.parent / "local.db"
+
+    if not db_path.exists():
+        print(f"Database not found at {db_path}. Skipping migration.")
+        return
+
+    conn = sqlite3.connect(str(db_path))
+    try:
+        apply(conn)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,75 @@
+"""
+Migration script to make the ids of procurement_requests, order_lines,
+attachments and status_events AUTOINCREMENT.
+
+Without it SQLite reuses the highest id after deletes, so new rows could take
+the ids of archived ones (archive read-through is by id, and archived rows keep
+their ids). SQLite cannot change this in place, so each table is rebuilt
+(create, copy, drop, rename) with foreign keys disabled so child rows are kept.
+Applied by `python -m app.migrate`; can still be run on its own.
+"""
+import sqlite3
+from pathlib import Path
+
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from .db import engine
+from . import models
+
+TABLES = [
+    models.ProcurementRequest.__table__,
+    models.OrderLine.__table__,
+    models.Attachment.__table__,
+    models.StatusEvent.__table__,
+]
+
+
+def apply(conn):
+    """``conn`` must be in autocommit mode (isolation_level=None); tables are swapped in explicit transactions."""
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA foreign_keys=OFF")  # dropping a parent table must not cascade to its children
+
+    for table in TABLES:
+        cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table.name,))
+        if "AUTOINCREMENT" in cursor.fetchone()[0].upper():
+            print(f"Table '{table.name}' already uses AUTOINCREMENT ids. Skipping.")
+            continue
+
+        cursor.execute(f"PRAGMA table_info({table.name})")
+        existing = {col[1] for col in cursor.fetchall()}
+        missing = [column.name for column in table.columns if column.name not in existing]
+        if missing:
+            raise RuntimeError(f"Columns {missing} are missing in '{table.name}'; run the earlier migrations first.")
+
+        print(f"Rebuilding '{table.name}' with AUTOINCREMENT ids...")
+        columns = ", ".join(column.name for column in table.columns)
+        create_sql = str(CreateTable(table).compile(engine)).replace(
+            f"CREATE TABLE {table.name}", f"CREATE TABLE {table.name}_new", 1
+        )
+        cursor.execute("BEGIN")
+        cursor.execute(create_sql)
+        cursor.execute(f"INSERT INTO {table.name}_new ({columns}) SELECT {columns} FROM {table.name}")
+        cursor.execute(f"DROP TABLE {table.name}")
+        cursor.execute(f"ALTER TABLE {table.name}_new RENAME TO {table.name}")
+        for index in table.indexes:
+            cursor.execute(str(CreateIndex(index).compile(engine)).replace("CREATE INDEX", "CREATE INDEX IF NOT EXISTS", 1))
+        cursor.execute("COMMIT")
+
+
+def migrate():
+    db_path = Path(__file__).parent.parent / "local.db"
+
+    if not db_path.exists():
+        print(f"Database not found at {db_path}. Skipping migration.")
+        return
+
+    conn = sqlite3.connect(str(db_path), isolation_level=None)
+    try:
+        apply(conn)
+    finally:
+        conn.close()
+    print("Migration completed successfully.")
+
+
+if __name__ == "__main__":
+    migrate()
@@ -0,0 +1,103 @@
+"""
+Migration script to move money columns from Numeric(12, 2) to integer cents.
+
+- procurement_requests.total_cost   -> total_cost_cents (+ currency column)
+- order_lines.unit_price            -> unit_price_cents
+- order_lines.total_price           -> total_price_cents
+
+The backfill runs in small id-range batches with a commit after each one, so
+reads are never blocked for long. A final catch-up pass picks up rows written
+by the old code during the backfill, then the old columns are dropped.
+
+This needs a maintenance window for writes: the old money columns are NOT NULL
+without a server default, so the new code cannot insert requests or order lines
+until they are dropped. Stop the app (or keep the old version serving) while it
+runs, and start the new code afterwards.
+Applied by `python -m app.migrate`; can still be run on its own.
+"""
+import sqlite3
+import sys
+from pathlib import Path
+
+BATCH_SIZE = 1000
+
+# table -> [(old column, new column), ...]
+MONEY_COLUMNS = {
+    "procurement_requests": [("total_cost", "total_cost_cents")],
+    "order_lines": [("unit_price", "unit_price_cents"), ("total_price", "total_price_cents")],
+}
+
+
+def _columns(cursor, table):
+    cursor.execute(f"PRAGMA table_info({table})")
+    return [col[1] for col in cursor.fetchall()]
+
+
+def _cents_expr(column):
+    return f"CAST(ROUND({column} * 100) AS INTEGER)"
+
+
+def migrate_table(conn, table, pairs, batch_size=BATCH_SIZE):
+    cursor = conn.cursor()
+    columns = _columns(cursor, table)
+    pending = [(old, new) for old, new in pairs if old in columns]
+    if not pending:
+        print(f"Money columns in {table} already migrated. Skipping.")
+        return
+
+    for old, new in pending:
+        if new not in columns:
+            print(f"Adding '{new}' column to {table} table...")
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {new} INTEGER NOT NULL DEFAULT 0")
+    if table == "procurement_requests" and "currency" not in columns:
+        cursor.execute("ALTER TABLE procurement_requests ADD COLUMN currency VARCHAR(3) NOT NULL DEFAULT 'EUR'")
+    conn.commit()
+
+    assignments = ", ".join(f"{new} = {_cents_expr(old)}" for old, new in pending)
+    max_id = cursor.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0]
+    for start in range(0, max_id, batch_size):
+        cursor.execute(
+            f"UPDATE {table} SET {assignments} WHERE id > ? AND id <= ?",
+            (start, start + batch_size),
+        )
+        conn.commit()
+    print(f"Backfilled {table} up to id {max_id}.")
+
+    # Catch-up pass for rows written while the backfill was running, then drop
+    # the old columns in the same transaction so no write can slip in between.
+    mismatch = " OR ".join(f"{new} != {_cents_expr(old)}" for old, new in pending)
+    cursor.execute("BEGIN IMMEDIATE")
+    cursor.execute(f"UPDATE {table} SET {assignments} WHERE {mismatch}")
+    for old, _ in pending:
+        cursor.execute(f"ALTER TABLE {table} DROP COLUMN {old}")
+    conn.commit()
+    print(f"Dropped old money columns from {table}.")
+
+
+def apply(conn):
+    if sqlite3.sqlite_version_info < (3, 35, 0):
+        raise RuntimeError(f"SQLite {sqlite3.sqlite_version} cannot drop columns (3.35+ required).")
+    for table, pairs in MONEY_COLUMNS.items():
+        migrate_table(conn, table, pairs)
+
+
+def migrate():
+    db_path = Path(__file__).parent.parent / "local.db"
+
+    if not db_path.exists():
+        print(f"Database not found at {db_path}. Skipping migration.")
+        return
+
+    conn = sqlite3.connect(str(db_path))
+    try:
+        apply(conn)
+    except RuntimeError as e:
+        print(f"{e} Aborting.")
+        sys.exit(1)
+    finally:
+        conn.close()
+    print("Migration completed successfully.")
+
+
+if __name__ == "__main__":
+    migrate()
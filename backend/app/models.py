@@ -1,7 +1,8 @@
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, Numeric, String, func
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String, Text, func
 from sqlalchemy.orm import relationship
 
 from .db import Base
+from .money import DEFAULT_CURRENCY, Money
 
 
 class CommodityGroup(Base):
@@ -26,29 +27,58 @@ class ProcurementRequest(Base):
 
     commodity_group_id = Column(String(3), ForeignKey("commodity_groups.id"), nullable=True)
 
-    total_cost = Column(Numeric(12, 2), nullable=False, default=0)
+    # Money is stored as integer cents; the ORM attribute stays a two-place Decimal
+    total_cost = Column("total_cost_cents", Money, nullable=False, default=0)
+    currency = Column(String(3), nullable=False, default=DEFAULT_CURRENCY)
     current_status = Column(String(30), nullable=False, default="Open")
 
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    # when current_status was entered; lets status metrics compute time-in-status without reading history
+    status_changed_at = Column(DateTime(timezone=True), default=func.now(), nullable=True)
+    # bumped on every ORM update; watermark for incremental snapshots
+    updated_at = Column(DateTime(timezone=True), default=func.now(), onupdate=func.now(), nullable=True)
+    # optimistic concurrency: every ORM UPDATE is "... WHERE id = ? AND version = ?" and bumps it
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+
+    __table_args__ = (
+        Index("ix_procurement_requests_status_changed_at", "current_status", "status_changed_at"),
+        Index("ix_procurement_requests_updated_at", "updated_at"),
+        # never reuse ids of deleted or archived rows (they live on in archive.db)
+        {"sqlite_autoincrement": True},
+    )
+
+    # fetch server defaults (created_at) as part of the INSERT so rollups can bucket by month
+    __mapper_args__ = {"eager_defaults": True, "version_id_col": version}
 
     commodity_group = relationship("CommodityGroup")
-    order_lines = relationship("OrderLine", back_populates="request", cascade="all, delete-orphan")
-    attachments = relationship("Attachment", back_populates="request", cascade="all, delete-orphan")
-    status_events = relationship("StatusEvent", back_populates="request", cascade="all, delete-orphan")
+    # children are removed by ON DELETE CASCADE in the database, also for bulk deletes
+    order_lines = relationship(
+        "OrderLine", back_populates="request", cascade="all, delete-orphan", passive_deletes=True
+    )
+    attachments = relationship(
+        "Attachment", back_populates="request", cascade="all, delete-orphan", passive_deletes=True
+    )
+    status_events = relationship(
+        "StatusEvent", back_populates="request", cascade="all, delete-orphan", passive_deletes=True
+    )
 
 
 class OrderLine(Base):
     __tablename__ = "order_lines"
 
     id = Column(Integer, primary_key=True, index=True)
-    request_id = Column(Integer, ForeignKey("procurement_requests.id"), nullable=False, index=True)
+    request_id = Column(
+        Integer, ForeignKey("procurement_requests.id", ondelete="CASCADE"), nullable=False, index=True
+    )
 
     product = Column(String(250), nullable=True)
     description = Column(String(500), nullable=False)
-    unit_price = Column(Numeric(12, 2), nullable=False)
+    unit_price = Column("unit_price_cents", Money, nullable=False)
     amount = Column(Integer, nullable=False)
     unit = Column(String(50), nullable=True)
-    total_price = Column(Numeric(12, 2), nullable=False)
+    total_price = Column("total_price_cents", Money, nullable=False)
+
+    __table_args__ = {"sqlite_autoincrement": True}
 
     request = relationship("ProcurementRequest", back_populates="order_lines")
 
@@ -57,13 +87,17 @@ class Attachment(Base):
     __tablename__ = "attachments"
 
     id = Column(Integer, primary_key=True, index=True)
-    request_id = Column(Integer, ForeignKey("procurement_requests.id"), nullable=False, index=True)
+    request_id = Column(
+        Integer, ForeignKey("procurement_requests.id", ondelete="CASCADE"), nullable=False, index=True
+    )
 
     filename = Column(String(255), nullable=False)
     path = Column(String(500), nullable=False)
 
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
+    __table_args__ = {"sqlite_autoincrement": True}
+
     request = relationship("ProcurementRequest", back_populates="attachments")
 
 
@@ -71,7 +105,9 @@ class StatusEvent(Base):
     __tablename__ = "status_events"
 
     id = Column(Integer, primary_key=True, index=True)
-    request_id = Column(Integer, ForeignKey("procurement_requests.id"), nullable=False, index=True)
+    request_id = Column(
+        Integer, ForeignKey("procurement_requests.id", ondelete="CASCADE"), nullable=False, index=True
+    )
 
     from_status = Column(String(30), nullable=True)
     to_status = Column(String(30), nullable=False)
@@ -79,4 +115,96 @@ class StatusEvent(Base):
     changed_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     changed_by = Column(String(200), nullable=True)
 
+    __table_args__ = (
+        Index("ix_status_events_to_status_changed_at", "to_status", "changed_at"),
+        {"sqlite_autoincrement": True},
+    )
+
     request = relationship("ProcurementRequest", back_populates="status_events")
+
+
+class SpendRollup(Base):
+    """Spend per (department, vendor, commodity group, status, month), maintained on every write."""
+
+    __tablename__ = "spend_rollups"
+
+    department = Column(String(200), primary_key=True)
+    vendor_name = Column(String(250), primary_key=True)
+    commodity_group_id = Column(String(3), primary_key=True)  # "" when no group is assigned yet
+    status = Column(String(30), primary_key=True)
+    month = Column(String(7), primary_key=True)  # "YYYY-MM" of created_at
+
+    request_count = Column(Integer, nullable=False, default=0)
+    total_cost = Column("total_cost_cents", Money, nullable=False, default=0)
+
+
+class StatusCount(Base):
+    """Number of requests per (department, status); backs the overview counters."""
+
+    __tablename__ = "status_counts"
+
+    department = Column(String(200), primary_key=True)
+    status = Column(String(30), primary_key=True)
+
+    count = Column(Integer, nullable=False, default=0)
+
+
+class StatusDurationBucket(Base):
+    """Histogram of time-in-status and cycle time per department and commodity group."""
+
+    __tablename__ = "status_duration_buckets"
+
+    metric = Column(String(20), primary_key=True)  # "time_in_status" or "cycle_time"
+    status = Column(String(30), primary_key=True)  # status that was left ("Closed" for cycle_time)
+    department = Column(String(200), primary_key=True)
+    commodity_group_id = Column(String(3), primary_key=True)  # "" when no group is assigned
+    bucket = Column(Integer, primary_key=True)  # index into status_metrics.BUCKET_BOUNDS
+
+    count = Column(Integer, nullable=False, default=0)
+    total_seconds = Column(Integer, nullable=False, default=0)
+
+
+class StatusThroughput(Base):
+    """Number of transitions into a status per ISO week, department and commodity group."""
+
+    __tablename__ = "status_throughput"
+
+    week = Column(String(8), primary_key=True)  # ISO week, e.g. "2026-W42"
+    to_status = Column(String(30), primary_key=True)
+    department = Column(String(200), primary_key=True)
+    commodity_group_id = Column(String(3), primary_key=True)
+
+    count = Column(Integer, nullable=False, default=0)
+
+
+class IdempotencyKey(Base):
+    """Client-supplied Idempotency-Key of a create call and the response it produced."""
+
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String(255), primary_key=True)
+    scope = Column(String(100), primary_key=True)  # route the key was used on, e.g. "POST /requests"
+    request_hash = Column(String(64), nullable=False)  # sha256 of the request payload
+
+    status = Column(String(20), nullable=False)  # "in_progress" or "completed"
+    status_code = Column(Integer, nullable=True)
+    response_body = Column(Text, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+
+class VendorTemplate(Base):
+    """Layout learned from a confirmed extraction of a vendor's offer; see services.templates."""
+
+    __tablename__ = "vendor_templates"
+
+    id = Column(Integer, primary_key=True)
+    vendor_vat_id = Column(String(50), nullable=True, unique=True)
+    fingerprint = Column(String(64), nullable=False, index=True)  # hash of the letterhead, for offers without a VAT id
+    vendor_name = Column(String(250), nullable=False)
+    content = Column(Text, nullable=False)  # JSON: labels, line parser, table columns, line pattern
+
+    confirmations = Column(Integer, nullable=False, default=1)  # extractions that matched this layout
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    updated_at = Column(DateTime(timezone=True), nullable=False)
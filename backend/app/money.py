@@ -0,0 +1,43 @@
+from decimal import ROUND_HALF_UP, Decimal
+
+from sqlalchemy import Integer
+from sqlalchemy.types import TypeDecorator
+
+CENT = Decimal("0.01")
+DEFAULT_CURRENCY = "EUR"
+
+
+def to_cents(value) -> int:
+    """Convert a decimal amount (Decimal, int, float or str) to integer minor units."""
+    if isinstance(value, float):
+        value = str(value)
+    return int((Decimal(value).quantize(CENT, rounding=ROUND_HALF_UP) * 100).to_integral_value())
+
+
+def from_cents(cents) -> Decimal:
+    """Convert minor units back to a two-place Decimal (e.g. 176726 -> Decimal('1767.26'))."""
+    if not isinstance(cents, int):
+        cents = Decimal(str(cents))
+    return Decimal(cents).scaleb(-2).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+class Money(TypeDecorator):
+    """
+    Money amount stored as an INTEGER number of cents.
+
+    Python code keeps working with two-place Decimals, while SQLite stores exact
+    integers so SUM/AVG run natively without float or Decimal round-trips.
+    """
+
+    impl = Integer
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return to_cents(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return from_cents(value)
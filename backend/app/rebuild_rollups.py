@@ -0,0 +1,46 @@
+"""
+Rebuild the analytics rollup tables from procurement_requests and status_events.
+
+Use this to reconcile drift, e.g. after editing rows by hand or restoring a backup.
+Run with: python -m app.rebuild_rollups
+Pass --check to only compare the rollups with their source rows (exit code 1 on drift).
+"""
+import argparse
+import sys
+
+from .db import SessionLocal
+from .seed_commodity_groups import init_db
+from .services import rollups, status_metrics
+
+
+def check() -> int:
+    with SessionLocal() as db:
+        drift = rollups.check(db)
+    drifted = 0
+    for name, groups in drift.items():
+        for key, expected, actual in groups:
+            print(f"{name} {key}: expected {expected}, found {actual}")
+        drifted += len(groups)
+    print(f"{drifted} drifted groups." if drifted else "Rollups are consistent with source rows.")
+    return 1 if drifted else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--check", action="store_true", help="report drift without rewriting anything")
+    args = parser.parse_args()
+
+    init_db()
+    if args.check:
+        sys.exit(check())
+
+    with SessionLocal() as db:
+        drifted = rollups.rebuild(db)
+        status_metrics.rebuild(db)
+        db.commit()
+    print(f"Spend rollups and status counts rebuilt ({drifted} drifted groups corrected).")
+    print("Status duration and throughput metrics rebuilt from status_events.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+import os
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List, Literal, Optional
+
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+
+from ..db import get_db
+from ..money import CENT
+from ..services import snapshot, status_metrics
+from .. import models, schemas
+
+router = APIRouter(prefix="/analytics", tags=["analytics"])
+
+# group_by value -> (output field, rollup column)
+SPEND_DIMENSIONS = {
+    "department": ("department", models.SpendRollup.department),
+    "vendor": ("vendor_name", models.SpendRollup.vendor_name),
+    "commodity_group": ("commodity_group_id", models.SpendRollup.commodity_group_id),
+    "category": ("category", models.CommodityGroup.category),
+    "status": ("status", models.SpendRollup.status),
+    "month": ("month", models.SpendRollup.month),
+}
+
+
+@router.get("/spend", response_model=list[schemas.SpendBucketOut])
+def spend(
+    group_by: List[schemas.SpendDimension] = Query(default=["department"]),
+    department: Optional[str] = None,
+    status: Optional[schemas.Status] = None,
+    from_month: Optional[str] = Query(default=None, pattern=r"^\d{4}-\d{2}$"),
+    to_month: Optional[str] = Query(default=None, pattern=r"^\d{4}-\d{2}$"),
+    db: Session = Depends(get_db),
+):
+    """Spend totals grouped by any combination of dimensions, read from the spend rollups."""
+    rollup = models.SpendRollup
+    dimensions = [SPEND_DIMENSIONS[name] for name in dict.fromkeys(group_by)]
+    columns = [column for _, column in dimensions]
+
+    query = db.query(*columns, func.sum(rollup.request_count), func.sum(rollup.total_cost))
+    if "category" in group_by:
+        query = query.outerjoin(models.CommodityGroup, models.CommodityGroup.id == rollup.commodity_group_id)
+    if department:
+        query = query.filter(rollup.department == department)
+    if status:
+        query = query.filter(rollup.status == status)
+    if from_month:
+        query = query.filter(rollup.month >= from_month)
+    if to_month:
+        query = query.filter(rollup.month <= to_month)
+    query = query.group_by(*columns).order_by(*columns)
+
+    buckets = []
+    for row in query:
+        *keys, request_count, total_cost = row
+        bucket = {field: (value or None) for (field, _), value in zip(dimensions, keys)}
+        bucket.update(
+            request_count=request_count,
+            total_cost=total_cost,
+            average_cost=(total_cost / request_count).quantize(CENT),
+        )
+        buckets.append(bucket)
+    return buckets
+
+
+def _metric_columns(table, group_by):
+    """Dimension columns of a status-metric table for the requested group_by values."""
+    fields = {"department": "department", "commodity_group": "commodity_group_id"}
+    return [(fields[name], getattr(table, fields[name])) for name in dict.fromkeys(group_by)]
+
+
+def _hours(seconds: float) -> float:
+    return round(seconds / status_metrics.HOUR, 2)
+
+
+@router.get("/status-durations", response_model=list[schemas.StatusDurationOut])
+def status_durations(
+    metric: str = Query(default=status_metrics.TIME_IN_STATUS, pattern="^(time_in_status|cycle_time)$"),
+    group_by: List[schemas.MetricDimension] = Query(default=[]),
+    db: Session = Depends(get_db),
+):
+    """Time spent per status (or Open-to-Closed cycle time) with percentiles from the duration histogram."""
+    table = models.StatusDurationBucket
+    dimensions = _metric_columns(table, group_by)
+    columns = [column for _, column in dimensions] + [table.status]
+
+    rows = (
+        db.query(*columns, table.bucket, func.sum(table.count), func.sum(table.total_seconds))
+        .filter(table.metric == metric)
+        .group_by(*columns, table.bucket)
+        .order_by(*columns)
+    )
+    groups = {}
+    for row in rows:
+        *keys, bucket, count, total_seconds = row
+        group = groups.setdefault(tuple(keys), {"buckets": {}, "count": 0, "total_seconds": 0})
+        group["buckets"][bucket] = count
+        group["count"] += count
+        group["total_seconds"] += total_seconds
+
+    result = []
+    for keys, group in groups.items():
+        *dimension_values, status = keys
+        item = {field: (value or None) for (field, _), value in zip(dimensions, dimension_values)}
+        count = group["count"]
+        item.update(
+            status=status,
+            count=count,
+            average_hours=_hours(group["total_seconds"] / count),
+            p50_hours=_hours(status_metrics.percentile(group["buckets"], count, 0.50)),
+            p90_hours=_hours(status_metrics.percentile(group["buckets"], count, 0.90)),
+            p95_hours=_hours(status_metrics.percentile(group["buckets"], count, 0.95)),
+        )
+        result.append(item)
+    return result
+
+
+@router.get("/backlog-aging", response_model=list[schemas.BacklogAgingOut])
+def backlog_aging(
+    group_by: List[schemas.MetricDimension] = Query(default=[]),
+    db: Session = Depends(get_db),
+):
+    """Open and In Progress requests bucketed by how long they have been in their current status."""
+    req = models.ProcurementRequest
+    now = status_metrics.utcnow()
+    labels = [label for label, _ in status_metrics.AGING_BUCKETS]
+    bucket = case(
+        *[
+            (req.status_changed_at > now - timedelta(days=days), index)
+            for index, (_, days) in enumerate(status_metrics.AGING_BUCKETS)
+            if days is not None
+        ],
+        else_=len(labels) - 1,
+    )
+    dimensions = _metric_columns(req, group_by)
+    columns = [column for _, column in dimensions] + [req.current_status]
+
+    rows = (
+        db.query(*columns, bucket, func.count(req.id))
+        .filter(req.current_status != "Closed")
+        .group_by(*columns, bucket)
+        .order_by(*columns)
+    )
+    groups = {}
+    for row in rows:
+        *keys, index, count = row
+        groups.setdefault(tuple(keys), dict.fromkeys(labels, 0))[labels[index]] = count
+
+    result = []
+    for keys, buckets in groups.items():
+        *dimension_values, status = keys
+        item = {field: value for (field, _), value in zip(dimensions, dimension_values)}
+        item.update(status=status, buckets=buckets)
+        result.append(item)
+    return result
+
+
+@router.get("/throughput", response_model=list[schemas.ThroughputOut])
+def throughput(
+    weeks: int = Query(default=12, ge=1, le=260),
+    to_status: Optional[schemas.Status] = "Closed",
+    group_by: List[schemas.MetricDimension] = Query(default=[]),
+    db: Session = Depends(get_db),
+):
+    """Transitions into a status per ISO week (Closed = completed requests, Open = arrivals)."""
+    table = models.StatusThroughput
+    since = status_metrics.iso_week(status_metrics.utcnow() - timedelta(weeks=weeks - 1))
+    dimensions = _metric_columns(table, group_by)
+    columns = [table.week, table.to_status] + [column for _, column in dimensions]
+
+    query = db.query(*columns, func.sum(table.count)).filter(table.week >= since)
+    if to_status:
+        query = query.filter(table.to_status == to_status)
+    rows = query.group_by(*columns).order_by(*columns)
+
+    result = []
+    for week, status, *rest in rows:
+        *dimension_values, count = rest
+        item = {field: (value or None) for (field, _), value in zip(dimensions, dimension_values)}
+        item.update(week=week, to_status=status, count=count)
+        result.append(item)
+    return result
+
+
+@router.get("/snapshot/{table_name}")
+def table_snapshot(
+    table_name: Literal["procurement_requests", "order_lines", "status_events"],
+    background_tasks: BackgroundTasks,
+    format: Literal["arrow", "parquet"] = "arrow",
+    since: Optional[datetime] = None,
+):
+    """
+    Columnar snapshot of one table for offline analytics.
+
+    ``arrow`` streams an Arrow IPC stream batch by batch; ``parquet`` is written to a
+    temporary file first because the format needs its footer before it can be read.
+    Pass ``since`` (the watermark of a previous snapshot) for an incremental export.
+    """
+    try:
+        snapshot.arrow_schema(table_name)
+    except RuntimeError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+
+    if format == "arrow":
+        return StreamingResponse(
+            snapshot.arrow_stream(table_name, since),
+            media_type="application/vnd.apache.arrow.stream",
+            headers={"Content-Disposition": f'attachment; filename="{table_name}.arrows"'},
+        )
+
+    fd, path = tempfile.mkstemp(suffix=".parquet")
+    os.close(fd)
+    snapshot.write_table(table_name, Path(path), "parquet", since)
+    background_tasks.add_task(os.remove, path)
+    return FileResponse(path, media_type="application/vnd.apache.parquet", filename=f"{table_name}.parquet")
@@ -1,46 +1,56 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from openai import OpenAI
-import os
 
 from ..db import get_db
 from .. import models, schemas
+from ..services import admission, llm
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
-# Initialize OpenAI client
-client = None
-if os.getenv("OPENAI_API_KEY"):
-    client = OpenAI()
 
-
-@router.post("", response_model=schemas.ChatResponse)
+@router.post("", response_model=schemas.ChatResponse, dependencies=[Depends(admission.admit("chat"))])
 def chat_with_asklio(payload: schemas.ChatRequest, db: Session = Depends(get_db)):
     """
     Chat with AskLio virtual assistant about procurement requests and policies.
     """
+    client = llm.get_client()
     if not client:
         raise HTTPException(
             status_code=503,
             detail="OpenAI API key is not configured."
         )
     
-    # Fetch all requests for context
-    requests = db.query(models.ProcurementRequest).all()
+    # Fetch all requests for context (one query; the commodity group name is joined in)
+    req = models.ProcurementRequest
+    requests = (
+        db.query(
+            req.id,
+            req.title,
+            req.requestor_name,
+            req.department,
+            req.vendor_name,
+            req.current_status,
+            req.total_cost,
+            models.CommodityGroup.name.label("commodity_group_name"),
+        )
+        .outerjoin(models.CommodityGroup, models.CommodityGroup.id == req.commodity_group_id)
+        .order_by(req.id)
+        .all()
+    )
     
     # Build context about requests
     requests_context = []
-    for req in requests:
+    for row in requests:
         req_summary = (
-            f"Request #{req.id}: {req.title} | "
-            f"Requestor: {req.requestor_name} | "
-            f"Department: {req.department} | "
-            f"Vendor: {req.vendor_name} | "
-            f"Status: {req.current_status} | "
-            f"Total Cost: €{req.total_cost}"
+            f"Request #{row.id}: {row.title} | "
+            f"Requestor: {row.requestor_name} | "
+            f"Department: {row.department} | "
+            f"Vendor: {row.vendor_name} | "
+            f"Status: {row.current_status} | "
+            f"Total Cost: €{row.total_cost}"
         )
-        if req.commodity_group:
-            req_summary += f" | Commodity Group: {req.commodity_group.name}"
+        if row.commodity_group_name:
+            req_summary += f" | Commodity Group: {row.commodity_group_name}"
         requests_context.append(req_summary)
     
     context_text = "\n".join(requests_context) if requests_context else "No requests in system yet."
@@ -64,7 +74,9 @@ When answering:
 """
     
     try:
-        response = client.chat.completions.create(
+        response = llm.create(
+            "chat",
+            client,
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -77,5 +89,11 @@ When answering:
         reply = response.choices[0].message.content
         return {"reply": reply}
     
+    except llm.CircuitOpen as e:
+        raise HTTPException(
+            status_code=503,
+            detail="AskLio is temporarily unavailable; please try again shortly.",
+            headers={"Retry-After": str(e.retry_after)},
+        )
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"Chat failed: {str(e)}")
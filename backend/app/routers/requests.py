@@ -1,10 +1,12 @@
 import os
 from pathlib import Path
-import pdfplumber 
 import io
+import itertools
 import re
 import logging
-from typing import Union
+import time
+from datetime import datetime
+from typing import Any, List, Literal, Optional, Union
 
 from ..models import CommodityGroup
 
@@ -12,23 +14,90 @@ from fastapi import File, UploadFile
 
 from ..services.extractor import extract_offer_text
 from ..services.commodity import predict_commodity_group_id
+from ..services import (
+    admission, archive, bulk, export, idempotency, llm, metrics, profiling, rollups, status_metrics, templates,
+)
+from ..services.uploads import UPLOAD_DIR
 
 
 from decimal import Decimal
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Body, Depends, Header, HTTPException, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.orm.exc import StaleDataError
 
-from ..db import get_db
+from ..db import ArchiveSessionLocal, get_archive_db, get_db
 from .. import models, schemas
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/requests", tags=["requests"])
 
-UPLOAD_DIR = Path("uploads")
 UPLOAD_DIR.mkdir(exist_ok=True)
 
+# Idempotency-Key scopes of the create endpoints
+CREATE_SCOPE = "POST /requests"
+CREATE_FROM_OFFER_SCOPE = "POST /requests/create-from-offer"
+
+
+def llm_unavailable(e: llm.CircuitOpen) -> HTTPException:
+    """503 for an LLM-backed request that could not be served without the LLM."""
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+
+def parse_if_match(if_match: Optional[str]) -> Optional[int]:
+    """Parse an If-Match header ("3", "\"3\"" or W/"3") into a version; None for absent or "*"."""
+    if if_match is None or if_match.strip() == "*":
+        return None
+    value = if_match.strip()
+    if value.startswith("W/"):
+        value = value[2:]
+    try:
+        return int(value.strip('"'))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid If-Match header: {if_match!r}")
+
+
+def check_version(req: models.ProcurementRequest, if_match: Optional[str], expected_version: Optional[int] = None):
+    """Reject the mutation with 409 if the caller's expected version is not the current one."""
+    expected = expected_version if expected_version is not None else parse_if_match(if_match)
+    if expected is not None and req.version != expected:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Request {req.id} was modified concurrently (version {req.version}, expected {expected})",
+        )
+
+
+def commit_versioned(db: Session, req: models.ProcurementRequest, response: Optional[Response] = None):
+    """Commit a mutation of ``req``; a lost compare-and-swap on the version column becomes a 409."""
+    try:
+        db.commit()
+    except StaleDataError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail=f"Request {req.id} was modified concurrently, retry")
+    db.refresh(req)
+    if response is not None:
+        response.headers["ETag"] = f'"{req.version}"'
+
+
+def replay_response(record: models.IdempotencyKey) -> Response:
+    """The stored response of an already completed Idempotency-Key."""
+    return Response(
+        content=record.response_body,
+        status_code=record.status_code,
+        media_type="application/json",
+        headers={"Idempotent-Replayed": "true"},
+    )
+
+
+def stored_response(db: Session, req: models.ProcurementRequest) -> str:
+    """Serialize ``req`` exactly as a fresh read would return it, inside the current transaction."""
+    db.flush()
+    db.expire_all()  # reload normalized values (e.g. Money) from the flushed rows
+    return schemas.ProcurementRequestOut.model_validate(req).model_dump_json()
+
 
 def sanitize_extracted_text(text: str) -> str:
     """
@@ -90,10 +159,14 @@ def extract_text_from_pdf(pdf_source: Union[io.BytesIO, str]) -> str:
     Returns:
         Extracted text with table data formatted as pipe-delimited rows
     """
+    import pdfplumber  # slow to import; only needed for PDF offers
+
     text_parts = []
+    start = time.perf_counter()
     try:
         with pdfplumber.open(pdf_source) as pdf:
             logger.info(f"PDF has {len(pdf.pages)} pages")
+            metrics.PDF_PAGES.observe(len(pdf.pages))
             for i, page in enumerate(pdf.pages):
                 page_text = page.extract_text() or ""
                 
@@ -111,8 +184,11 @@ def extract_text_from_pdf(pdf_source: Union[io.BytesIO, str]) -> str:
                 else:
                     logger.warning(f"Page {i+1}: no text extracted")
     except Exception as e:
+        metrics.PDF_ERRORS.inc()
         logger.error(f"pdfplumber failed to open/read PDF: {e}")
         raise
+    finally:
+        metrics.PDF_PARSE_TIME.observe(time.perf_counter() - start)
     
     raw_text = "\n\n".join(text_parts).strip()
     
@@ -129,7 +205,23 @@ def extract_text_from_pdf(pdf_source: Union[io.BytesIO, str]) -> str:
 
 
 @router.post("", response_model=schemas.ProcurementRequestOut)
-def create_request(payload: schemas.ProcurementRequestCreate, db: Session = Depends(get_db)):
+def create_request(
+    payload: schemas.ProcurementRequestCreate,
+    idempotency_key: Optional[str] = Header(default=None),
+    db: Session = Depends(get_db),
+):
+    if idempotency_key:
+        record = idempotency.claim(
+            db, idempotency_key, CREATE_SCOPE, idempotency.fingerprint(payload.model_dump_json())
+        )
+        if record:
+            return replay_response(record)
+
+    with idempotency.released_on_error(db, idempotency_key, CREATE_SCOPE):
+        return _create_request(payload, idempotency_key, db)
+
+
+def _create_request(payload: schemas.ProcurementRequestCreate, idempotency_key: Optional[str], db: Session):
     req = models.ProcurementRequest(
         requestor_name=payload.requestor_name,
         title=payload.title,
@@ -164,18 +256,82 @@ def create_request(payload: schemas.ProcurementRequestCreate, db: Session = Depe
     )
 
     db.add(req)
+    db.flush()
+    rollups.add_request(db, req)
+    status_metrics.record_created(db, req)
+    if idempotency_key:
+        idempotency.complete(db, idempotency_key, CREATE_SCOPE, stored_response(db, req))
     db.commit()
     db.refresh(req)
     return req
 
-@router.post("/create-from-offer", response_model=schemas.ProcurementRequestOut)
-async def create_from_offer(file: UploadFile = File(...), db: Session = Depends(get_db)):
+@router.post("/bulk", response_model=schemas.BulkCreateResult)
+def create_requests_bulk(payloads: List[Any] = Body(..., max_length=100_000), db: Session = Depends(get_db)):
+    """
+    Create many requests at once (e.g. migrating historic purchase orders).
+
+    Each item is validated like POST /requests; invalid items are reported per
+    index and do not block the others. Inserts are set-based and chunked.
+    """
+    return bulk.create_requests(db, payloads)
+
+
+@router.post("/status:batch", response_model=schemas.BatchStatusResult)
+def change_status_batch(payload: schemas.BatchStatusChange, db: Session = Depends(get_db)):
+    """Apply one status transition to a list of ids or to all requests matching a filter, atomically."""
+    filters = request_filters(**payload.filter.model_dump()) if payload.filter else None
+    return bulk.change_status_batch(
+        db,
+        to_status=payload.to_status,
+        changed_by=payload.changed_by,
+        ids=payload.ids,
+        filters=filters,
+    )
+
+
+@router.post(
+    "/create-from-offer",
+    response_model=schemas.ProcurementRequestOut,
+)
+async def create_from_offer(
+    response: Response,
+    file: UploadFile = File(...),
+    idempotency_key: Optional[str] = Header(default=None),
+    x_profile_token: Optional[str] = Header(default=None),
+    db: Session = Depends(get_db),
+):
     """Upload an offer file, extract data via LLM, and create a procurement request automatically."""
 
     contents = await file.read()
+    filename = file.filename or "unknown"
+    # a rejected token must not leave the Idempotency-Key claimed
+    profiling.authorize(x_profile_token)
+
+    if idempotency_key:
+        # a duplicate waits for the in-flight call; keep that off the event loop
+        record = await run_in_threadpool(
+            idempotency.claim,
+            db,
+            idempotency_key,
+            CREATE_FROM_OFFER_SCOPE,
+            idempotency.fingerprint(filename, contents),
+        )
+        if record:
+            return replay_response(record)
+
+    def create():
+        with profiling.profiled(x_profile_token, response, "create_from_offer"):
+            return _create_from_offer(filename, contents, idempotency_key, db)
+
+    # the admission slot is only taken once the key is ours, so a waiting duplicate holds none
+    with idempotency.released_on_error(db, idempotency_key, CREATE_FROM_OFFER_SCOPE):
+        async with admission.admitted("ingest"):
+            # PDF parsing and the LLM calls block; keep them off the event loop
+            return await run_in_threadpool(create)
 
+
+def _create_from_offer(filename: str, contents: bytes, idempotency_key: Optional[str], db: Session):
     # Read offer text from file (.txt or text-based .pdf)
-    filename = file.filename or "unknown"
     suffix = Path(filename).suffix.lower()
 
     logger.info(f"Processing offer upload: {filename} ({len(contents)} bytes)")
@@ -202,8 +358,11 @@ async def create_from_offer(file: UploadFile = File(...), db: Session = Depends(
     logger.info(f"Offer text length for {filename}: {len(offer_text)} chars")
 
     # LLM extraction
+    template = templates.for_rules(templates.find(db, offer_text))
     try:
-        extracted = extract_offer_text(offer_text)
+        extracted = extract_offer_text(offer_text, template=template)
+    except llm.CircuitOpen as e:
+        raise llm_unavailable(e)
     except Exception as e:
         logger.error(f"LLM extraction failed for {filename}: {e}", exc_info=True)
         raise HTTPException(status_code=502, detail=f"Extraction failed: {e}")
@@ -237,27 +396,8 @@ async def create_from_offer(file: UploadFile = File(...), db: Session = Depends(
         )
     req.total_cost = extracted.total_cost.quantize(Decimal("0.01"))
 
-    req.status_events.append(
-        models.StatusEvent(from_status=None, to_status="Open", changed_by=requestor_name)
-    )
-
-    db.add(req)
-    db.commit()
-    db.refresh(req)
-
-    # Save attachment
-    safe_name = f"{req.id}_{filename}".replace("/", "_").replace("\\", "_")
-    save_path = UPLOAD_DIR / safe_name
-    save_path.write_bytes(contents)
-
-    att = models.Attachment(
-        request_id=req.id,
-        filename=filename,
-        path=str(save_path),
-    )
-    db.add(att)
-
-    # Predict commodity group (auto-fill)
+    # Predict commodity group (auto-fill) before anything is written, so the
+    # request, its attachment and the idempotency key commit together
     groups = db.query(models.CommodityGroup).order_by(models.CommodityGroup.id).all()
     groups_text = "\n".join([f"{g.id} | {g.category} | {g.name}" for g in groups])
     lines_text = "; ".join([ol.description for ol in req.order_lines])
@@ -275,8 +415,32 @@ async def create_from_offer(file: UploadFile = File(...), db: Session = Depends(
     except Exception:
         pass  # keep request usable even if prediction fails
 
-    db.commit()
-    db.refresh(req)
+    req.status_events.append(
+        models.StatusEvent(from_status=None, to_status="Open", changed_by=requestor_name)
+    )
+
+    # first write of the transaction: SQLite's write lock must not be held across the LLM calls above
+    templates.learn(db, offer_text, extracted)
+    db.add(req)
+    db.flush()
+    rollups.add_request(db, req)
+    status_metrics.record_created(db, req)
+
+    # Save attachment (if the commit below fails, the upload GC removes the orphaned file)
+    safe_name = f"{req.id}_{filename}".replace("/", "_").replace("\\", "_")
+    save_path = UPLOAD_DIR / safe_name
+    save_path.write_bytes(contents)
+
+    att = models.Attachment(
+        request_id=req.id,
+        filename=filename,
+        path=str(save_path),
+    )
+    db.add(att)
+
+    if idempotency_key:
+        idempotency.complete(db, idempotency_key, CREATE_FROM_OFFER_SCOPE, stored_response(db, req))
+    commit_versioned(db, req)
     return req
 
 
@@ -303,22 +467,126 @@ async def upload_offer(request_id: int, file: UploadFile = File(...), db: Sessio
     return {"attachment_id": att.id, "filename": att.filename}
 
 
+def request_filters(
+    status: Optional[schemas.Status] = None,
+    department: Optional[str] = None,
+    vendor_name: Optional[str] = None,
+    commodity_group_id: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+) -> list:
+    """Query filters shared by the list and export endpoints."""
+    req = models.ProcurementRequest
+    filters = []
+    if status:
+        filters.append(req.current_status == status)
+    if department:
+        filters.append(req.department == department)
+    if vendor_name:
+        filters.append(req.vendor_name == vendor_name)
+    if commodity_group_id:
+        filters.append(req.commodity_group_id == commodity_group_id)
+    if created_from:
+        filters.append(req.created_at >= created_from)
+    if created_to:
+        filters.append(req.created_at < created_to)
+    return filters
+
+
 @router.get("", response_model=list[schemas.ProcurementRequestOut])
-def list_requests(db: Session = Depends(get_db)):
-    return db.query(models.ProcurementRequest).order_by(models.ProcurementRequest.id.desc()).all()
+def list_requests(filters: list = Depends(request_filters), db: Session = Depends(get_db)):
+    req = models.ProcurementRequest
+    return (
+        db.query(req)
+        .filter(*filters)
+        .order_by(req.id.desc())
+        .options(
+            selectinload(req.order_lines),
+            selectinload(req.status_events),
+            selectinload(req.commodity_group),
+        )
+        .all()
+    )
+
+
+@router.get("/export")
+def export_requests(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    include_archived: bool = False,
+    filters: list = Depends(request_filters),
+):
+    """Stream all matching requests with their order lines as NDJSON or CSV, in constant memory."""
+    batches = export.iter_request_batches(filters)
+    if include_archived and archive.archive_exists():
+        # archived requests follow the hot ones
+        batches = itertools.chain(batches, export.iter_request_batches(filters, session_factory=ArchiveSessionLocal))
+    if format == "csv":
+        body, media_type = export.csv_lines(batches), "text/csv"
+    else:
+        body, media_type = export.ndjson_lines(batches), "application/x-ndjson"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="requests.{format}"'},
+    )
+
+@router.get("/counts", response_model=schemas.StatusCountsOut)
+def request_counts(by_department: bool = False, db: Session = Depends(get_db)):
+    """Request counts per status (optionally per department), read from the status_counts table."""
+    statuses = ["Open", "In Progress", "Closed"]
+    by_status = dict.fromkeys(statuses, 0)
+    departments = {}
+
+    rows = db.query(models.StatusCount).filter(models.StatusCount.count != 0)
+    for row in rows:
+        by_status[row.status] = by_status.get(row.status, 0) + row.count
+        if by_department:
+            departments.setdefault(row.department, dict.fromkeys(statuses, 0))[row.status] = row.count
+
+    return {
+        "total": sum(by_status.values()),
+        "by_status": by_status,
+        "by_department": departments if by_department else None,
+    }
+
 
 @router.get("/{request_id}", response_model=schemas.ProcurementRequestOut)
-def get_request(request_id: int, db: Session = Depends(get_db)):
+def get_request(
+    request_id: int,
+    response: Response,
+    db: Session = Depends(get_db),
+    archive_db: Session = Depends(get_archive_db),
+):
     req = db.get(models.ProcurementRequest, request_id)
     if not req:
-        raise HTTPException(status_code=404, detail="Request not found")
+        req = archive.get_archived_request(archive_db, request_id)
+        if not req:
+            raise HTTPException(status_code=404, detail="Request not found")
+        response.headers["X-Archived"] = "true"
+    response.headers["ETag"] = f'"{req.version}"'
     return req
 
-@router.post("/{request_id}/extract-offer", response_model=schemas.ProcurementRequestOut)
-def extract_offer(request_id: int, db: Session = Depends(get_db)):
+@router.post(
+    "/{request_id}/extract-offer",
+    response_model=schemas.ProcurementRequestOut,
+    dependencies=[Depends(admission.admit("extract"))],
+)
+def extract_offer(
+    request_id: int,
+    response: Response,
+    if_match: Optional[str] = Header(default=None),
+    x_profile_token: Optional[str] = Header(default=None),
+    db: Session = Depends(get_db),
+):
+    with profiling.profiled(x_profile_token, response, f"extract_offer-{request_id}"):
+        return _extract_offer(request_id, response, if_match, db)
+
+
+def _extract_offer(request_id: int, response: Response, if_match: Optional[str], db: Session):
     req = db.get(models.ProcurementRequest, request_id)
     if not req:
         raise HTTPException(status_code=404, detail="Request not found")
+    check_version(req, if_match)
 
     # Get latest attachment
     att = (
@@ -358,21 +626,46 @@ def extract_offer(request_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=400, detail="Supported offer types: .txt, .pdf")
 
     # LLM extraction
+    template = templates.for_rules(templates.find(db, offer_text))
     try:
-        extracted = extract_offer_text(offer_text)
+        extracted = extract_offer_text(offer_text, template=template)
+    except llm.CircuitOpen as e:
+        raise llm_unavailable(e)
     except Exception as e:
         logger.error(f"LLM extraction failed for {att.filename}: {e}", exc_info=True)
         raise HTTPException(status_code=502, detail=f"Extraction failed: {e}")
 
+    # Predict commodity group (auto-fill) from the extracted fields before anything is
+    # written, so SQLite's write lock is not held across the LLM call
+    groups = db.query(models.CommodityGroup).order_by(models.CommodityGroup.id).all()
+    groups_text = "\n".join([f"{g.id} | {g.category} | {g.name}" for g in groups])
+    lines_text = "; ".join([line.description for line in extracted.order_lines])
+
+    predicted = None
+    try:
+        predicted = predict_commodity_group_id(
+            title=extracted.title or req.title,
+            department=req.department,
+            vendor_name=extracted.vendor_name,
+            order_lines_text=lines_text,
+            commodity_groups_text=groups_text,
+        )
+    except Exception:
+        pass  # keep request usable even if prediction fails
+
+    templates.learn(db, offer_text, extracted)
+
     # Apply extracted fields
+    rollups.remove_request(db, req)
     req.vendor_name = extracted.vendor_name
     req.vendor_vat_id = extracted.vendor_vat_id
     if extracted.title:
         req.title = extracted.title
+    if predicted and db.get(models.CommodityGroup, predicted):
+        req.commodity_group_id = predicted
 
     # Replace order lines + totals
     req.order_lines.clear()
-    total_cost = Decimal("0.00")
     for line in extracted.order_lines:
         req.order_lines.append(
             models.OrderLine(
@@ -386,65 +679,74 @@ def extract_offer(request_id: int, db: Session = Depends(get_db)):
         )
     req.total_cost = extracted.total_cost.quantize(Decimal("0.01"))
 
-    # Predict commodity group (auto-fill)
-    groups = db.query(models.CommodityGroup).order_by(models.CommodityGroup.id).all()
-    groups_text = "\n".join([f"{g.id} | {g.category} | {g.name}" for g in groups])
-    lines_text = "; ".join([ol.description for ol in req.order_lines])
-
-    try:
-        predicted = predict_commodity_group_id(
-            title=req.title,
-            department=req.department,
-            vendor_name=req.vendor_name,
-            order_lines_text=lines_text,
-            commodity_groups_text=groups_text,
-        )
-        if db.get(models.CommodityGroup, predicted):
-            req.commodity_group_id = predicted
-    except Exception:
-        pass  # keep request usable even if prediction fails
-
+    rollups.add_request(db, req)
     db.add(req)
-    db.commit()
-    db.refresh(req)
+    commit_versioned(db, req, response)
     return req
 
 
 @router.post("/{request_id}/status", response_model=schemas.ProcurementRequestOut)
-def change_status(request_id: int, payload: schemas.StatusChange, db: Session = Depends(get_db)):
+def change_status(
+    request_id: int,
+    payload: schemas.StatusChange,
+    response: Response,
+    if_match: Optional[str] = Header(default=None),
+    db: Session = Depends(get_db),
+):
     req = db.get(models.ProcurementRequest, request_id)
     if not req:
         raise HTTPException(status_code=404, detail="Request not found")
+    check_version(req, if_match, payload.expected_version)
 
+    rollups.remove_request(db, req)
     from_status = req.current_status
+    changed_at = status_metrics.utcnow()
     req.current_status = payload.to_status
     req.status_events.append(
-        models.StatusEvent(from_status=from_status, to_status=payload.to_status, changed_by=payload.changed_by)
+        models.StatusEvent(
+            from_status=from_status,
+            to_status=payload.to_status,
+            changed_at=changed_at,
+            changed_by=payload.changed_by,
+        )
     )
+    status_metrics.record_transition(db, req, from_status, changed_at)
+    rollups.add_request(db, req)
 
     db.add(req)
-    db.commit()
-    db.refresh(req)
+    commit_versioned(db, req, response)
     return req
 
 @router.post("/{request_id}/commodity-group", response_model=schemas.ProcurementRequestOut)
-def set_commodity_group(request_id: int, payload: schemas.CommodityGroupSet, db: Session = Depends(get_db)):
+def set_commodity_group(
+    request_id: int,
+    payload: schemas.CommodityGroupSet,
+    response: Response,
+    if_match: Optional[str] = Header(default=None),
+    db: Session = Depends(get_db),
+):
     req = db.get(models.ProcurementRequest, request_id)
     if not req:
         raise HTTPException(status_code=404, detail="Request not found")
+    check_version(req, if_match, payload.expected_version)
 
     cg = db.get(CommodityGroup, payload.commodity_group_id)
     if not cg:
         raise HTTPException(status_code=400, detail="Invalid commodity_group_id")
 
+    rollups.remove_request(db, req)
     req.commodity_group_id = payload.commodity_group_id
+    rollups.add_request(db, req)
     db.add(req)
-    db.commit()
-    db.refresh(req)
+    commit_versioned(db, req, response)
     return req
 
 
-@router.post("/predict-commodity-group", response_model=schemas.CommodityGroupPredictResponse)
+@router.post(
+    "/predict-commodity-group",
+    response_model=schemas.CommodityGroupPredictResponse,
+    dependencies=[Depends(admission.admit("predict"))],
+)
 def predict_commodity_group_from_title(payload: schemas.CommodityGroupPredictRequest, db: Session = Depends(get_db)):
     """Predict commodity group based solely on the request title."""
     groups = db.query(models.CommodityGroup).order_by(models.CommodityGroup.id).all()
@@ -460,6 +762,8 @@ def predict_commodity_group_from_title(payload: schemas.CommodityGroupPredictReq
         )
         if db.get(models.CommodityGroup, predicted):
             return {"commodity_group_id": predicted}
+    except llm.CircuitOpen as e:
+        raise llm_unavailable(e)
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"Prediction failed: {e}")
     
@@ -468,7 +772,13 @@ def predict_commodity_group_from_title(payload: schemas.CommodityGroupPredictReq
 
 @router.delete("")
 def delete_all_requests(db: Session = Depends(get_db)):
-    """Delete all procurement requests."""
-    db.query(models.ProcurementRequest).delete()
+    """Delete all procurement requests (chunked; lines, events and attachments cascade)."""
+    deleted = bulk.purge_requests(db)
+    # requests created while the purge ran survive it; recount from source rather than zeroing.
+    # The resets come first so this transaction holds SQLite's write lock before the rebuild reads.
+    rollups.reset(db)
+    status_metrics.reset(db)
+    rollups.rebuild(db)
+    status_metrics.rebuild(db)
     db.commit()
-    return {"message": "All requests deleted successfully"}
\ No newline at end of file
+    return {"message": "All requests deleted successfully", "deleted": deleted}
\ No newline at end of file
@@ -1,8 +1,8 @@
 from datetime import datetime
 from decimal import Decimal
-from typing import List, Optional, Literal
+from typing import Dict, List, Optional, Literal
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 
 
 Status = Literal["Open", "In Progress", "Closed"]
@@ -28,6 +28,33 @@ class ProcurementRequestCreate(BaseModel):
 class StatusChange(BaseModel):
     to_status: Status
     changed_by: Optional[str] = None
+    expected_version: Optional[int] = None  # alternative to the If-Match header
+
+
+class RequestFilter(BaseModel):
+    status: Optional[Status] = None
+    department: Optional[str] = None
+    vendor_name: Optional[str] = None
+    commodity_group_id: Optional[str] = None
+    created_from: Optional[datetime] = None
+    created_to: Optional[datetime] = None
+
+
+class BatchStatusChange(BaseModel):
+    """Apply one transition to explicit ids or to every request matching a filter."""
+
+    to_status: Status
+    changed_by: Optional[str] = None
+    ids: Optional[List[int]] = Field(default=None, min_length=1, max_length=100_000)
+    filter: Optional[RequestFilter] = None
+
+    @model_validator(mode="after")
+    def check_target(self):
+        if (self.ids is None) == (self.filter is None):
+            raise ValueError("Provide exactly one of 'ids' or 'filter'")
+        if self.filter is not None and not self.filter.model_dump(exclude_none=True):
+            raise ValueError("'filter' needs at least one field; it would match every request")
+        return self
 
 
 # ---- Response models ----
@@ -72,8 +99,10 @@ class ProcurementRequestOut(BaseModel):
     commodity_group_id: Optional[str] = None
     commodity_group: Optional[CommodityGroupOut] = None
     total_cost: Decimal
+    currency: str = "EUR"
     current_status: str
     created_at: datetime
+    version: int = 1
     order_lines: List[OrderLineOut] = []
     status_events: List[StatusEventOut] = []
     class Config:
@@ -81,6 +110,7 @@ class ProcurementRequestOut(BaseModel):
 
 class CommodityGroupSet(BaseModel):
     commodity_group_id: str = Field(min_length=3, max_length=3)
+    expected_version: Optional[int] = None  # alternative to the If-Match header
 
 class CommodityGroupPredictRequest(BaseModel):
     title: str = Field(min_length=1)
@@ -93,3 +123,77 @@ class ChatRequest(BaseModel):
 
 class ChatResponse(BaseModel):
     reply: str
+
+
+# ---- Analytics ----
+SpendDimension = Literal["department", "vendor", "commodity_group", "category", "status", "month"]
+
+
+class SpendBucketOut(BaseModel):
+    department: Optional[str] = None
+    vendor_name: Optional[str] = None
+    commodity_group_id: Optional[str] = None
+    category: Optional[str] = None
+    status: Optional[str] = None
+    month: Optional[str] = None
+    request_count: int
+    total_cost: Decimal
+    average_cost: Decimal
+
+
+MetricDimension = Literal["department", "commodity_group"]
+
+
+class StatusDurationOut(BaseModel):
+    department: Optional[str] = None
+    commodity_group_id: Optional[str] = None
+    status: str
+    count: int
+    average_hours: float
+    p50_hours: float
+    p90_hours: float
+    p95_hours: float
+
+
+class BacklogAgingOut(BaseModel):
+    department: Optional[str] = None
+    commodity_group_id: Optional[str] = None
+    status: str
+    buckets: Dict[str, int]
+
+
+class ThroughputOut(BaseModel):
+    week: str
+    to_status: str
+    department: Optional[str] = None
+    commodity_group_id: Optional[str] = None
+    count: int
+
+
+class StatusCountsOut(BaseModel):
+    total: int
+    by_status: Dict[str, int]
+    by_department: Optional[Dict[str, Dict[str, int]]] = None
+
+
+class BulkItemResult(BaseModel):
+    index: int
+    id: Optional[int] = None
+    errors: List[str] = []
+
+
+class BulkCreateResult(BaseModel):
+    created: int
+    failed: int
+    results: List[BulkItemResult]
+
+
+class SkippedRequest(BaseModel):
+    id: int
+    reason: Literal["not_found", "already_in_status", "conflict"]
+
+
+class BatchStatusResult(BaseModel):
+    to_status: str
+    updated: List[int]
+    skipped: List[SkippedRequest]
@@ -1,6 +1,3 @@
-from .db import Base, SessionLocal, engine
-from .models import CommodityGroup  # ensure models are imported before create_all
-
 COMMODITY_GROUPS = [
     ("001", "General Services", "Accommodation Rentals"),
     ("002", "General Services", "Membership Fees"),
@@ -56,16 +53,10 @@ COMMODITY_GROUPS = [
 
 
 def init_db():
-    Base.metadata.create_all(bind=engine)  # creates all tables registered on Base.metadata [web:217][web:213]
+    """Migrate and seed the database (a single SELECT when it is already current); see app.migrate."""
+    from .migrate import init_db as migrate_and_seed
 
-    db = SessionLocal()
-    try:
-        for cg_id, category, name in COMMODITY_GROUPS:
-            if db.get(CommodityGroup, cg_id) is None:
-                db.add(CommodityGroup(id=cg_id, category=category, name=name))
-        db.commit()
-    finally:
-        db.close()
+    migrate_and_seed()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,235 @@
+"""
+Admission control for the LLM-backed endpoints.
+
+Each endpoint runs in a lane with its own concurrency limit and a bounded wait
+queue; all lanes share ``ADMISSION_CAPACITY`` slots (roughly the number of LLM
+calls the process should have in flight). Interactive lanes (chat, commodity
+prediction) are served before bulk ingestion whenever a slot frees up, and
+``ADMISSION_INTERACTIVE_RESERVED`` slots are never given to bulk lanes, so a
+burst of uploads cannot starve them.
+
+An admitted request that makes several LLM calls at once borrows extra slots
+(``AdmissionController.borrow``) and runs only as many calls as it got.
+
+A request that finds its lane's queue full, or waits longer than
+``ADMISSION_MAX_WAIT`` seconds, is rejected with 429 and a ``Retry-After``
+estimated from the lane's recent service times. Limits are per process; with
+several workers the effective limits multiply.
+
+Routes opt in with ``dependencies=[Depends(admission.admit("chat"))]``; a
+route that has to do something before taking a slot (waiting for a duplicate
+idempotent call) uses ``async with admission.admitted("ingest")`` instead.
+"""
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Dict
+
+from fastapi import HTTPException
+
+from . import metrics
+
+ADMISSION_CAPACITY = int(os.getenv("ADMISSION_CAPACITY", "8"))
+ADMISSION_INTERACTIVE_RESERVED = int(os.getenv("ADMISSION_INTERACTIVE_RESERVED", "2"))
+ADMISSION_MAX_WAIT = float(os.getenv("ADMISSION_MAX_WAIT", "30"))
+
+INTERACTIVE, BULK = 0, 1  # lane priorities; lower is served first
+
+
+@dataclass
+class Lane:
+    name: str
+    priority: int
+    limit: int
+    queue_size: int
+    active: int = 0
+    service_time: float = 1.0  # moving average of seconds per admitted request, for Retry-After
+    waiting: deque = field(default_factory=deque)
+
+
+class _Waiter:
+    __slots__ = ("future", "granted")
+
+    def __init__(self, future: asyncio.Future):
+        self.future = future
+        self.granted = False
+
+
+def _wake(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+# name -> (priority, concurrency limit, queue size)
+LANES = {
+    "chat": (INTERACTIVE, 4, 16),
+    "predict": (INTERACTIVE, 4, 16),
+    "ingest": (BULK, 4, 32),  # POST /requests/create-from-offer
+    "extract": (BULK, 4, 32),  # POST /requests/{id}/extract-offer
+}
+
+
+class Rejected(Exception):
+    def __init__(self, lane: str, retry_after: int, reason: str):
+        super().__init__(f"{lane}: {reason}")
+        self.lane = lane
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        capacity: int = ADMISSION_CAPACITY,
+        interactive_reserved: int = ADMISSION_INTERACTIVE_RESERVED,
+        max_wait: float = ADMISSION_MAX_WAIT,
+        lanes: Dict[str, tuple] = LANES,
+    ):
+        self.capacity = capacity
+        self.bulk_capacity = max(1, capacity - interactive_reserved)
+        self.max_wait = max_wait
+        self.lanes = {name: Lane(name, *config) for name, config in lanes.items()}
+        self.active = 0
+        self.bulk_active = 0
+        self._lock = threading.Lock()
+
+    def _can_run(self, lane: Lane) -> bool:
+        return (
+            lane.active < lane.limit
+            and self.active < self.capacity
+            and (lane.priority == INTERACTIVE or self.bulk_active < self.bulk_capacity)
+        )
+
+    def _take(self, lane: Lane) -> None:
+        lane.active += 1
+        self.active += 1
+        if lane.priority != INTERACTIVE:
+            self.bulk_active += 1
+        metrics.ADMISSION_ACTIVE.inc(lane=lane.name)
+
+    def retry_after(self, lane: Lane) -> int:
+        """Seconds until a slot is likely free for a new request in ``lane``."""
+        return max(1, math.ceil(lane.service_time * (len(lane.waiting) + 1) / max(1, lane.limit)))
+
+    def _reject(self, lane: Lane, reason: str) -> Rejected:
+        metrics.ADMISSION_REJECTED.inc(lane=lane.name, reason=reason)
+        return Rejected(lane.name, self.retry_after(lane), reason)
+
+    async def acquire(self, name: str) -> None:
+        lane = self.lanes[name]
+        with self._lock:
+            if not lane.waiting and self._can_run(lane):
+                self._take(lane)
+                return
+            if len(lane.waiting) >= lane.queue_size:
+                raise self._reject(lane, "queue_full")
+            waiter = _Waiter(asyncio.get_running_loop().create_future())
+            lane.waiting.append(waiter)
+            metrics.ADMISSION_QUEUED.inc(lane=name)
+
+        try:
+            await asyncio.wait({waiter.future}, timeout=self.max_wait)
+        except asyncio.CancelledError:  # client went away while queued
+            with self._lock:
+                if not self._withdraw(lane, waiter):
+                    self._release_locked(lane, None)
+            raise
+        with self._lock:
+            if self._withdraw(lane, waiter):
+                raise self._reject(lane, "timeout")
+            # granted, possibly just as the wait timed out: the slot is ours
+
+    def _withdraw(self, lane: Lane, waiter: _Waiter) -> bool:
+        """Remove a waiter that has not been granted a slot; False if it already was."""
+        if waiter.granted:
+            return False
+        lane.waiting.remove(waiter)
+        metrics.ADMISSION_QUEUED.dec(lane=lane.name)
+        return True
+
+    def release(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self._release_locked(self.lanes[name], seconds)
+
+    def _release_locked(self, lane: Lane, seconds) -> None:
+        lane.active -= 1
+        self.active -= 1
+        if lane.priority != INTERACTIVE:
+            self.bulk_active -= 1
+        if seconds is not None:
+            lane.service_time = 0.8 * lane.service_time + 0.2 * seconds
+        metrics.ADMISSION_ACTIVE.dec(lane=lane.name)
+        self._dispatch()
+
+    def borrow(self, wanted: int) -> int:
+        """
+        Take up to ``wanted`` free bulk slots without waiting, for extra LLM calls
+        an admitted request makes in parallel (chunked extraction). Nothing is
+        lent while requests are queued. Returns the number taken; hand them back
+        with ``give_back``.
+        """
+        with self._lock:
+            if wanted <= 0 or any(lane.waiting for lane in self.lanes.values()):
+                return 0
+            granted = max(0, min(wanted, self.capacity - self.active, self.bulk_capacity - self.bulk_active))
+            self.active += granted
+            self.bulk_active += granted
+            return granted
+
+    def give_back(self, count: int) -> None:
+        if count <= 0:
+            return
+        with self._lock:
+            self.active -= count
+            self.bulk_active -= count
+            self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Hand free slots to queued requests, interactive lanes first (called with the lock held)."""
+        for lane in sorted(self.lanes.values(), key=lambda lane: lane.priority):
+            while lane.waiting and self._can_run(lane):
+                waiter = lane.waiting.popleft()
+                metrics.ADMISSION_QUEUED.dec(lane=lane.name)
+                self._take(lane)
+                waiter.granted = True
+                # waiters may belong to another event loop (e.g. per-request loops in tests)
+                waiter.future.get_loop().call_soon_threadsafe(_wake, waiter.future)
+
+
+controller = AdmissionController()
+
+
+@asynccontextmanager
+async def admitted(lane: str):
+    """Hold a slot in ``lane`` for the enclosed block; 429 when the lane is saturated."""
+    current = controller  # the controller that granted the slot also gets it back
+    try:
+        await current.acquire(lane)
+    except Rejected as e:
+        raise HTTPException(
+            status_code=429,
+            detail=f"Too many concurrent {lane} requests ({e.reason.replace('_', ' ')}); retry later",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        current.release(lane, time.monotonic() - start)
+
+
+def admit(lane: str):
+    """Route dependency holding a slot in ``lane`` for the duration of the request."""
+    if lane not in LANES:
+        raise ValueError(f"Unknown admission lane {lane!r}")
+
+    async def dependency():
+        async with admitted(lane):
+            yield
+
+    return dependency
@@ -0,0 +1,115 @@
+"""
+Retention: move old closed requests out of the hot tables into archive.db.
+
+``archive_closed_requests`` attaches the archive file to a main-database
+connection and moves requests that have been ``Closed`` for longer than
+``older_than`` in batches: each batch copies the requests, their order lines,
+status events and attachment metadata with INSERT ... SELECT and deletes them
+from the hot tables (children cascade), in one transaction per batch. Both
+files are committed atomically, so a request is never lost or duplicated.
+
+Archived requests leave the spend rollups and status counters, which describe
+the hot set. Status-duration and throughput histograms keep their history, but
+``rebuild_rollups`` only replays hot status events. Attachment files stay in
+the upload store and count as referenced for the upload GC.
+
+Archived rows are read-only: ``get_archived_request`` serves reads of archived
+ids and exports can include them.
+"""
+import os
+from datetime import timedelta
+from pathlib import Path
+from typing import Optional
+
+from sqlalchemy import bindparam, delete, select, text
+from sqlalchemy.orm import Session
+
+from ..db import Base, archive_engine, engine
+from .. import models
+from . import rollups
+from .bulk import TRANSITION_COLUMNS
+from .status_metrics import utcnow
+
+ARCHIVE_AFTER = timedelta(days=int(os.getenv("ARCHIVE_AFTER_DAYS", "365")))
+ARCHIVE_BATCH_SIZE = 500
+
+ARCHIVE_PATH = Path(archive_engine.url.database)
+
+# parents before children, so foreign keys inside the archive file hold at every step
+ARCHIVED_TABLES = [
+    models.CommodityGroup.__table__,
+    models.ProcurementRequest.__table__,
+    models.OrderLine.__table__,
+    models.Attachment.__table__,
+    models.StatusEvent.__table__,
+]
+
+
+def archive_exists() -> bool:
+    return ARCHIVE_PATH.exists()
+
+
+def ensure_schema() -> None:
+    Base.metadata.create_all(bind=archive_engine, tables=ARCHIVED_TABLES)
+
+
+def _copy_statement(table, key_column: str):
+    columns = ", ".join(column.name for column in table.columns)
+    return text(
+        f"INSERT INTO archive.{table.name} ({columns}) "
+        f"SELECT {columns} FROM main.{table.name} WHERE {key_column} IN :ids"
+    ).bindparams(bindparam("ids", expanding=True))
+
+
+def archive_closed_requests(older_than: timedelta = ARCHIVE_AFTER, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """Move requests closed before ``now - older_than`` into archive.db. Returns the number moved."""
+    ensure_schema()
+    req = models.ProcurementRequest
+    cutoff = utcnow() - older_than
+    copies = [_copy_statement(ARCHIVED_TABLES[1], "id")] + [
+        _copy_statement(table, "request_id") for table in ARCHIVED_TABLES[2:]
+    ]
+
+    moved = 0
+    with engine.connect() as conn:
+        conn.exec_driver_sql("ATTACH DATABASE ? AS archive", (str(ARCHIVE_PATH),))
+        conn.commit()
+        try:
+            with Session(bind=conn, autoflush=False) as db:
+                db.execute(text("INSERT OR REPLACE INTO archive.commodity_groups SELECT * FROM main.commodity_groups"))
+                db.commit()
+                while True:
+                    rows = list(
+                        db.execute(
+                            select(*TRANSITION_COLUMNS)
+                            .where(req.current_status == "Closed", req.status_changed_at < cutoff)
+                            .order_by(req.id)
+                            .limit(batch_size)
+                        )
+                    )
+                    if not rows:
+                        break
+                    ids = [row.id for row in rows]
+                    for statement in copies:
+                        db.execute(statement, {"ids": ids})
+                    db.execute(delete(req).where(req.id.in_(ids)).execution_options(synchronize_session=False))
+                    rollups.apply_rows(db, rows, sign=-1)
+                    db.commit()
+                    moved += len(rows)
+        finally:
+            conn.exec_driver_sql("DETACH DATABASE archive")
+    return moved
+
+
+def get_archived_request(archive_db: Session, request_id: int) -> Optional[models.ProcurementRequest]:
+    """Read-through lookup for ids that are no longer in the hot tables."""
+    if not archive_exists():
+        return None
+    return archive_db.get(models.ProcurementRequest, request_id)
+
+
+def archived_attachment_paths(archive_db: Session) -> list:
+    if not archive_exists():
+        return []
+    ensure_schema()
+    return list(archive_db.scalars(select(models.Attachment.path)))
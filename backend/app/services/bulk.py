@@ -0,0 +1,274 @@
+"""
+Set-based bulk operations on procurement requests.
+
+``create_requests``: payloads are validated one by one so a bad item only fails
+itself. Valid items are inserted in chunked transactions: one multi-row
+INSERT ... RETURNING for the requests, then executemany inserts for their order
+lines and initial StatusEvents, and one aggregated upsert per rollup table.
+
+``change_status_batch``: one transaction with a guarded UPDATE per distinct
+from-status, a bulk StatusEvent insert and aggregated rollup/metric updates.
+
+``purge_requests``: deletes in short chunked transactions so the SQLite write
+lock is released between chunks; order lines, attachments and status events go
+with their request via ON DELETE CASCADE. Upload files are left to the sweeper
+in ``services.uploads``.
+"""
+from decimal import Decimal
+from types import SimpleNamespace
+from typing import Any, List
+
+from pydantic import ValidationError
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from .. import models, schemas
+from . import rollups, status_metrics
+
+BULK_CHUNK_SIZE = 1000
+PURGE_CHUNK_SIZE = 500
+
+
+def _validation_errors(e: ValidationError) -> List[str]:
+    return [f"{'.'.join(str(part) for part in err['loc']) or 'body'}: {err['msg']}" for err in e.errors()]
+
+
+def _insert_chunk(db: Session, chunk: list) -> List[int]:
+    now = status_metrics.utcnow()
+    request_rows = []
+    lines_per_request = []
+    for payload in chunk:
+        total_cost = Decimal("0.00")
+        lines = []
+        for line in payload.order_lines:
+            line_total = (line.unit_price * Decimal(line.amount)).quantize(Decimal("0.01"))
+            total_cost += line_total
+            lines.append(
+                {
+                    "product": line.product,
+                    "description": line.description,
+                    "unit_price": line.unit_price,
+                    "amount": line.amount,
+                    "unit": line.unit,
+                    "total_price": line_total,
+                }
+            )
+        request_rows.append(
+            {
+                "requestor_name": payload.requestor_name,
+                "title": payload.title,
+                "department": payload.department,
+                "vendor_name": payload.vendor_name,
+                "vendor_vat_id": payload.vendor_vat_id,
+                "commodity_group_id": None,
+                "current_status": "Open",
+                "total_cost": total_cost.quantize(Decimal("0.01")),
+                "created_at": now,
+                "status_changed_at": now,
+                "updated_at": now,
+                "version": 1,
+            }
+        )
+        lines_per_request.append(lines)
+
+    ids = list(
+        db.scalars(
+            insert(models.ProcurementRequest).returning(models.ProcurementRequest.id, sort_by_parameter_order=True),
+            request_rows,
+        )
+    )
+
+    line_rows = [
+        {**line, "request_id": request_id}
+        for request_id, lines in zip(ids, lines_per_request)
+        for line in lines
+    ]
+    event_rows = [
+        {
+            "request_id": request_id,
+            "from_status": None,
+            "to_status": "Open",
+            "changed_at": now,
+            "changed_by": row["requestor_name"],
+        }
+        for request_id, row in zip(ids, request_rows)
+    ]
+    db.execute(insert(models.OrderLine), line_rows)
+    db.execute(insert(models.StatusEvent), event_rows)
+
+    created = [SimpleNamespace(**row) for row in request_rows]
+    rollups.apply_rows(db, created)
+    status_metrics.record_created_rows(db, created)
+    return ids
+
+
+def create_requests(db: Session, payloads: List[Any], chunk_size: int = BULK_CHUNK_SIZE) -> dict:
+    """
+    Validate and insert many ProcurementRequestCreate payloads.
+
+    Each chunk is committed on its own; if a chunk fails in the database, only
+    its items are reported as failed. Returns per-item results in input order.
+    """
+    results: List[dict] = [None] * len(payloads)
+    valid = []
+    for index, raw in enumerate(payloads):
+        try:
+            valid.append((index, schemas.ProcurementRequestCreate.model_validate(raw)))
+        except ValidationError as e:
+            results[index] = {"index": index, "id": None, "errors": _validation_errors(e)}
+
+    for start in range(0, len(valid), chunk_size):
+        chunk = valid[start:start + chunk_size]
+        try:
+            ids = _insert_chunk(db, [payload for _, payload in chunk])
+            db.commit()
+        except SQLAlchemyError as e:
+            db.rollback()
+            for index, _ in chunk:
+                results[index] = {"index": index, "id": None, "errors": [f"database error: {e.__class__.__name__}"]}
+            continue
+        for (index, _), request_id in zip(chunk, ids):
+            results[index] = {"index": index, "id": request_id, "errors": []}
+
+    created = sum(1 for result in results if result["id"] is not None)
+    return {"created": created, "failed": len(results) - created, "results": results}
+
+
+# keeps IN (...) lists well below SQLite's bound-parameter limit
+ID_CHUNK_SIZE = 500
+
+TRANSITION_COLUMNS = [
+    models.ProcurementRequest.id,
+    models.ProcurementRequest.department,
+    models.ProcurementRequest.vendor_name,
+    models.ProcurementRequest.commodity_group_id,
+    models.ProcurementRequest.current_status,
+    models.ProcurementRequest.created_at,
+    models.ProcurementRequest.status_changed_at,
+    models.ProcurementRequest.total_cost,
+]
+
+
+def _chunks(items: list, size: int = ID_CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def change_status_batch(
+    db: Session,
+    to_status: str,
+    changed_by: str = None,
+    ids: List[int] = None,
+    filters: list = None,
+) -> dict:
+    """
+    Move many requests to ``to_status`` in one transaction.
+
+    Each StatusEvent records the status the request actually had when the
+    UPDATE matched it: the UPDATE is guarded by ``current_status = from_status``,
+    so a request changed concurrently is reported as a conflict instead of
+    getting an event with a stale ``from_status``.
+    """
+    req = models.ProcurementRequest
+    if ids is not None:
+        wanted = list(dict.fromkeys(ids))
+        rows = [
+            row
+            for chunk in _chunks(wanted)
+            for row in db.execute(select(*TRANSITION_COLUMNS).where(req.id.in_(chunk)))
+        ]
+    else:
+        wanted = None
+        rows = list(db.execute(select(*TRANSITION_COLUMNS).where(*filters).order_by(req.id)))
+
+    skipped = []
+    if wanted is not None:
+        found = {row.id for row in rows}
+        skipped += [{"id": request_id, "reason": "not_found"} for request_id in wanted if request_id not in found]
+    skipped += [{"id": row.id, "reason": "already_in_status"} for row in rows if row.current_status == to_status]
+
+    by_from_status = {}
+    for row in rows:
+        if row.current_status != to_status:
+            by_from_status.setdefault(row.current_status, []).append(row)
+
+    changed_at = status_metrics.utcnow()
+    moved = []
+    for from_status, candidates in by_from_status.items():
+        updated_ids = set()
+        for chunk in _chunks(candidates):
+            updated_ids.update(
+                db.scalars(
+                    update(req)
+                    .where(req.id.in_([row.id for row in chunk]), req.current_status == from_status)
+                    .values(
+                        current_status=to_status,
+                        status_changed_at=changed_at,
+                        updated_at=changed_at,
+                        version=req.version + 1,
+                    )
+                    .returning(req.id)
+                    .execution_options(synchronize_session=False)
+                )
+            )
+        for row in candidates:
+            if row.id in updated_ids:
+                moved.append(row)
+            else:
+                skipped.append({"id": row.id, "reason": "conflict"})
+
+    if moved:
+        db.execute(
+            insert(models.StatusEvent),
+            [
+                {
+                    "request_id": row.id,
+                    "from_status": row.current_status,
+                    "to_status": to_status,
+                    "changed_at": changed_at,
+                    "changed_by": changed_by,
+                }
+                for row in moved
+            ],
+        )
+        rollups.apply_rows(db, moved, sign=-1)
+        rollups.apply_rows(db, [SimpleNamespace(**{**row._asdict(), "current_status": to_status}) for row in moved])
+        status_metrics.record_transition_rows(db, moved, to_status, changed_at)
+
+    db.commit()
+    moved_ids = sorted(row.id for row in moved)
+    return {"to_status": to_status, "updated": moved_ids, "skipped": sorted(skipped, key=lambda item: item["id"])}
+
+
+def purge_requests(db: Session, filters: list = (), chunk_size: int = PURGE_CHUNK_SIZE) -> int:
+    """
+    Delete all requests matching ``filters`` (all requests by default), one chunk per transaction.
+
+    Rollups are decremented in the same transaction as each chunk, so counters stay
+    consistent while the purge runs. Returns the number of deleted requests.
+    """
+    req = models.ProcurementRequest
+    deleted = 0
+    last_id = 0
+    while True:
+        rows = list(
+            db.execute(
+                select(*TRANSITION_COLUMNS)
+                .where(*filters, req.id > last_id)
+                .order_by(req.id)
+                .limit(chunk_size)
+                .execution_options(batched=True)
+            )
+        )
+        if not rows:
+            return deleted
+        last_id = rows[-1].id
+        db.execute(
+            delete(req)
+            .where(req.id.in_([row.id for row in rows]))
+            .execution_options(synchronize_session=False)
+        )
+        rollups.apply_rows(db, rows, sign=-1)
+        db.commit()
+        deleted += len(rows)
@@ -0,0 +1,135 @@
+"""
+Record/replay of LLM responses ("cassettes") below the call sites in ``services.llm``.
+
+In ``record`` mode every completion is made for real and saved as a JSON file
+keyed by a hash of the call site and the request (model, messages, response
+format, options). In ``replay`` mode the saved response is returned instead,
+optionally after an artificial delay, and no API key or network is needed; a
+request that was never recorded raises ``CassetteMiss``. Changing a prompt
+changes the key, so stale recordings are never replayed silently.
+
+Configured with ``LLM_CASSETTE_MODE`` (off, record or replay),
+``LLM_CASSETTE_DIR`` and ``LLM_REPLAY_LATENCY`` (seconds, or ``recorded`` to
+sleep as long as the recorded call took), or programmatically with ``use()``.
+"""
+import hashlib
+import json
+import os
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Optional, Union
+
+OFF, RECORD, REPLAY = "off", "record", "replay"
+
+
+class CassetteMiss(LookupError):
+    """Replay mode got a request that has no recording."""
+
+
+def _unavailable(**kwargs):
+    raise RuntimeError("LLM calls are replayed from cassettes; the replay client cannot reach the API")
+
+
+# handed out by llm.get_client() while replaying, so call sites don't bail out for a missing API key
+REPLAY_CLIENT = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(parse=_unavailable, create=_unavailable)))
+
+
+@dataclass
+class Cassette:
+    mode: str
+    directory: Path
+    latency: Union[float, str] = 0.0  # seconds, or "recorded"
+
+    def key(self, call_site: str, kwargs: dict) -> str:
+        request = dict(kwargs)
+        response_format = request.pop("response_format", None)
+        request["response_format"] = getattr(response_format, "__name__", response_format)
+        payload = json.dumps({"call_site": call_site, **request}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def path(self, call_site: str, kwargs: dict) -> Path:
+        return Path(self.directory) / call_site / f"{self.key(call_site, kwargs)[:32]}.json"
+
+    def record(self, call_site: str, kwargs: dict, completion, seconds: float) -> Path:
+        message = completion.choices[0].message
+        parsed = getattr(message, "parsed", None)
+        usage = getattr(completion, "usage", None)
+        data = {
+            "call_site": call_site,
+            "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "latency": seconds,
+            "request": {name: value for name, value in kwargs.items() if name != "response_format"},
+            "response": {
+                "model": getattr(completion, "model", kwargs.get("model")),
+                "content": message.content,
+                "parsed": parsed.model_dump(mode="json") if parsed is not None else None,
+                "refusal": getattr(message, "refusal", None),
+            },
+            "usage": {
+                "prompt_tokens": usage.prompt_tokens,
+                "completion_tokens": usage.completion_tokens,
+            } if usage is not None else None,
+        }
+        path = self.path(call_site, kwargs)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(data, indent=2, ensure_ascii=False, default=str) + "\n", encoding="utf-8")
+        return path
+
+    def replay(self, call_site: str, kwargs: dict):
+        path = self.path(call_site, kwargs)
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            raise CassetteMiss(f"No recording for this {call_site} request ({path.name}); run in record mode first")
+
+        delay = data["latency"] if self.latency == "recorded" else float(self.latency)
+        if delay > 0:
+            time.sleep(delay)
+
+        response = data["response"]
+        response_format = kwargs.get("response_format")
+        parsed = None
+        if response["parsed"] is not None and response_format is not None:
+            parsed = response_format.model_validate(response["parsed"])
+        message = SimpleNamespace(content=response["content"], parsed=parsed, refusal=response["refusal"])
+        usage = SimpleNamespace(**data["usage"]) if data["usage"] else None
+        return SimpleNamespace(model=response["model"], choices=[SimpleNamespace(message=message)], usage=usage)
+
+
+def _from_env() -> Optional[Cassette]:
+    mode = os.getenv("LLM_CASSETTE_MODE", OFF)
+    if mode == OFF:
+        return None
+    if mode not in (RECORD, REPLAY):
+        raise ValueError(f"LLM_CASSETTE_MODE must be off, record or replay, not {mode!r}")
+    latency = os.getenv("LLM_REPLAY_LATENCY", "0")
+    return Cassette(
+        mode=mode,
+        directory=Path(os.getenv("LLM_CASSETTE_DIR", "cassettes")),
+        latency=latency if latency == "recorded" else float(latency),
+    )
+
+
+_active: Optional[Cassette] = _from_env()
+
+
+def active() -> Optional[Cassette]:
+    return _active
+
+
+def replaying() -> bool:
+    return _active is not None and _active.mode == REPLAY
+
+
+@contextmanager
+def use(cassette: Optional[Cassette]):
+    """Record or replay with ``cassette`` (None disables) for the enclosed block, process-wide."""
+    global _active
+    previous, _active = _active, cassette
+    try:
+        yield cassette
+    finally:
+        _active = previous
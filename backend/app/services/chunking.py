@@ -0,0 +1,53 @@
+"""
+Splitting long offer texts into chunks for map-reduce extraction.
+
+Chunks break at page boundaries first (``extract_text_from_pdf`` separates pages
+with a blank line), then between lines. A run of pipe-delimited table rows is
+kept together unless it alone exceeds the limit. Small blocks are packed
+together, so a document becomes as few chunks of at most ``limit`` characters
+as its structure allows.
+"""
+import re
+from typing import List
+
+
+def _is_table_row(line: str) -> bool:
+    return line.count("|") >= 2
+
+
+def _units(block: str) -> List[str]:
+    """Lines of ``block``, with consecutive table rows joined into one unit."""
+    units: List[str] = []
+    for line in block.split("\n"):
+        if units and _is_table_row(line) and _is_table_row(units[-1].rsplit("\n", 1)[-1]):
+            units[-1] += "\n" + line
+        else:
+            units.append(line)
+    return units
+
+
+def _pack(pieces: List[str], limit: int, separator: str) -> List[str]:
+    chunks: List[str] = []
+    for piece in pieces:
+        if chunks and len(chunks[-1]) + len(separator) + len(piece) <= limit:
+            chunks[-1] += separator + piece
+        else:
+            chunks.append(piece)
+    return chunks
+
+
+def split_text(text: str, limit: int) -> List[str]:
+    """``text`` in chunks of at most ``limit`` characters (longer only for a single line that is)."""
+    if len(text) <= limit:
+        return [text]
+    pieces: List[str] = []
+    for block in re.split(r"\n\s*\n", text):
+        if len(block) <= limit:
+            pieces.append(block)
+            continue
+        for unit in _pack(_units(block), limit, "\n"):
+            if len(unit) <= limit:
+                pieces.append(unit)
+            else:  # a table longer than a chunk: split it between rows after all
+                pieces.extend(_pack(unit.split("\n"), limit, "\n"))
+    return _pack([piece for piece in pieces if piece.strip()], limit, "\n\n")
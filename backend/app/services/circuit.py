@@ -0,0 +1,127 @@
+"""
+Circuit breaker for the LLM provider.
+
+Every completion in ``services.llm`` passes through ``CircuitBreaker``. After
+``LLM_BREAKER_FAILURES`` consecutive provider failures, where a call slower than
+``LLM_BREAKER_SLOW_CALL`` seconds counts as a failure too, the circuit opens and
+calls fail immediately with ``CircuitOpen`` instead of waiting for the client
+timeout. After ``LLM_BREAKER_COOLDOWN`` seconds it half-opens: one probe call
+goes through, and its outcome closes the circuit or reopens it for another
+cooldown.
+
+Only provider trouble counts: timeouts, connection errors, 429 and 5xx
+responses. A 4xx answer to a bad request says nothing about the provider's
+health. State is per process.
+"""
+import math
+import os
+import sys
+import threading
+import time
+
+from . import metrics
+
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_SLOW_CALL = float(os.getenv("LLM_BREAKER_SLOW_CALL", "20"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}  # exported as llm_circuit_state
+
+
+class CircuitOpen(RuntimeError):
+    """The provider is considered down; the call was not attempted."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"LLM provider unavailable (circuit open); retry in {retry_after} s")
+        self.retry_after = retry_after
+
+
+def is_provider_failure(error: Exception) -> bool:
+    """
+    Whether ``error`` from an OpenAI client call means the provider is in trouble.
+
+    Other exceptions (a truncated completion, a response failing validation, a
+    cassette miss) happened after the provider answered, so they don't count.
+    """
+    openai = sys.modules.get("openai")  # loaded with the client; if it isn't, no API call was made
+    if openai is None:
+        return False
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return isinstance(error, (openai.APITimeoutError, openai.APIConnectionError))
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        failure_threshold: int = LLM_BREAKER_FAILURES,
+        slow_call: float = LLM_BREAKER_SLOW_CALL,
+        cooldown: float = LLM_BREAKER_COOLDOWN,
+        clock=time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.slow_call = slow_call
+        self.cooldown = cooldown
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        self._set(CLOSED)
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current()
+
+    def _current(self) -> str:
+        if self._state == OPEN and self.clock() - self.opened_at >= self.cooldown:
+            self._set(HALF_OPEN)
+        return self._state
+
+    def _set(self, state: str) -> None:
+        self._state = state
+        metrics.LLM_CIRCUIT_STATE.set(STATE_VALUES[state])
+
+    def retry_after(self) -> int:
+        with self._lock:
+            if self._current() != OPEN:
+                return 1
+            return max(1, math.ceil(self.opened_at + self.cooldown - self.clock()))
+
+    def before_call(self) -> None:
+        """Raise ``CircuitOpen`` unless a call may go ahead now."""
+        with self._lock:
+            state = self._current()
+            if state == CLOSED:
+                return
+            if state == HALF_OPEN and not self._probing:
+                self._probing = True  # this call is the probe
+                return
+            remaining = self.opened_at + self.cooldown - self.clock() if state == OPEN else 1
+        raise CircuitOpen(max(1, math.ceil(remaining)))
+
+    def record_success(self, seconds: float) -> None:
+        if seconds >= self.slow_call:
+            self.record_failure()
+            return
+        with self._lock:
+            self.failures = 0
+            self._probing = False
+            if self._state != CLOSED:
+                self._set(CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            probe_failed, self._probing = self._probing, False
+            if probe_failed or (self._state == CLOSED and self.failures >= self.failure_threshold):
+                self.opened_at = self.clock()
+                self._set(OPEN)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self._probing = False
+            self._set(CLOSED)
@@ -1,14 +1,19 @@
-from dotenv import load_dotenv
-from openai import OpenAI
+import logging
+import re
+import threading
+from collections import OrderedDict
+from typing import Optional
+
 from pydantic import BaseModel, Field
-import os
 
-load_dotenv()
+from . import llm, metrics
+
+logger = logging.getLogger(__name__)
 
-# Only initialize OpenAI client if API key is available
-client = None
-if os.getenv("OPENAI_API_KEY"):
-    client = OpenAI()
+# Recent LLM predictions, reused while the LLM is unavailable (see fallback_commodity_group_id)
+CACHE_SIZE = 1024
+_recent: "OrderedDict[tuple, str]" = OrderedDict()
+_recent_lock = threading.Lock()
 
 
 class CommodityPrediction(BaseModel):
@@ -23,39 +28,103 @@ def predict_commodity_group_id(
     order_lines_text: str,
     commodity_groups_text: str,
 ) -> str:
+    client = llm.get_client()
     if not client:
         raise RuntimeError(
             "OpenAI API key is not configured. "
             "Please set OPENAI_API_KEY in your .env file or environment variables."
         )
-    
-    completion = client.chat.completions.parse(
-        model="gpt-4o-mini",
-        messages=[
-            {
-                "role": "system",
-                "content": (
-                    "You are a procurement commodity classifier.\n"
-                    "Pick exactly ONE commodity_group_id from the list provided by the user.\n"
-                    "Return only the JSON that matches the schema."
-                ),
-            },
-            {
-                "role": "user",
-                "content": (
-                    f"Commodity groups (ID | Category | Name):\n{commodity_groups_text}\n\n"
-                    f"Request title: {title}\n"
-                    f"Department: {department}\n"
-                    f"Vendor: {vendor_name}\n"
-                    f"Order lines: {order_lines_text}\n"
-                ),
-            },
-        ],
-        response_format=CommodityPrediction,
-    )
+
+    key = (title.strip().casefold(), vendor_name.strip().casefold(), order_lines_text.strip().casefold())
+    try:
+        completion = llm.parse(
+            "commodity",
+            client,
+            model="gpt-4o-mini",
+            messages=[
+                {
+                    "role": "system",
+                    "content": (
+                        "You are a procurement commodity classifier.\n"
+                        "Pick exactly ONE commodity_group_id from the list provided by the user.\n"
+                        "Return only the JSON that matches the schema."
+                    ),
+                },
+                {
+                    "role": "user",
+                    "content": (
+                        f"Commodity groups (ID | Category | Name):\n{commodity_groups_text}\n\n"
+                        f"Request title: {title}\n"
+                        f"Department: {department}\n"
+                        f"Vendor: {vendor_name}\n"
+                        f"Order lines: {order_lines_text}\n"
+                    ),
+                },
+            ],
+            response_format=CommodityPrediction,
+        )
+    except llm.CircuitOpen:
+        predicted = fallback_commodity_group_id(key, title, order_lines_text, commodity_groups_text)
+        if predicted is None:
+            raise
+        return predicted
 
     msg = completion.choices[0].message
     if msg.parsed:
+        with _recent_lock:
+            _recent[key] = msg.parsed.commodity_group_id
+            _recent.move_to_end(key)
+            if len(_recent) > CACHE_SIZE:
+                _recent.popitem(last=False)
         return msg.parsed.commodity_group_id
 
     raise RuntimeError(msg.refusal or "No parsed commodity prediction returned")
+
+
+# too generic to tell groups apart
+_STOPWORDS = {"and", "for", "the", "general", "services", "costs", "management", "other"}
+
+
+def _words(text: str) -> set:
+    return {word for word in re.findall(r"[^\W\d_]{3,}", text.casefold()) if word not in _STOPWORDS}
+
+
+def classify_locally(text: str, commodity_groups_text: str) -> Optional[str]:
+    """
+    Best keyword match of ``text`` against the commodity group list ("ID | Category | Name" lines).
+
+    Group name words count twice as much as category words; a word also matches
+    as part of a German compound ("Software" in "Softwarelizenz"). None when
+    nothing matches.
+    """
+    words = _words(text)
+    best, best_score = None, (0, 0.0)
+    for line in commodity_groups_text.splitlines():
+        parts = [part.strip() for part in line.split("|")]
+        if len(parts) != 3:
+            continue
+        group_id, category, name = parts
+        terms = [(2, term) for term in _words(name)] + [(1, term) for term in _words(category)]
+        hits = sum(
+            weight for weight, term in terms
+            if term in words or (len(term) > 3 and any(term in word for word in words))
+        )
+        # ties go to the group whose terms matched most completely ("Software" over "Software Development ...")
+        score = (hits, hits / sum(weight for weight, _ in terms)) if hits else (0, 0.0)
+        if score > best_score:
+            best, best_score = group_id, score
+    return best
+
+
+def fallback_commodity_group_id(key: tuple, title: str, order_lines_text: str, commodity_groups_text: str) -> Optional[str]:
+    """Prediction without the LLM: an earlier prediction for the same request, else a keyword match."""
+    with _recent_lock:
+        cached = _recent.get(key)
+    if cached is not None:
+        source, predicted = "cache", cached
+    else:
+        source, predicted = "local", classify_locally(f"{title}\n{order_lines_text}", commodity_groups_text)
+    if predicted is not None:
+        metrics.LLM_FALLBACKS.inc(call_site="commodity", source=source)
+        logger.warning(f"LLM unavailable; commodity group {predicted} from {source} fallback")
+    return predicted
@@ -0,0 +1,127 @@
+"""
+Streaming exports of procurement requests with their order lines.
+
+Rows are read in keyset-paginated batches (``id > last_id ORDER BY id LIMIT n``)
+with order lines and status events loaded per batch via selectinload. Each
+batch runs in its own short read transaction and is expunged once written, so
+memory stays flat regardless of table size and a long export never holds a
+SQLite read lock that would block writers.
+"""
+import csv
+import io
+from typing import Iterable, Iterator
+
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+
+from ..db import SessionLocal
+from .. import models, schemas
+
+EXPORT_BATCH_SIZE = 500
+
+CSV_COLUMNS = [
+    "request_id",
+    "title",
+    "requestor_name",
+    "department",
+    "vendor_name",
+    "vendor_vat_id",
+    "commodity_group_id",
+    "current_status",
+    "total_cost",
+    "currency",
+    "created_at",
+    "line_id",
+    "product",
+    "description",
+    "unit_price",
+    "amount",
+    "unit",
+    "total_price",
+]
+
+
+def iter_request_batches(
+    filters: list,
+    batch_size: int = EXPORT_BATCH_SIZE,
+    session_factory=SessionLocal,
+) -> Iterator[list]:
+    """Yield lists of fully loaded ProcurementRequest objects, oldest first (from archive.db with ArchiveSessionLocal)."""
+    req = models.ProcurementRequest
+    db = session_factory()
+    try:
+        last_id = 0
+        while True:
+            batch = db.scalars(
+                select(req)
+                .where(*filters, req.id > last_id)
+                .order_by(req.id)
+                .limit(batch_size)
+                .options(
+                    selectinload(req.order_lines),
+                    selectinload(req.status_events),
+                    selectinload(req.commodity_group),
+                )
+                .execution_options(batched=True)
+            ).all()
+            if not batch:
+                return
+            last_id = batch[-1].id
+            yield batch
+            db.expunge_all()
+            db.rollback()  # end the read transaction between batches
+    finally:
+        db.close()
+
+
+def ndjson_lines(batches: Iterable[list]) -> Iterator[str]:
+    """One ProcurementRequestOut JSON document per line."""
+    for batch in batches:
+        yield "".join(
+            schemas.ProcurementRequestOut.model_validate(req).model_dump_json() + "\n" for req in batch
+        )
+
+
+def csv_lines(batches: Iterable[list]) -> Iterator[str]:
+    """One CSV row per order line (requests without lines get a single row with empty line columns)."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    for batch in batches:
+        for req in batch:
+            request_fields = [
+                req.id,
+                req.title,
+                req.requestor_name,
+                req.department,
+                req.vendor_name,
+                req.vendor_vat_id or "",
+                req.commodity_group_id or "",
+                req.current_status,
+                req.total_cost,
+                req.currency,
+                req.created_at.isoformat(),
+            ]
+            lines = req.order_lines or [None]
+            for line in lines:
+                if line is None:
+                    writer.writerow(request_fields + [""] * 7)
+                else:
+                    writer.writerow(
+                        request_fields
+                        + [
+                            line.id,
+                            line.product or "",
+                            line.description,
+                            line.unit_price,
+                            line.amount,
+                            line.unit or "",
+                            line.total_price,
+                        ]
+                    )
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
@@ -1,17 +1,22 @@
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal
-from typing import Optional, List
+from functools import lru_cache
+from typing import Optional, List, Tuple
 import os
 import re
 import logging
 
-from openai import OpenAI
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, Field, PrivateAttr, create_model, field_validator
 
-from dotenv import load_dotenv
-load_dotenv()
+from . import admission, chunking, circuit, llm, metrics
 
 logger = logging.getLogger(__name__)
 
+# Offers longer than this are extracted in chunks (~1500 tokens each), at most this many at a
+# time and only as many as there are free admission slots
+EXTRACTION_CHUNK_CHARS = int(os.getenv("EXTRACTION_CHUNK_CHARS", "6000"))
+EXTRACTION_CHUNK_WORKERS = int(os.getenv("EXTRACTION_CHUNK_WORKERS", "4"))
+
 
 def clean_monetary_value(v):
     """
@@ -188,6 +193,14 @@ class OfferExtraction(BaseModel):
         """Validate and clean monetary values."""
         return clean_monetary_value(v)
 
+    # how the result was obtained (not part of the LLM schema): "llm", "rules", "template",
+    # "rules+llm" (the LLM filled what the rules left open) or "degraded" (LLM unavailable)
+    _source: str = PrivateAttr(default="llm")
+
+    @property
+    def source(self) -> str:
+        return self._source
+
 
 EXTRACTION_SYSTEM_PROMPT = """You are a procurement document analyst specializing in extracting structured data from vendor quotes, offers, and invoices — primarily in German but also English.
 
@@ -266,43 +279,220 @@ Extraction should be:
 - total_cost: 1299.99 (the Nettosumme, NOT the Gesamtsumme of 1546.99)"""
 
 
-# Only initialize OpenAI client if API key is available
-client = None
-if os.getenv("OPENAI_API_KEY"):
-    client = OpenAI()
+@lru_cache(maxsize=None)
+def partial_extraction_model(fields: tuple) -> type:
+    """``OfferExtraction`` reduced to ``fields``, for asking only for what the rules could not resolve."""
+    definitions = {name: (OfferExtraction.model_fields[name].annotation, OfferExtraction.model_fields[name]) for name in fields}
+    validators = {}
+    if "total_cost" in fields:
+        validators["validate_monetary_value"] = field_validator("total_cost", mode="before")(
+            lambda cls, v: clean_monetary_value(v)
+        )
+    return create_model(f"OfferExtraction_{'_'.join(fields)}", __validators__=validators, **definitions)
 
 
-def extract_offer_text(text: str) -> OfferExtraction:
-    if not client:
-        raise RuntimeError(
-            "OpenAI API key is not configured. "
-            "Please set OPENAI_API_KEY in your .env file or environment variables."
-        )
-    
-    # Truncate very long texts to avoid exceeding context window
-    MAX_CHARS = 15000  # ~4000 tokens, plenty for any offer
-    if len(text) > MAX_CHARS:
-        logger.warning(f"Offer text too long ({len(text)} chars), truncating to {MAX_CHARS}")
-        text = text[:MAX_CHARS]
-    
-    logger.info(f"Sending {len(text)} chars to OpenAI for extraction")
-    
-    completion = client.chat.completions.parse(
+def _partial_prompt(pre, fields) -> Tuple[str, str]:
+    """Instructions for a partial extraction, and the document text (or excerpts) they apply to."""
+    known = "\n".join(
+        f"{name}: {value}" for name, value in pre.values.items() if name != "order_lines" and value is not None
+    )
+    excerpt = pre.spans()
+    instructions = (
+        f"Already extracted from this document (do not return these):\n{known}\n\n"
+        f"Return only: {', '.join(fields)}.\n\n"
+        f"{'Document' if excerpt == pre.text else 'Relevant excerpts of the document'}:\n"
+    )
+    return instructions, excerpt
+
+
+def _with_source(extraction: OfferExtraction, source: str) -> OfferExtraction:
+    extraction._source = source
+    return extraction
+
+
+def _parse(client, content: str, response_format: type) -> BaseModel:
+    completion = llm.parse(
+        "extractor",
+        client,
         model="gpt-4o-mini",
         messages=[
             {
                 "role": "system",
                 "content": EXTRACTION_SYSTEM_PROMPT,
             },
-            {"role": "user", "content": text},
+            {"role": "user", "content": content},
         ],
-        response_format=OfferExtraction,
+        response_format=response_format,
     )
-
     message = completion.choices[0].message
     if message.parsed:
         return message.parsed
-
     refusal = message.refusal or "Model did not return a parsed extraction."
     logger.error(f"OpenAI refused/failed extraction: {refusal}")
-    raise RuntimeError(refusal)
\ No newline at end of file
+    raise RuntimeError(refusal)
+
+
+def _chunk_prompt(instructions: str, chunk: str, number: int, count: int) -> str:
+    return (
+        f"This is part {number} of {count} of a long document, split at page boundaries. "
+        "Extract only what appears in this part: its order lines, and any other requested field printed in it. "
+        "Leave fields that are not in this part at their default or null; do not compute totals from the lines.\n\n"
+        f"{instructions}{chunk}"
+    )
+
+
+def _same_line(a: dict, b: dict) -> bool:
+    return (a["product"].casefold(), a["amount"], a["unit_price"], a["total_price"]) == (
+        b["product"].casefold(), b["amount"], b["unit_price"], b["total_price"]
+    )
+
+
+def merge_chunks(parts: List[BaseModel]) -> Tuple[dict, List[Tuple[int, dict]]]:
+    """
+    Reduce per-chunk extractions to one: order lines in document order (with
+    the chunk they came from), the stated total from the last chunk that has
+    one, every other field from the first. A chunk's first line that repeats the
+    previous chunk's last line exactly (a row carried over at a page break) is
+    kept once; other repeats are left to ``reconcile``.
+    """
+    merged: dict = {}
+    lines: List[Tuple[int, dict]] = []
+    for index, part in enumerate(parts):
+        values = part.model_dump()
+        for position, line in enumerate(values.pop("order_lines", None) or []):
+            if position == 0 and lines and lines[-1][0] == index - 1 and _same_line(lines[-1][1], line):
+                continue
+            lines.append((index, line))
+        for name, value in values.items():
+            if value is None or value == OfferExtraction.model_fields[name].default:
+                continue
+            if name == "total_cost" or name not in merged:
+                merged[name] = value
+    return merged, lines
+
+
+def reconcile(lines: List[Tuple[int, dict]], total: Decimal) -> Tuple[List[dict], Decimal]:
+    """
+    Check merged order lines against the stated net total. Without a total the
+    line sum is used; lines that exceed it are dropped if they repeat the
+    amount and price of a line from another chunk and that makes it add up.
+    """
+    line_sum = sum((Decimal(line["total_price"]) for _, line in lines), Decimal("0"))
+    if not total:
+        metrics.EXTRACTION_RECONCILIATION.inc(outcome="summed")
+        return [line for _, line in lines], line_sum
+    if line_sum == total:
+        metrics.EXTRACTION_RECONCILIATION.inc(outcome="matched")
+        return [line for _, line in lines], total
+
+    kept: List[Tuple[int, dict]] = []
+    excess = line_sum - total
+    for index, line in lines:
+        repeated = any(
+            other_index != index
+            and other["amount"] == line["amount"]
+            and other["total_price"] == line["total_price"]
+            for other_index, other in kept
+        )
+        if repeated and Decimal(line["total_price"]) <= excess:
+            excess -= Decimal(line["total_price"])
+            continue
+        kept.append((index, line))
+    if excess == 0:
+        metrics.EXTRACTION_RECONCILIATION.inc(outcome="deduplicated")
+        logger.info(f"Dropped {len(lines) - len(kept)} order lines repeated across chunks")
+        return [line for _, line in kept], total
+
+    metrics.EXTRACTION_RECONCILIATION.inc(outcome="mismatch")
+    logger.warning(f"Chunked extraction: order lines sum to {line_sum}, stated total is {total}")
+    return [line for _, line in lines], total
+
+
+def _extract_chunked(client, instructions: str, chunks: List[str], response_format: type, known: dict) -> dict:
+    """
+    Map: extract every chunk concurrently. Reduce: merge and reconcile the
+    totals (against the total in ``known`` if the rules already read it).
+    """
+    prompts = [_chunk_prompt(instructions, chunk, number, len(chunks)) for number, chunk in enumerate(chunks, 1)]
+    parts = []
+    if llm.breaker.state != circuit.CLOSED:
+        # a half-open breaker lets a single probe through; the rest wait for its outcome
+        parts.append(_parse(client, prompts[0], response_format))
+        prompts = prompts[1:]
+    # the request's admission slot covers one call; parallel calls need slots of their own
+    controller = admission.controller
+    extra = controller.borrow(min(EXTRACTION_CHUNK_WORKERS, len(prompts)) - 1)
+    try:
+        with ThreadPoolExecutor(max_workers=1 + extra) as pool:
+            parts += pool.map(lambda content: _parse(client, content, response_format), prompts)
+    finally:
+        controller.give_back(extra)
+    merged, lines = merge_chunks(parts)
+    if "order_lines" in response_format.model_fields:
+        merged["order_lines"], merged["total_cost"] = reconcile(
+            lines, Decimal(merged.get("total_cost", known.get("total_cost") or 0))
+        )
+    return merged
+
+
+def extract_offer_text(text: str, template: Optional[dict] = None) -> OfferExtraction:
+    """
+    Structured extraction of an offer. ``template`` is the vendor's learned layout
+    (``services.templates.for_rules``), if there is one.
+
+    Text longer than ``EXTRACTION_CHUNK_CHARS`` is split at page and table
+    boundaries and extracted in concurrent chunks, so latency follows the
+    largest chunk rather than the length of the document.
+    """
+    from . import offer_rules  # imports this module
+
+    # Fields behind fixed labels are read deterministically; the LLM only gets what is left
+    pre = offer_rules.pre_extract(text, template)
+    if template:
+        metrics.VENDOR_TEMPLATES.inc(event="used")
+    if pre.complete:
+        metrics.OFFER_RULES.inc(outcome="complete")
+        logger.info(f"Offer fully extracted by {'vendor template' if template else 'rules'}; skipping the LLM")
+        return _with_source(pre.extraction(), "template" if template else "rules")
+
+    client = llm.get_client()
+    if not client:
+        raise RuntimeError(
+            "OpenAI API key is not configured. "
+            "Please set OPENAI_API_KEY in your .env file or environment variables."
+        )
+
+    if pre.values:
+        metrics.OFFER_RULES.inc(outcome="partial")
+        fields = tuple(pre.missing + (["title", "department"] if "order_lines" in pre.missing else []))
+        response_format = partial_extraction_model(fields)
+        instructions, document = _partial_prompt(pre, fields)
+    else:
+        metrics.OFFER_RULES.inc(outcome="none")
+        response_format = OfferExtraction
+        instructions, document = "", text
+
+    chunks = chunking.split_text(document, EXTRACTION_CHUNK_CHARS)
+    metrics.EXTRACTION_CHUNKS.observe(len(chunks))
+    logger.info(
+        f"Sending {len(document)} chars to OpenAI for extraction ({response_format.__name__}"
+        f"{f', {len(chunks)} chunks' if len(chunks) > 1 else ''})"
+    )
+
+    try:
+        if len(chunks) == 1:
+            values = _parse(client, instructions + document, response_format).model_dump()
+        else:
+            values = _extract_chunked(client, instructions, chunks, response_format, pre.values)
+    except llm.CircuitOpen:
+        extracted = pre.degraded()
+        if extracted is None:
+            raise
+        metrics.LLM_FALLBACKS.inc(call_site="extractor", source="rules")
+        logger.warning("LLM unavailable; using the rule-based extraction")
+        return _with_source(extracted, "degraded")
+
+    if response_format is OfferExtraction:
+        return _with_source(OfferExtraction.model_validate(values), "llm")
+    merged = OfferExtraction.model_validate({**pre.extraction().model_dump(), **values})
+    return _with_source(merged, "rules+llm")
@@ -0,0 +1,165 @@
+"""
+Idempotency keys for the create endpoints.
+
+A client that may retry sends ``Idempotency-Key: <unique value>``. The first
+call claims the key by inserting an ``in_progress`` row (committed immediately
+so every worker sees it), runs the pipeline, and stores the serialized response
+in the same transaction that creates the request. Keys are scoped to the route,
+so the same key sent to two endpoints are two independent calls. Then:
+
+- a retry with the same key and payload gets the stored response back without
+  touching the LLM or creating a duplicate;
+- a retry that arrives while the first call is still running waits for it
+  (polling the row) instead of re-running the pipeline;
+- reusing a key for a different payload is rejected with 422.
+
+If the pipeline fails before its transaction commits, the claim is released so
+the client can retry; once the request is committed the key is completed with
+it, so a retry can never create a second request. Claims of
+crashed workers expire after ``CLAIM_TIMEOUT``; completed keys are kept for
+``IDEMPOTENCY_TTL`` and swept opportunistically.
+"""
+import hashlib
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from .. import models
+from .status_metrics import utcnow
+
+IDEMPOTENCY_TTL = timedelta(hours=24)
+CLAIM_TIMEOUT = timedelta(minutes=5)  # longer than the slowest offer pipeline
+WAIT_TIMEOUT = 120.0  # seconds a duplicate waits for the in-flight call
+POLL_INTERVAL = 0.1
+SWEEP_INTERVAL = 300.0
+
+IN_PROGRESS = "in_progress"
+COMPLETED = "completed"
+
+_last_sweep = 0.0
+
+
+def fingerprint(*parts) -> str:
+    """sha256 over the request payload (str or bytes parts)."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8") if isinstance(part, str) else part)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def sweep(db: Session) -> int:
+    """Delete expired keys. Returns the number of rows removed."""
+    result = db.execute(delete(models.IdempotencyKey).where(models.IdempotencyKey.expires_at < utcnow()))
+    db.commit()
+    return result.rowcount
+
+
+def _sweep_if_due(db: Session) -> None:
+    global _last_sweep
+    if time.monotonic() - _last_sweep >= SWEEP_INTERVAL:
+        _last_sweep = time.monotonic()
+        sweep(db)
+
+
+def claim(db: Session, key: str, scope: str, request_hash: str, wait_timeout: float = WAIT_TIMEOUT):
+    """
+    Claim ``key`` for this call.
+
+    Returns None if the caller now owns the key and must run the pipeline, or the
+    completed ``IdempotencyKey`` row whose stored response should be replayed.
+    """
+    _sweep_if_due(db)
+    table = models.IdempotencyKey
+    deadline = time.monotonic() + wait_timeout
+    while True:
+        now = utcnow()
+        inserted = db.execute(
+            sqlite_insert(table)
+            .values(
+                key=key,
+                scope=scope,
+                request_hash=request_hash,
+                status=IN_PROGRESS,
+                created_at=now,
+                expires_at=now + IDEMPOTENCY_TTL,
+            )
+            .on_conflict_do_nothing(index_elements=["key", "scope"])
+        )
+        db.commit()
+        if inserted.rowcount == 1:
+            return None
+
+        record = db.execute(select(table).where(table.key == key, table.scope == scope)).scalar_one_or_none()
+        db.rollback()
+        if record is None:
+            continue  # released or swept in between; try to claim again
+        if record.request_hash != request_hash:
+            raise HTTPException(
+                status_code=422,
+                detail="Idempotency-Key was already used with a different request payload",
+            )
+        if record.status == COMPLETED:
+            return record
+        if record.created_at < now - CLAIM_TIMEOUT:
+            # the worker holding the claim died; take it over
+            db.execute(
+                delete(table).where(
+                    table.key == key,
+                    table.scope == scope,
+                    table.status == IN_PROGRESS,
+                    table.created_at == record.created_at,
+                )
+            )
+            db.commit()
+            continue
+        if time.monotonic() >= deadline:
+            raise HTTPException(
+                status_code=409,
+                detail="A request with this Idempotency-Key is still being processed, retry later",
+            )
+        time.sleep(POLL_INTERVAL)
+
+
+def complete(db: Session, key: str, scope: str, response_body: str, status_code: int = 200) -> None:
+    """Store the response for ``key``; call before the commit that persists the created request."""
+    db.execute(
+        update(models.IdempotencyKey)
+        .where(models.IdempotencyKey.key == key, models.IdempotencyKey.scope == scope)
+        .values(status=COMPLETED, status_code=status_code, response_body=response_body)
+    )
+
+
+def release(db: Session, key: Optional[str], scope: str) -> None:
+    """
+    Drop an unfinished claim so the client can retry after a failure.
+
+    A key completed by a committed transaction is left alone: its request
+    exists, so the retry must get that response back.
+    """
+    if not key:
+        return
+    db.rollback()
+    db.execute(
+        delete(models.IdempotencyKey).where(
+            models.IdempotencyKey.key == key,
+            models.IdempotencyKey.scope == scope,
+            models.IdempotencyKey.status == IN_PROGRESS,
+        )
+    )
+    db.commit()
+
+
+@contextmanager
+def released_on_error(db: Session, key: Optional[str], scope: str):
+    try:
+        yield
+    except BaseException:
+        release(db, key, scope)
+        raise
@@ -0,0 +1,110 @@
+"""
+Provider for the OpenAI client used by offer extraction, commodity prediction and chat.
+
+``openai`` takes a few hundred milliseconds to import, so it is imported and the
+client constructed on first use instead of when the app (or a CLI, or the test
+suite) imports the routers. Call sites go through ``get_client()``; tests patch
+it to inject a fake client.
+
+Completions are issued through ``parse()`` / ``create()`` with the name of the
+call site, which record latency, token usage and errors in ``services.metrics``
+and record or replay responses when a cassette is active (``services.cassettes``).
+Live calls go through a circuit breaker (``services.circuit``): while the
+provider is down they raise ``CircuitOpen`` at once, and call sites fall back to
+a local result where they have one. The client gives up after ``LLM_TIMEOUT``
+seconds and ``LLM_MAX_RETRIES`` retries instead of the SDK's ten minutes.
+"""
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+
+from . import cassettes, circuit, metrics
+from .circuit import CircuitOpen  # noqa: F401  (call sites catch llm.CircuitOpen)
+
+load_dotenv()
+
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "1"))
+
+_client = None
+_lock = threading.Lock()
+breaker = circuit.CircuitBreaker()
+
+
+def is_configured() -> bool:
+    return bool(os.getenv("OPENAI_API_KEY"))
+
+
+def get_client():
+    """The shared OpenAI client, or None when OPENAI_API_KEY is not set."""
+    global _client
+    if cassettes.replaying():
+        return cassettes.REPLAY_CLIENT
+    if _client is None and is_configured():
+        with _lock:
+            if _client is None:
+                from openai import OpenAI
+
+                _client = OpenAI(timeout=LLM_TIMEOUT, max_retries=LLM_MAX_RETRIES)
+    return _client
+
+
+def reset_client() -> None:
+    """Drop the cached client, e.g. after the API key changed."""
+    global _client
+    with _lock:
+        _client = None
+
+
+def _call(call_site: str, method, kwargs):
+    model = kwargs.get("model", "")
+    cassette = cassettes.active()
+    replaying = cassette is not None and cassette.mode == cassettes.REPLAY
+    if not replaying:
+        try:
+            breaker.before_call()
+        except CircuitOpen:
+            metrics.LLM_SHORT_CIRCUITED.inc(call_site=call_site)
+            raise
+    start = time.perf_counter()
+    try:
+        if replaying:
+            completion = cassette.replay(call_site, kwargs)
+        else:
+            completion = method(**kwargs)
+    except Exception as e:
+        metrics.LLM_ERRORS.inc(call_site=call_site, error=type(e).__name__)
+        if not replaying:
+            if circuit.is_provider_failure(e):
+                breaker.record_failure()
+            else:  # the provider answered; the request was at fault
+                breaker.record_success(time.perf_counter() - start)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.LLM_LATENCY.observe(elapsed, call_site=call_site, model=model)
+
+    if not replaying:
+        breaker.record_success(elapsed)
+
+    if cassette is not None and cassette.mode == cassettes.RECORD:
+        cassette.record(call_site, kwargs, completion, elapsed)
+
+    usage = getattr(completion, "usage", None)
+    for kind in ("prompt", "completion"):
+        tokens = getattr(usage, f"{kind}_tokens", None)
+        if isinstance(tokens, int):
+            metrics.LLM_TOKENS.inc(tokens, call_site=call_site, model=model, kind=kind)
+    return completion
+
+
+def parse(call_site: str, client, **kwargs):
+    """``client.chat.completions.parse`` (structured output), recorded under ``call_site``."""
+    return _call(call_site, client.chat.completions.parse, kwargs)
+
+
+def create(call_site: str, client, **kwargs):
+    """``client.chat.completions.create``, recorded under ``call_site``."""
+    return _call(call_site, client.chat.completions.create, kwargs)
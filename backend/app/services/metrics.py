@@ -0,0 +1,276 @@
+"""
+In-process metrics in the Prometheus text exposition format, served at /metrics.
+
+A deliberately small registry (counters, gauges, fixed-bucket histograms with
+labels) instead of a client library: recording a sample is a dict lookup and a
+few additions under a lock, cheap enough to leave on in production. Values are
+per process; with several workers scrape each one or aggregate in Prometheus.
+
+Recorded here:
+
+- HTTP: request count and latency histogram per route template
+  (``MetricsMiddleware``), in-flight gauge (``track_in_flight``, an app-wide
+  dependency), DB time and statement count per route (fed by ``query_stats``)
+- PDF parsing: duration, page count and failures
+- LLM calls: latency, tokens and errors per call site (see ``services.llm``)
+- admission control: active, queued and rejected requests per lane
+"""
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List, Sequence, Tuple
+
+from starlette.requests import Request
+
+# seconds; covers fast API reads through multi-second LLM calls
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+PAGE_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 500)
+
+UNMATCHED_ROUTE = "unmatched"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(pairs: Sequence[Tuple[str, str]]) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    def _matching(self, labels: dict) -> list:
+        """Values of all label sets that agree with ``labels`` (a subset of the label names)."""
+        wanted = [(index, str(labels[name])) for index, name in enumerate(self.labelnames) if name in labels]
+        with self._lock:
+            return [
+                value for key, value in self._values.items() if all(key[index] == want for index, want in wanted)
+            ]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+            lines += self._render_samples(items)
+        return lines
+
+    def _render_samples(self, items) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(list(zip(self.labelnames, key)))} {value}" for key, value in items
+        ]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def total(self, **labels) -> float:
+        """Sum over every label set matching the given labels, e.g. all models of one call site."""
+        return sum(self._matching(labels))
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def count(self, **labels) -> int:
+        entry = self._values.get(self._key(labels))
+        return entry[2] if entry else 0
+
+    def total(self, **labels) -> float:
+        """Sum of observed values over every label set matching the given labels."""
+        return sum(entry[1] for entry in self._matching(labels))
+
+    def _render_samples(self, items) -> List[str]:
+        lines = []
+        for key, (counts, total, count) in items:
+            pairs = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(pairs + [('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(pairs)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(pairs)} {count}")
+        return lines
+
+
+REGISTRY: List[_Metric] = []
+
+
+def _register(metric):
+    REGISTRY.append(metric)
+    return metric
+
+
+HTTP_REQUESTS = _register(Counter(
+    "http_requests_total", "HTTP requests by route template and status code.", ["method", "route", "status"]
+))
+HTTP_LATENCY = _register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency until the response is complete.", ["method", "route"]
+))
+HTTP_IN_FLIGHT = _register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served.", ["method", "route"]
+))
+DB_TIME = _register(Histogram(
+    "http_request_db_seconds", "Time spent executing SQL per HTTP request.", ["method", "route"]
+))
+DB_QUERIES = _register(Histogram(
+    "http_request_db_queries", "SQL statements per HTTP request.", ["method", "route"], buckets=QUERY_BUCKETS
+))
+PDF_PARSE_TIME = _register(Histogram("pdf_parse_duration_seconds", "Time to extract text and tables from a PDF."))
+PDF_PAGES = _register(Histogram("pdf_pages", "Pages per parsed PDF.", buckets=PAGE_BUCKETS))
+PDF_ERRORS = _register(Counter("pdf_parse_errors_total", "PDFs that could not be parsed."))
+LLM_LATENCY = _register(Histogram(
+    "llm_request_duration_seconds", "LLM API call latency per call site.", ["call_site", "model"]
+))
+LLM_TOKENS = _register(Counter(
+    "llm_tokens_total", "Tokens used per call site (kind is prompt or completion).", ["call_site", "model", "kind"]
+))
+LLM_ERRORS = _register(Counter(
+    "llm_errors_total", "Failed LLM API calls per call site and exception type.", ["call_site", "error"]
+))
+LLM_CIRCUIT_STATE = _register(Gauge(
+    "llm_circuit_state", "LLM circuit breaker state (0 closed, 1 half-open, 2 open)."
+))
+LLM_SHORT_CIRCUITED = _register(Counter(
+    "llm_short_circuited_total", "LLM calls refused without trying because the circuit was open.", ["call_site"]
+))
+LLM_FALLBACKS = _register(Counter(
+    "llm_fallbacks_total", "Results produced locally while the LLM was unavailable.", ["call_site", "source"]
+))
+OFFER_RULES = _register(Counter(
+    "offer_rules_total",
+    "Offers by how much the rule-based pre-extraction resolved (complete skips the LLM; partial or none).",
+    ["outcome"],
+))
+VENDOR_TEMPLATES = _register(Counter(
+    "vendor_templates_total", "Vendor templates learned, confirmed again, or used to extract an offer.", ["event"]
+))
+EXTRACTION_CHUNKS = _register(Histogram(
+    "extraction_chunks", "Chunks per LLM offer extraction (1 is a single call).", buckets=PAGE_BUCKETS
+))
+EXTRACTION_RECONCILIATION = _register(Counter(
+    "extraction_reconciliation_total",
+    "Merged chunked extractions by totals check (matched, deduplicated, summed or mismatch).",
+    ["outcome"],
+))
+
+ADMISSION_ACTIVE = _register(Gauge(
+    "admission_active_requests", "Requests holding an admission slot per lane.", ["lane"]
+))
+ADMISSION_QUEUED = _register(Gauge(
+    "admission_queued_requests", "Requests waiting for an admission slot per lane.", ["lane"]
+))
+ADMISSION_REJECTED = _register(Counter(
+    "admission_rejected_total", "Requests rejected with 429 per lane (reason is queue_full or timeout).",
+    ["lane", "reason"],
+))
+
+
+def render() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines += metric.render()
+    return "\n".join(lines) + "\n"
+
+
+def observe_db(route: str, stats) -> None:
+    """``query_stats`` observer: record DB time and statement count of a finished request."""
+    method, _, path = route.partition(" ")
+    DB_TIME.observe(stats.seconds, method=method, route=path)
+    DB_QUERIES.observe(stats.count, method=method, route=path)
+
+
+def route_template(scope) -> str:
+    """Path template of the route that handled the request (set in the scope by routing)."""
+    route = scope.get("route")
+    return getattr(route, "path", UNMATCHED_ROUTE)
+
+
+async def track_in_flight(request: Request):
+    """App-wide dependency keeping the in-flight gauge; routes are only known once routing has run."""
+    method, route = request.method, route_template(request.scope)
+    HTTP_IN_FLIGHT.inc(method=method, route=route)
+    try:
+        yield
+    finally:
+        HTTP_IN_FLIGHT.dec(method=method, route=route)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording the count and latency of requests per route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            method, route = scope["method"], route_template(scope)
+            HTTP_LATENCY.observe(time.perf_counter() - start, method=method, route=route)
+            HTTP_REQUESTS.inc(method=method, route=route, status=status["code"])
@@ -0,0 +1,394 @@
+"""
+Deterministic extraction of offer fields that sit behind fixed labels.
+
+``pre_extract()`` reads what it can without the LLM, using the labels that
+``EXTRACTION_SYSTEM_PROMPT`` lists: the vendor (a "Vendor Name:" label or the
+DIN 5008 sender line), its VAT id, the stated net total, net shipping costs and
+the order lines. Lines come from pipe-delimited table rows (as
+``extract_text_from_pdf`` writes them), "Product: / Unit Price: / Quantity: /
+Total:" blocks, or numbered German position rows ("2 Moosbild ... 1,00 Stk.
+894,08 -20,00% 715,26"). Alternative positions are skipped.
+
+A field only counts as resolved when it is unambiguous. The order lines are
+resolved only when they add up to the stated net total. When every field is
+resolved the LLM is skipped. Otherwise ``services.extractor`` asks it for the
+missing fields only and sends the text spans they were looked for in.
+"""
+import re
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+from typing import Dict, List, Optional
+
+from .extractor import ExtractedOrderLine, OfferExtraction, clean_monetary_value
+
+# fields the rules try to resolve; title and department are left to the LLM (or defaulted)
+FIELDS = ["vendor_name", "vendor_vat_id", "total_cost", "order_lines"]
+
+# "1.337,26", "894,08", "2100", "€150" (German formats; see clean_monetary_value)
+AMOUNT = r"€?\s*(-?\d{1,3}(?:\.\d{3})+(?:,\d{2})?|-?\d+(?:,\d{2})?)(?![\d.,]*%)"
+MONEY = r"-?\d{1,3}(?:\.\d{3})*,\d{2}"
+
+# page subtotals; they only stand in for the net total when no explicit one is printed, and then the last one counts
+SUBTOTAL_LABELS = ["Zwischensumme", "Subtotal"]
+# in priority order (see find_amount)
+NET_TOTAL_LABELS = [
+    "Nettosumme", "Nettobetrag", "Summe netto", "Gesamtbetrag netto", "Summe (netto)", "Total Offer Cost",
+    *SUBTOTAL_LABELS,
+]
+POSITIONS_NET_LABELS = ["Positionen netto"]
+SHIPPING_NET_LABELS = ["Versandkosten netto", "Versand netto", "Frachtkosten netto", "Lieferkosten netto"]
+TOTAL_HINTS = re.compile(r"netto|brutto|summe|total|betrag|versand|fracht|ust|mwst", re.IGNORECASE)
+VAT_LABELS = [
+    "USt-IdNr.", "USt-IdNr", "USt.-ID", "USt-ID", "Umsatzsteuer-Identifikationsnummer", "Umsatzsteuer-ID",
+    "UID-Nr.", "VAT ID", "MwSt-Nr.",
+]
+VAT_ID = r"\b([A-Z]{2}\s?\d{8,12})\b"
+LEGAL_FORM = re.compile(r"\b(GmbH|AG|UG|KG|OHG|GbR|e\.K\.|SE|Ltd\.?|Inc\.?|LLC)\b")
+
+PRODUCT_BLOCK = re.compile(
+    r"Product:\s*(?P<product>[^\n]+?)\s*\n"
+    r"(?:\s*Description:\s*(?P<description>[^\n]*?)\s*\n)?"
+    r"\s*Unit Price:\s*(?P<unit_price>[^\n]+?)\s*\n"
+    r"\s*Quantity:\s*(?P<amount>\d+)\s*(?P<unit>[^\n\d]*?)\s*\n"
+    r"\s*Total:\s*(?P<total>[^\n]+?)\s*$",
+    re.IGNORECASE | re.MULTILINE,
+)
+POSITION_ROW = re.compile(
+    rf"^(?P<pos>\d{{1,3}})\s+(?P<product>.+?)\s+(?P<amount>\d+(?:,\d+)?)\s+(?P<unit>[^\s\d]+)\s+"
+    rf"(?P<unit_price>{MONEY})(?:\s+(?P<discount>-?\d+(?:,\d+)?)\s?%)?\s+(?P<total>{MONEY})\s*€?$"
+)
+POSITION_TITLE = re.compile(r"^(?P<pos>\d{1,3})\s+(?P<product>\D.*)$")
+ALTERNATIVE = re.compile(r"\bAlt(?:ernativ\w*\b|\.)", re.IGNORECASE)
+STOP_LINES = re.compile(r"^(Seitensumme|Übertrag|Zwischensumme|Positionen netto|Nettosumme|Pos\.\s)", re.IGNORECASE)
+
+# checked in this order, so "Unit Price" is not taken for the unit nor "Gesamtpreis" for the unit price
+TABLE_COLUMNS = {
+    "product": ["bezeichnung", "beschreibung", "artikel", "produkt", "leistung", "description", "product", "item"],
+    "amount": ["menge", "anzahl", "qty", "quantity"],
+    "discount": ["rabatt", "nachlass", "discount"],
+    "total_price": ["gesamt", "summe", "betrag", "total"],
+    "unit_price": ["preis", "price"],
+    "unit": ["einheit", "unit"],
+}
+
+
+def _label(labels) -> str:
+    return "|".join(re.escape(label) for label in labels)
+
+
+def parse_money(value) -> Optional[Decimal]:
+    try:
+        return Decimal(clean_monetary_value(value))
+    except (InvalidOperation, TypeError):
+        return None
+
+
+def find_amount(text: str, labels) -> Optional[Decimal]:
+    """
+    The amount following a label on the same line, trying ``labels`` in order: the
+    first label found wins, wherever it is in the text. That is its first occurrence,
+    except for a subtotal, where it is the last (the one closest to the total).
+    """
+    subtotals = {label.lower() for label in SUBTOTAL_LABELS}
+    for label in labels:
+        matches = list(re.finditer(rf"(?<!\w){re.escape(label)}(?!\w)[^\n\d€-]*{AMOUNT}", text, re.IGNORECASE))
+        if matches:
+            return parse_money(matches[-1 if label.lower() in subtotals else 0].group(1))
+    return None
+
+
+def find_vat_ids(text: str) -> List[str]:
+    """Every VAT id next to one of the VAT labels, in order."""
+    return [
+        match.group(1).replace(" ", "")
+        for match in re.finditer(rf"(?:{_label(VAT_LABELS)})[^\n]{{0,40}}?{VAT_ID}", text)
+    ]
+
+
+def find_vat_id(text: str) -> Optional[str]:
+    """A VAT id next to one of the VAT labels."""
+    vat_ids = find_vat_ids(text)
+    return vat_ids[0] if vat_ids else None
+
+
+def find_vendor_name(text: str) -> Optional[str]:
+    match = re.search(r"^\s*(?:Vendor(?: Name)?|Anbieter|Lieferant)\s*:\s*(.+?)\s*$", text, re.IGNORECASE | re.MULTILINE)
+    if match:
+        return match.group(1)
+    # DIN 5008 letters print the sender above the address: "Dream in Green GmbH | Street | City"
+    for line in text.splitlines()[:15]:
+        first = line.split("|")[0].strip()
+        if "|" in line and LEGAL_FORM.search(first):
+            return first
+    return None
+
+
+def _amount(value: str) -> Optional[int]:
+    quantity = parse_money(value)
+    if quantity is None or quantity != quantity.to_integral_value():
+        return None  # fractional quantities (2,5 h) don't fit ExtractedOrderLine.amount
+    return int(quantity)
+
+
+def _line(product, unit_price, amount, total, unit=None, description="", discount=None) -> Optional[ExtractedOrderLine]:
+    unit_price, total, amount = parse_money(unit_price), parse_money(total), _amount(amount)
+    if unit_price is None or total is None or amount is None:
+        return None
+    expected = unit_price * amount * (1 + (parse_money(discount) or Decimal("0")) / 100)
+    if abs(expected - total) > Decimal("0.01"):
+        return None  # the row doesn't add up; better ask the LLM
+    return ExtractedOrderLine(
+        product=product.strip(), description=description, unit_price=unit_price, amount=amount,
+        unit=(unit or "").strip() or None, total_price=total,
+    )
+
+
+def parse_product_blocks(text: str) -> Optional[List[ExtractedOrderLine]]:
+    lines = []
+    for match in PRODUCT_BLOCK.finditer(text):
+        line = _line(
+            match["product"], match["unit_price"], match["amount"], match["total"],
+            unit=match["unit"], description=match["description"] or "",
+        )
+        if line is None:
+            return None
+        lines.append(line)
+    return lines
+
+
+def parse_table_rows(text: str) -> Optional[List[ExtractedOrderLine]]:
+    """Rows under a pipe-delimited header naming at least the product, quantity and total columns."""
+    lines, columns = [], None
+    for raw in text.splitlines():
+        if "|" not in raw:
+            columns = None
+            continue
+        cells = [cell.strip() for cell in raw.split("|")]
+        header = {}
+        for index, cell in enumerate(cells):
+            name = cell.casefold()
+            for column, keywords in TABLE_COLUMNS.items():
+                if column not in header and any(keyword in name for keyword in keywords):
+                    header[column] = index
+                    break
+        if {"product", "amount", "total_price"} <= header.keys():
+            columns = header
+            continue
+        if columns is None or len(cells) <= max(columns.values()) or not cells[columns["product"]]:
+            continue
+        total = cells[columns["total_price"]]
+        if not re.search(r"\d", total):
+            continue
+        amount = cells[columns["amount"]] or "1"
+        if "unit_price" in columns:
+            unit_price = cells[columns["unit_price"]]
+        else:
+            unit_price = parse_money(total) / (_amount(amount) or 1) if parse_money(total) is not None else None
+        discount = cells[columns["discount"]].rstrip("% ") if "discount" in columns else None
+        line = _line(
+            cells[columns["product"]], unit_price, amount, total,
+            unit=cells[columns["unit"]] if "unit" in columns else None, discount=discount or None,
+        )
+        if line is None:
+            return None
+        lines.append(line)
+    return lines
+
+
+def parse_position_rows(text: str) -> Optional[List[ExtractedOrderLine]]:
+    """Numbered positions; a row's continuation lines become its product name and description."""
+    lines: List[ExtractedOrderLine] = []
+    blocks = []  # [row match or None for title-only positions, following lines]
+    expected = 1
+    for raw in text.splitlines():
+        line = raw.strip()
+        row = POSITION_ROW.match(line)
+        title = POSITION_TITLE.match(line)
+        if row and int(row["pos"]) == expected:
+            blocks.append([row, []])
+            expected += 1
+        elif title and int(title["pos"]) == expected:
+            blocks.append([None, [title["product"]]])  # a heading or alternative without a price
+            expected += 1
+        elif STOP_LINES.match(line):
+            if blocks:
+                blocks.append([None, []])  # ends the last position's description
+        elif blocks and line:
+            blocks[-1][1].append(line)
+
+    for index, (row, following) in enumerate(blocks):
+        if row is None:
+            continue
+        previous = blocks[index - 1][1][:1] if index and blocks[index - 1][0] is None else []
+        if ALTERNATIVE.search(" ".join(previous + [row["product"]] + following)):
+            continue  # "Alternativ: Logo vertikal" / "(Alt.) ..." is not part of the net sum
+        product, description = row["product"], following
+        if following and len(following[0].split()) <= 2 and ":" not in following[0]:
+            product, description = f"{product} {following[0]}", following[1:]
+        line = _line(
+            product, row["unit_price"], row["amount"], row["total"],
+            unit=row["unit"], description=", ".join(description), discount=row["discount"],
+        )
+        if line is None:
+            return None
+        lines.append(line)
+    return lines
+
+
+def parse_with_pattern(text: str, pattern: str) -> List[ExtractedOrderLine]:
+    """Rows matching a vendor's learned line pattern (see ``services.templates``); rows that don't add up are skipped."""
+    regex = re.compile(pattern)
+    lines = []
+    for raw in text.splitlines():
+        match = regex.match(raw.strip())
+        if not match or ALTERNATIVE.search(raw):
+            continue
+        groups = match.groupdict()
+        line = _line(
+            groups["product"], groups["unit_price"], groups["amount"], groups["total"],
+            unit=groups.get("unit"), discount=groups.get("discount"),
+        )
+        if line is not None:
+            lines.append(line)
+    return lines
+
+
+PARSERS = {"table": parse_table_rows, "blocks": parse_product_blocks, "positions": parse_position_rows}
+
+
+@dataclass
+class PreExtraction:
+    """What the rules found; ``values`` holds resolved ``OfferExtraction`` fields only."""
+
+    text: str
+    values: Dict[str, object] = field(default_factory=dict)
+    positions_net: Optional[Decimal] = None
+    shipping: Optional[Decimal] = None
+    parser: Optional[str] = None  # what produced the order lines
+
+    @property
+    def missing(self) -> List[str]:
+        return [name for name in FIELDS if name not in self.values]
+
+    @property
+    def complete(self) -> bool:
+        return not self.missing
+
+    def extraction(self) -> OfferExtraction:
+        """The resolved fields as an ``OfferExtraction``, with a title made from the vendor."""
+        vendor_name = self.values.get("vendor_name")
+        return OfferExtraction(
+            title=f"Procurement Order from {vendor_name}" if vendor_name else "Procurement Request",
+            **self.values,
+        )
+
+    def spans(self) -> str:
+        """The parts of the text the missing fields were looked for in, for a targeted LLM call."""
+        missing = set(self.missing)
+        if "order_lines" in missing:
+            return self.text  # the lines need the whole table; the schema still shrinks
+        lines = self.text.splitlines()
+        keep = set()
+        for index, line in enumerate(lines):
+            # letterhead, signature and footer
+            if "vendor_name" in missing and (index < 12 or index >= len(lines) - 12 or LEGAL_FORM.search(line)):
+                keep.add(index)
+            if "vendor_vat_id" in missing and re.search(rf"{_label(VAT_LABELS)}|{VAT_ID}|Steuer", line):
+                keep.add(index)
+            if "total_cost" in missing and TOTAL_HINTS.search(line):
+                keep.add(index)
+        return "\n".join(lines[index] for index in sorted(keep))
+
+    def degraded(self) -> Optional[OfferExtraction]:
+        """
+        The best result without the LLM, or None when not even the net total is known.
+
+        Missing order lines become one aggregate line so the request still adds up.
+        """
+        total = self.values.get("total_cost")
+        if total is None:
+            return None
+        extraction = self.extraction()
+        if "order_lines" not in self.values:
+            shipping = self.shipping or Decimal("0")
+            positions = self.positions_net if self.positions_net is not None else total - shipping
+            extraction.order_lines = [
+                ExtractedOrderLine(
+                    product="Offer positions",
+                    description="Itemised lines were not extracted; see the attached offer.",
+                    unit_price=positions,
+                    total_price=positions,
+                )
+            ]
+            if shipping:
+                extraction.order_lines.append(
+                    ExtractedOrderLine(product="Versandkosten", unit_price=shipping, total_price=shipping)
+                )
+        return extraction
+
+
+def _parsers(template: Optional[dict]):
+    """(name, parser) pairs, the vendor template's own first."""
+    template = template or {}
+    if template.get("line_pattern"):
+        yield "pattern", lambda text: parse_with_pattern(text, template["line_pattern"])
+    preferred = template.get("line_parser")
+    if preferred in PARSERS:
+        yield preferred, PARSERS[preferred]
+    for name, parser in PARSERS.items():
+        if name != preferred:
+            yield name, parser
+
+
+def pre_extract(text: str, template: Optional[dict] = None) -> PreExtraction:
+    """
+    Resolve what the labels give away. ``template`` is a vendor template from
+    ``services.templates``: its vendor name is taken as confirmed, and its labels and
+    line parser are tried before the generic ones.
+    """
+    result = PreExtraction(text=text)
+    labels = (template or {}).get("labels", {})
+
+    def amount(name, generic):
+        return (find_amount(text, [labels[name]]) if name in labels else None) or find_amount(text, generic)
+
+    vendor_name = template["vendor_name"] if template else find_vendor_name(text)
+    if vendor_name:
+        result.values["vendor_name"] = vendor_name
+
+    vat_id = find_vat_id(text)
+    known_vat_id = (template or {}).get("vendor_vat_id")
+    if known_vat_id and known_vat_id in re.sub(r"\s", "", text):
+        result.values["vendor_vat_id"] = known_vat_id
+    elif vat_id:
+        result.values["vendor_vat_id"] = vat_id
+    elif not re.search(rf"{_label(VAT_LABELS)}|{VAT_ID}", text):
+        result.values["vendor_vat_id"] = None  # nothing that looks like one anywhere
+
+    result.shipping = amount("shipping", SHIPPING_NET_LABELS)
+    result.positions_net = amount("positions_net", POSITIONS_NET_LABELS)
+    total = amount("total_cost", NET_TOTAL_LABELS)
+    if total is None and result.positions_net is not None:
+        total = result.positions_net + (result.shipping or Decimal("0"))
+    if total is None:
+        return result
+    result.values["total_cost"] = total
+
+    # the first parser that finds lines adding up to the stated net total wins
+    items_net = result.positions_net if result.positions_net is not None else total - (result.shipping or 0)
+    for name, parser in _parsers(template):
+        lines = parser(text)
+        if lines and sum(line.total_price for line in lines) == items_net:
+            if result.shipping:
+                lines.append(ExtractedOrderLine(
+                    product="Versandkosten", unit_price=result.shipping, total_price=result.shipping,
+                ))
+            result.values["order_lines"] = lines
+            result.parser = name
+            break
+    return result
+
+
+def extract(text: str) -> Optional[OfferExtraction]:
+    """A best-effort extraction without the LLM (see ``PreExtraction.degraded``)."""
+    return pre_extract(text).degraded()
@@ -0,0 +1,78 @@
+"""
+On-demand cProfile of a single offer upload or extraction.
+
+Profiling is an admin tool: it is only available when ``PROFILING_TOKEN`` is
+set, and a request opts in by sending that token in the ``X-Profile-Token``
+header. The profile of the handler (PDF parsing, LLM calls, database work) is
+written to ``PROFILE_DIR`` as a ``.pstats`` file whose name is returned in the
+``X-Profile`` response header; open it with ``python -m pstats``, snakeviz or
+flameprof. Without the header nothing is started, so the normal path costs a
+single ``None`` check.
+
+Only one request is profiled at a time (newer Pythons allow a single active
+profiler per process); a concurrent opt-in runs unprofiled with
+``X-Profile: busy``.
+"""
+import cProfile
+import hmac
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+from fastapi import HTTPException, Response
+
+logger = logging.getLogger(__name__)
+
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN", "")  # empty disables profiling
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", "profiles"))
+
+_lock = threading.Lock()
+
+
+def _authorized(token: str) -> bool:
+    return bool(PROFILING_TOKEN) and hmac.compare_digest(token.encode(), PROFILING_TOKEN.encode())
+
+
+def profile_path(name: str) -> Path:
+    stamp = time.strftime("%Y%m%dT%H%M%S")
+    safe_name = re.sub(r"[^A-Za-z0-9_.-]", "_", name)
+    return PROFILE_DIR / f"{stamp}-{safe_name}-{time.perf_counter_ns() % 1_000_000:06d}.pstats"
+
+
+def authorize(token: Optional[str]) -> None:
+    """403 unless ``token`` is None or the admin profiling token; lets a route reject before it claims anything."""
+    if token is not None and not _authorized(token):
+        raise HTTPException(status_code=403, detail="Profiling is not enabled for this token")
+
+
+@contextmanager
+def profiled(token: Optional[str], response: Response, name: str):
+    """Profile the enclosed block when ``token`` is the admin profiling token; no-op when it is None."""
+    authorize(token)
+    if token is None:
+        yield
+        return
+    if not _lock.acquire(blocking=False):
+        response.headers["X-Profile"] = "busy"
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            path = profile_path(name)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            profiler.dump_stats(path)
+            response.headers["X-Profile"] = path.name
+            logger.info(f"Stored profile of {name} in {path}")
+    finally:
+        _lock.release()
@@ -0,0 +1,135 @@
+"""
+Per-HTTP-request SQL statement counting and an N+1 detector.
+
+Cursor-execute events on the instrumented engines add each statement and its
+duration to the ``QueryStats`` of the current request (a context variable set by
+``QueryStatsMiddleware``; sync endpoints see it because the threadpool copies
+the context). Every response gets ``X-DB-Query-Count`` and ``X-DB-Time-Ms``
+headers and per-route totals are kept in ``route_totals``.
+
+A request that runs the same SELECT with ``N_PLUS_ONE_THRESHOLD`` or more
+different parameter sets is logged as a likely N+1 (lazy loads in a loop).
+Deliberate batch loops such as keyset pagination opt out with
+``.execution_options(batched=True)``, which also covers their selectinloads.
+Observers (used by the test fixtures in ``tests/conftest.py``) are called with
+every finished request.
+"""
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+
+logger = logging.getLogger(__name__)
+
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "10"))
+SLOW_REQUEST_QUERIES = int(os.getenv("SLOW_REQUEST_QUERIES", "50"))
+
+_current: ContextVar[Optional["QueryStats"]] = ContextVar("query_stats", default=None)
+_observers: List[Callable[[str, "QueryStats"], None]] = []
+_totals_lock = threading.Lock()
+
+# route template -> {"requests": n, "queries": n, "db_seconds": s}
+route_totals = {}
+
+
+class QueryStats:
+    """Statements executed while handling one HTTP request."""
+
+    __slots__ = ("count", "seconds", "statements", "_parameters")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = Counter()
+        self._parameters = {}  # SELECT -> distinct parameter sets, for the N+1 check
+
+    def record(self, statement: str, parameters, seconds: float, batched: bool = False) -> None:
+        self.count += 1
+        self.seconds += seconds
+        self.statements[statement] += 1
+        if not batched and statement.lstrip().upper().startswith("SELECT"):
+            self._parameters.setdefault(statement, set()).add(repr(parameters))
+
+    def repeated(self, threshold: int = N_PLUS_ONE_THRESHOLD) -> List[Tuple[str, int]]:
+        """SELECTs run with at least ``threshold`` different parameter sets, the signature of an N+1."""
+        return [
+            (statement, len(parameters))
+            for statement, parameters in self._parameters.items()
+            if len(parameters) >= threshold
+        ]
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    stats = _current.get()
+    if stats is not None:
+        stats.record(statement, parameters, elapsed, context.execution_options.get("batched", False))
+
+
+def instrument(engine) -> None:
+    if not event.contains(engine, "after_cursor_execute", _after_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def add_observer(observer: Callable[[str, QueryStats], None]) -> None:
+    _observers.append(observer)
+
+
+def remove_observer(observer: Callable[[str, QueryStats], None]) -> None:
+    _observers.remove(observer)
+
+
+def _finish(route: str, stats: QueryStats) -> None:
+    with _totals_lock:
+        totals = route_totals.setdefault(route, {"requests": 0, "queries": 0, "db_seconds": 0.0})
+        totals["requests"] += 1
+        totals["queries"] += stats.count
+        totals["db_seconds"] += stats.seconds
+
+    for statement, count in stats.repeated():
+        logger.warning(f"Possible N+1 in {route}: statement run with {count} parameter sets: {statement[:200]}")
+    if stats.count >= SLOW_REQUEST_QUERIES:
+        logger.warning(f"{route} ran {stats.count} queries ({stats.seconds * 1000:.1f} ms in the database)")
+    for observer in list(_observers):
+        observer(route, stats)
+
+
+class QueryStatsMiddleware:
+    """ASGI middleware that tracks the statements of each HTTP request and reports them as headers."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = _current.set(stats)
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.append("X-DB-Query-Count", str(stats.count))
+                headers.append("X-DB-Time-Ms", f"{stats.seconds * 1000:.1f}")
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            _current.reset(token)
+            route = scope.get("route")
+            # unmatched paths (404s) share one key so arbitrary URLs cannot grow route_totals
+            _finish(f"{scope['method']} {route.path if route else 'unmatched'}", stats)
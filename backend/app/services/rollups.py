@@ -0,0 +1,201 @@
+"""
+Incrementally maintained aggregates over procurement requests.
+
+Every write path calls ``remove_request`` before mutating a request and
+``add_request`` afterwards (or just ``add_request`` for new requests), in the
+same transaction as the write itself. Dashboards then read the small rollup
+tables (``spend_rollups``, ``status_counts``) instead of scanning
+``procurement_requests`` and ``order_lines``.
+"""
+from sqlalchemy import func, insert, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from .. import models
+
+UNASSIGNED = ""
+
+SPEND_KEY_COLUMNS = ["department", "vendor_name", "commodity_group_id", "status", "month"]
+
+
+def spend_key(req: models.ProcurementRequest) -> tuple:
+    return (
+        req.department,
+        req.vendor_name,
+        req.commodity_group_id or UNASSIGNED,
+        req.current_status,
+        req.created_at.strftime("%Y-%m"),
+    )
+
+
+def _upsert_spend(db: Session, params: list) -> None:
+    table = models.SpendRollup
+    stmt = sqlite_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=SPEND_KEY_COLUMNS,
+        set_={
+            table.request_count: table.request_count + stmt.excluded.request_count,
+            table.total_cost: table.total_cost + stmt.excluded.total_cost_cents,
+        },
+    )
+    db.execute(stmt, params)
+
+
+def _upsert_status_counts(db: Session, params: list) -> None:
+    table = models.StatusCount
+    stmt = sqlite_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["department", "status"],
+        set_={table.count: table.count + stmt.excluded["count"]},
+    )
+    db.execute(stmt, params)
+
+
+def _apply_spend(db: Session, key: tuple, request_count: int, total_cost) -> None:
+    _upsert_spend(
+        db, [{**dict(zip(SPEND_KEY_COLUMNS, key)), "request_count": request_count, "total_cost": total_cost}]
+    )
+    if request_count < 0:
+        table = models.SpendRollup
+        filters = [getattr(table, column) == value for column, value in zip(SPEND_KEY_COLUMNS, key)]
+        db.query(table).filter(*filters, table.request_count <= 0).delete(synchronize_session=False)
+
+
+def _apply_status_count(db: Session, department: str, status: str, delta: int) -> None:
+    _upsert_status_counts(db, [{"department": department, "status": status, "count": delta}])
+
+
+def add_request(db: Session, req: models.ProcurementRequest) -> None:
+    """Count a new (or just-updated) request into the rollups. ``req`` must be flushed."""
+    _apply_spend(db, spend_key(req), 1, req.total_cost)
+    _apply_status_count(db, req.department, req.current_status, 1)
+
+
+def remove_request(db: Session, req: models.ProcurementRequest) -> None:
+    """Take a request out of the rollups; call before changing any rolled-up field."""
+    _apply_spend(db, spend_key(req), -1, -req.total_cost)
+    _apply_status_count(db, req.department, req.current_status, -1)
+
+
+def apply_rows(db: Session, rows, sign: int = 1) -> None:
+    """
+    Set-based counterpart of add_request (sign=1) / remove_request (sign=-1).
+
+    ``rows`` are objects with the request attributes used by ``spend_key`` plus
+    ``total_cost`` (ORM objects or Core rows). Deltas are aggregated per group
+    first, so the cost is one executemany upsert per rollup table.
+    """
+    spend = {}
+    counts = {}
+    for row in rows:
+        key = spend_key(row)
+        entry = spend.setdefault(key, [0, 0])
+        entry[0] += sign
+        entry[1] += sign * row.total_cost
+        count_key = (row.department, row.current_status)
+        counts[count_key] = counts.get(count_key, 0) + sign
+    if not spend:
+        return
+
+    _upsert_spend(
+        db,
+        [
+            {**dict(zip(SPEND_KEY_COLUMNS, key)), "request_count": count, "total_cost": total}
+            for key, (count, total) in spend.items()
+        ],
+    )
+    _upsert_status_counts(
+        db,
+        [{"department": department, "status": status, "count": count} for (department, status), count in counts.items()],
+    )
+    if sign < 0:
+        db.query(models.SpendRollup).filter(models.SpendRollup.request_count <= 0).delete(
+            synchronize_session=False
+        )
+
+
+def reset(db: Session) -> None:
+    db.query(models.SpendRollup).delete(synchronize_session=False)
+    db.query(models.StatusCount).delete(synchronize_session=False)
+
+
+def _spend_from_source(db: Session) -> dict:
+    req = models.ProcurementRequest
+    key = [
+        req.department,
+        req.vendor_name,
+        func.coalesce(req.commodity_group_id, UNASSIGNED),
+        req.current_status,
+        func.strftime("%Y-%m", req.created_at),
+    ]
+    rows = db.execute(select(*key, func.count(req.id), func.sum(req.total_cost)).group_by(*key))
+    return {tuple(row[:5]): (row[5], row[6]) for row in rows}
+
+
+def _spend_from_rollups(db: Session) -> dict:
+    table = models.SpendRollup
+    rows = db.query(*[getattr(table, column) for column in SPEND_KEY_COLUMNS], table.request_count, table.total_cost)
+    return {tuple(row[:5]): (row[5], row[6]) for row in rows}
+
+
+def _status_counts_from_source(db: Session) -> dict:
+    req = models.ProcurementRequest
+    rows = db.query(req.department, req.current_status, func.count(req.id)).group_by(
+        req.department, req.current_status
+    )
+    return {(department, status): count for department, status, count in rows}
+
+
+def _status_counts_from_table(db: Session) -> dict:
+    table = models.StatusCount
+    rows = db.query(table.department, table.status, table.count).filter(table.count != 0)
+    return {(department, status): count for department, status, count in rows}
+
+
+def _drift(expected: dict, actual: dict) -> list:
+    return [
+        (key, expected.get(key), actual.get(key))
+        for key in sorted(expected.keys() | actual.keys())
+        if expected.get(key) != actual.get(key)
+    ]
+
+
+def check(db: Session) -> dict:
+    """
+    Recompute every rollup from source and compare without writing.
+
+    Returns {"spend": [...], "status_counts": [...]} with one (key, expected, actual)
+    tuple per drifted group; empty lists mean the rollups are consistent.
+    """
+    return {
+        "spend": _drift(_spend_from_source(db), _spend_from_rollups(db)),
+        "status_counts": _drift(_status_counts_from_source(db), _status_counts_from_table(db)),
+    }
+
+
+def rebuild(db: Session) -> int:
+    """Recompute the rollups from source rows. Returns the number of groups that had drifted."""
+    spend = _spend_from_source(db)
+    status_counts = _status_counts_from_source(db)
+    drifted = len(_drift(spend, _spend_from_rollups(db))) + len(
+        _drift(status_counts, _status_counts_from_table(db))
+    )
+
+    reset(db)
+    if spend:
+        db.execute(
+            insert(models.SpendRollup),
+            [
+                {**dict(zip(SPEND_KEY_COLUMNS, key)), "request_count": count, "total_cost": total}
+                for key, (count, total) in spend.items()
+            ],
+        )
+    if status_counts:
+        db.execute(
+            insert(models.StatusCount),
+            [
+                {"department": department, "status": status, "count": count}
+                for (department, status), count in status_counts.items()
+            ],
+        )
+    return drifted
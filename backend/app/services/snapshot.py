@@ -0,0 +1,186 @@
+"""
+Columnar (Arrow IPC / Parquet) snapshots of the request tables for offline analytics.
+
+Tables are read with Core selects in keyset-paginated record batches, so no ORM
+objects are built and memory is bounded by the batch size. Money columns are
+exported as exact integer cents (``*_cents``) and timestamps as UTC.
+
+Incremental snapshots take a ``since`` watermark: requests whose ``updated_at``
+is at or after it, their order lines, and status events changed at or after it.
+Watermarks are inclusive, so consumers should de-duplicate on ``id`` keeping the
+newest snapshot. Deletions are not captured; take a full snapshot after purges.
+
+pyarrow is imported lazily so the API does not pay for it at startup.
+"""
+import io
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, Optional
+
+from sqlalchemy import DateTime, Integer, String, literal, select, type_coerce
+
+from ..db import SessionLocal
+from ..money import Money
+from .. import models
+from .status_metrics import utcnow
+
+SNAPSHOT_TABLES = {
+    "procurement_requests": models.ProcurementRequest.__table__,
+    "order_lines": models.OrderLine.__table__,
+    "status_events": models.StatusEvent.__table__,
+}
+
+SNAPSHOT_FORMATS = {"parquet": "parquet", "arrow": "arrow"}
+
+SNAPSHOT_BATCH_SIZE = 50_000
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError as e:
+        raise RuntimeError("Snapshots require pyarrow. Install it with `pip install pyarrow`.") from e
+    return pyarrow
+
+
+def _arrow_type(pa, column):
+    if isinstance(column.type, (Money, Integer)):
+        return pa.int64()
+    if isinstance(column.type, DateTime):
+        return pa.timestamp("us", tz="UTC")
+    if isinstance(column.type, String):
+        return pa.string()
+    raise TypeError(f"No Arrow type for column {column.name} ({column.type})")
+
+
+def arrow_schema(table_name: str):
+    pa = _pyarrow()
+    table = SNAPSHOT_TABLES[table_name]
+    return pa.schema(
+        [pa.field(column.name, _arrow_type(pa, column), nullable=column.nullable) for column in table.columns]
+    )
+
+
+def _since_filter(table_name: str, since: Optional[datetime]) -> list:
+    if since is None:
+        return []
+    # Stored timestamps mix "YYYY-MM-DD HH:MM:SS" (CURRENT_TIMESTAMP) and values with
+    # microseconds; a seconds-precision string compares correctly against both.
+    since = literal(since.strftime("%Y-%m-%d %H:%M:%S"), String)
+    req = SNAPSHOT_TABLES["procurement_requests"]
+    if table_name == "procurement_requests":
+        return [req.c.updated_at >= since]
+    if table_name == "order_lines":
+        changed = select(req.c.id).where(req.c.updated_at >= since)
+        return [SNAPSHOT_TABLES["order_lines"].c.request_id.in_(changed)]
+    return [SNAPSHOT_TABLES["status_events"].c.changed_at >= since]
+
+
+def iter_record_batches(
+    table_name: str,
+    since: Optional[datetime] = None,
+    batch_size: int = SNAPSHOT_BATCH_SIZE,
+) -> Iterator:
+    """Yield pyarrow RecordBatches for one table, each read in its own short transaction."""
+    pa = _pyarrow()
+    table = SNAPSHOT_TABLES[table_name]
+    schema = arrow_schema(table_name)
+    # read Money columns as raw integer cents instead of Decimals
+    columns = [
+        type_coerce(column, Integer).label(column.name) if isinstance(column.type, Money) else column
+        for column in table.columns
+    ]
+    filters = _since_filter(table_name, since)
+
+    db = SessionLocal()
+    try:
+        last_id = 0
+        while True:
+            rows = db.execute(
+                select(*columns)
+                .where(*filters, table.c.id > last_id)
+                .order_by(table.c.id)
+                .limit(batch_size)
+                .execution_options(batched=True)
+            ).all()
+            db.rollback()  # end the read transaction between batches
+            if not rows:
+                return
+            last_id = rows[-1].id
+            arrays = [pa.array([row[i] for row in rows], type=field.type) for i, field in enumerate(schema)]
+            yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+    finally:
+        db.close()
+
+
+def arrow_stream(table_name: str, since: Optional[datetime] = None) -> Iterator[bytes]:
+    """Encode a table as an Arrow IPC stream, yielding the bytes of each record batch as it is read."""
+    pa = _pyarrow()
+    sink = io.BytesIO()
+
+    def drain() -> bytes:
+        data = sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+        return data
+
+    with pa.ipc.new_stream(sink, arrow_schema(table_name)) as writer:
+        yield drain()
+        for batch in iter_record_batches(table_name, since):
+            writer.write_batch(batch)
+            yield drain()
+    yield drain()
+
+
+def write_table(table_name: str, path: Path, fmt: str = "parquet", since: Optional[datetime] = None) -> int:
+    """Write one table to ``path`` batch by batch. Returns the number of rows written."""
+    pa = _pyarrow()
+    schema = arrow_schema(table_name)
+    rows = 0
+    if fmt == "parquet":
+        writer = pa.parquet.ParquetWriter(str(path), schema)
+    else:
+        writer = pa.ipc.new_file(str(path), schema)
+    with writer:
+        for batch in iter_record_batches(table_name, since):
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    return rows
+
+
+def write_snapshot(out_dir: Path, fmt: str = "parquet", incremental: bool = False) -> dict:
+    """
+    Write all snapshot tables into a new timestamped directory under ``out_dir``.
+
+    With ``incremental`` the watermark of the previous snapshot (``latest.json``)
+    is used as ``since``. Returns the manifest that is also written next to the files.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    latest_path = out_dir / "latest.json"
+
+    since = None
+    if incremental and latest_path.exists():
+        since = datetime.fromisoformat(json.loads(latest_path.read_text())["watermark"])
+
+    # taken before reading so rows changed during the snapshot are picked up next time
+    watermark = utcnow().replace(microsecond=0)
+    snapshot_dir = out_dir / watermark.strftime("%Y%m%dT%H%M%S")
+    snapshot_dir.mkdir(exist_ok=True)
+
+    manifest = {
+        "watermark": watermark.isoformat(),
+        "since": since.isoformat() if since else None,
+        "format": fmt,
+        "tables": {},
+    }
+    for table_name in SNAPSHOT_TABLES:
+        path = snapshot_dir / f"{table_name}.{SNAPSHOT_FORMATS[fmt]}"
+        manifest["tables"][table_name] = {"file": path.name, "rows": write_table(table_name, path, fmt, since)}
+
+    (snapshot_dir / "manifest.json").write_text(json.dumps(manifest, indent=2))
+    latest_path.write_text(json.dumps({"watermark": manifest["watermark"], "path": snapshot_dir.name}))
+    return manifest
@@ -0,0 +1,285 @@
+"""
+Time-in-status, cycle-time and throughput metrics, maintained incrementally.
+
+``change_status`` calls ``record_transition`` in the same transaction that
+appends the ``StatusEvent``: the interval that just ended is added to a
+fixed-bucket histogram and the weekly throughput counter is bumped. Percentiles
+are then estimated from the histogram, so dashboards read O(buckets) rows
+instead of replaying the whole event history.
+"""
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from .. import models
+from .rollups import UNASSIGNED
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+# Upper bounds (seconds) of the histogram buckets; the last bucket is open-ended.
+BUCKET_BOUNDS = [
+    HOUR, 4 * HOUR, 12 * HOUR, DAY, 2 * DAY, 3 * DAY, 5 * DAY,
+    7 * DAY, 14 * DAY, 30 * DAY, 60 * DAY, 90 * DAY, 180 * DAY, None,
+]
+
+# Backlog aging buckets as (label, upper bound in days).
+AGING_BUCKETS = [("<1d", 1), ("1-3d", 3), ("3-7d", 7), ("7-14d", 14), ("14-30d", 30), (">30d", None)]
+
+DURATION_KEY_COLUMNS = ["metric", "status", "department", "commodity_group_id", "bucket"]
+THROUGHPUT_KEY_COLUMNS = ["week", "to_status", "department", "commodity_group_id"]
+
+TIME_IN_STATUS = "time_in_status"
+CYCLE_TIME = "cycle_time"
+
+
+def utcnow() -> datetime:
+    """Naive UTC timestamp, matching what SQLite's CURRENT_TIMESTAMP stores."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def iso_week(moment: datetime) -> str:
+    return moment.strftime("%G-W%V")
+
+
+def bucket_for(seconds: float) -> int:
+    for index, bound in enumerate(BUCKET_BOUNDS):
+        if bound is None or seconds < bound:
+            return index
+    return len(BUCKET_BOUNDS) - 1
+
+
+def _seconds_between(start: Optional[datetime], end: datetime) -> int:
+    if start is None:
+        return 0
+    return max(0, int((end - start.replace(tzinfo=None)).total_seconds()))
+
+
+def _upsert_durations(db: Session, params: list) -> None:
+    table = models.StatusDurationBucket
+    stmt = sqlite_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=DURATION_KEY_COLUMNS,
+        set_={
+            "count": table.count + stmt.excluded["count"],
+            "total_seconds": table.total_seconds + stmt.excluded.total_seconds,
+        },
+    )
+    db.execute(stmt, params)
+
+
+def _add_duration(db: Session, metric: str, status: str, department: str, commodity_group_id: str, seconds: int):
+    _upsert_durations(
+        db,
+        [{
+            "metric": metric,
+            "status": status,
+            "department": department,
+            "commodity_group_id": commodity_group_id,
+            "bucket": bucket_for(seconds),
+            "count": 1,
+            "total_seconds": seconds,
+        }],
+    )
+
+
+def _upsert_throughput(db: Session, params: list) -> None:
+    table = models.StatusThroughput
+    stmt = sqlite_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=THROUGHPUT_KEY_COLUMNS,
+        set_={"count": table.count + stmt.excluded["count"]},
+    )
+    db.execute(stmt, params)
+
+
+def _add_throughput(db: Session, week: str, to_status: str, department: str, commodity_group_id: str):
+    _upsert_throughput(
+        db,
+        [{
+            "week": week,
+            "to_status": to_status,
+            "department": department,
+            "commodity_group_id": commodity_group_id,
+            "count": 1,
+        }],
+    )
+
+
+def record_created(db: Session, req: models.ProcurementRequest) -> None:
+    """Count a new request as an arrival in its week. ``req`` must be flushed."""
+    _add_throughput(
+        db, iso_week(req.status_changed_at), req.current_status,
+        req.department, req.commodity_group_id or UNASSIGNED,
+    )
+
+
+def record_created_rows(db: Session, rows) -> None:
+    """Set-based ``record_created`` for many new requests (objects or Core rows)."""
+    counts = {}
+    for row in rows:
+        key = (iso_week(row.status_changed_at), row.current_status, row.department,
+               row.commodity_group_id or UNASSIGNED)
+        counts[key] = counts.get(key, 0) + 1
+    if counts:
+        _upsert_throughput(
+            db, [dict(zip(THROUGHPUT_KEY_COLUMNS, key), count=count) for key, count in counts.items()]
+        )
+
+
+def record_transition(
+    db: Session,
+    req: models.ProcurementRequest,
+    from_status: str,
+    changed_at: Optional[datetime] = None,
+) -> None:
+    """
+    Record that ``req`` just left ``from_status`` for ``req.current_status``.
+
+    Call after setting the new status and before committing; this also moves
+    ``req.status_changed_at`` forward.
+    """
+    if from_status == req.current_status:
+        return
+    changed_at = changed_at or utcnow()
+    department = req.department
+    commodity_group_id = req.commodity_group_id or UNASSIGNED
+
+    _add_duration(
+        db, TIME_IN_STATUS, from_status, department, commodity_group_id,
+        _seconds_between(req.status_changed_at, changed_at),
+    )
+    if req.current_status == "Closed":
+        _add_duration(
+            db, CYCLE_TIME, "Closed", department, commodity_group_id,
+            _seconds_between(req.created_at, changed_at),
+        )
+    _add_throughput(db, iso_week(changed_at), req.current_status, department, commodity_group_id)
+    req.status_changed_at = changed_at
+
+
+def record_transition_rows(db: Session, rows, to_status: str, changed_at: datetime) -> None:
+    """
+    Set-based ``record_transition`` for many requests moving to ``to_status`` at once.
+
+    ``rows`` carry the state *before* the transition (``current_status`` is the
+    status being left, ``status_changed_at`` when it was entered).
+    """
+    durations = {}
+    throughput = {}
+
+    def add_duration(metric, status, department, group_id, seconds):
+        entry = durations.setdefault((metric, status, department, group_id, bucket_for(seconds)), [0, 0])
+        entry[0] += 1
+        entry[1] += seconds
+
+    week = iso_week(changed_at)
+    for row in rows:
+        if row.current_status == to_status:
+            continue
+        group_id = row.commodity_group_id or UNASSIGNED
+        add_duration(TIME_IN_STATUS, row.current_status, row.department, group_id,
+                     _seconds_between(row.status_changed_at, changed_at))
+        if to_status == "Closed":
+            add_duration(CYCLE_TIME, "Closed", row.department, group_id,
+                         _seconds_between(row.created_at, changed_at))
+        key = (week, to_status, row.department, group_id)
+        throughput[key] = throughput.get(key, 0) + 1
+
+    if durations:
+        _upsert_durations(
+            db,
+            [
+                dict(zip(DURATION_KEY_COLUMNS, key), count=count, total_seconds=total)
+                for key, (count, total) in durations.items()
+            ],
+        )
+    if throughput:
+        _upsert_throughput(
+            db, [dict(zip(THROUGHPUT_KEY_COLUMNS, key), count=count) for key, count in throughput.items()]
+        )
+
+
+def reset(db: Session) -> None:
+    db.query(models.StatusDurationBucket).delete(synchronize_session=False)
+    db.query(models.StatusThroughput).delete(synchronize_session=False)
+
+
+def rebuild(db: Session) -> None:
+    """
+    Replay the full StatusEvent history into the metric tables (for reconciliation only).
+
+    History is attributed to each request's current department and commodity group.
+    """
+    durations = {}  # (metric, status, department, group, bucket) -> [count, total_seconds]
+    throughput = {}  # (week, to_status, department, group) -> count
+
+    def add_duration(metric, status, department, group_id, seconds):
+        entry = durations.setdefault((metric, status, department, group_id, bucket_for(seconds)), [0, 0])
+        entry[0] += 1
+        entry[1] += seconds
+
+    events = (
+        db.query(
+            models.StatusEvent.request_id,
+            models.StatusEvent.from_status,
+            models.StatusEvent.to_status,
+            models.StatusEvent.changed_at,
+            models.ProcurementRequest.department,
+            models.ProcurementRequest.commodity_group_id,
+            models.ProcurementRequest.created_at,
+        )
+        .join(models.ProcurementRequest, models.ProcurementRequest.id == models.StatusEvent.request_id)
+        .order_by(models.StatusEvent.request_id, models.StatusEvent.id)
+        .yield_per(1000)
+    )
+    current_request, entered_at = None, None
+    for request_id, from_status, to_status, changed_at, department, group_id, created_at in events:
+        if request_id != current_request:
+            current_request, entered_at = request_id, None
+        if from_status == to_status:
+            continue
+        group_id = group_id or UNASSIGNED
+        if entered_at is not None and from_status:
+            add_duration(TIME_IN_STATUS, from_status, department, group_id, _seconds_between(entered_at, changed_at))
+            if to_status == "Closed":
+                add_duration(CYCLE_TIME, "Closed", department, group_id, _seconds_between(created_at, changed_at))
+        week_key = (iso_week(changed_at), to_status, department, group_id)
+        throughput[week_key] = throughput.get(week_key, 0) + 1
+        entered_at = changed_at
+
+    reset(db)
+    if durations:
+        db.execute(
+            insert(models.StatusDurationBucket),
+            [
+                dict(zip(DURATION_KEY_COLUMNS, key), count=count, total_seconds=total)
+                for key, (count, total) in durations.items()
+            ],
+        )
+    if throughput:
+        db.execute(
+            insert(models.StatusThroughput),
+            [dict(zip(THROUGHPUT_KEY_COLUMNS, key), count=count) for key, count in throughput.items()],
+        )
+
+
+def percentile(buckets: dict, total: int, fraction: float) -> float:
+    """Estimate a percentile (seconds) from {bucket index: count} by interpolating inside the bucket."""
+    if total <= 0:
+        return 0.0
+    target = fraction * total
+    seen = 0
+    for index in sorted(buckets):
+        count = buckets[index]
+        if seen + count >= target:
+            lower = BUCKET_BOUNDS[index - 1] if index > 0 else 0
+            upper = BUCKET_BOUNDS[index]
+            if upper is None:
+                return float(lower)
+            return lower + (upper - lower) * (target - seen) / count
+        seen += count
+    return float(BUCKET_BOUNDS[-2])
@@ -0,0 +1,232 @@
+"""
+Per-vendor extraction templates learned from confirmed extractions.
+
+We get offers from the same vendors again and again. Once an offer has been
+extracted and confirmed, meaning its order lines add up to the stated net total
+and the result did not come from the degraded fallback, ``learn()`` stores the
+vendor's layout:
+
+- the vendor name and VAT id;
+- the labels its totals and shipping costs sit behind (for example
+  "Angebotssumme (netto)", which the generic rules don't know);
+- which line parser reproduced its order lines, or else a line-item regex
+  derived from the confirmed lines.
+
+Templates are keyed by ``vendor_vat_id`` and, for offers without one, by a
+fingerprint of the letterhead. ``find()`` picks the template for a new offer,
+and ``offer_rules.pre_extract`` tries it before the generic rules. The LLM is
+then only asked for whatever the template leaves open. A template only resolves
+lines that add up to the stated total, which is the check on its result.
+"""
+import hashlib
+import json
+import re
+from collections import Counter
+from decimal import Decimal
+from typing import List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from .. import models
+from . import metrics, offer_rules
+from .extractor import ExtractedOrderLine, OfferExtraction
+from .status_metrics import utcnow
+
+SHIPPING_PRODUCT = re.compile(r"versand|fracht|transport|liefer|porto|shipping", re.IGNORECASE)
+NUMBER = r"-?[\d.,]*\d"
+PAGE_MARKER = re.compile(r"^(seite|page|blatt)\b", re.IGNORECASE)
+
+
+def fingerprint(text: str) -> str:
+    """Hash of the letterhead's first line (digits removed), stable across a vendor's offers."""
+    lines = (raw.strip() for raw in text.splitlines())
+    first = next((line for line in lines if line and not PAGE_MARKER.match(line)), "")
+    normalized = re.sub(r"\s+", " ", re.sub(r"\d", "", first)).casefold()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def find(db: Session, text: str) -> Optional[models.VendorTemplate]:
+    """
+    The template for the vendor of ``text``: by a labelled VAT id in the text,
+    else by letterhead fingerprint. Either way the template's vendor name must
+    appear in the text too, so a buyer's or third party's VAT id can't book the
+    offer to the wrong vendor.
+    """
+    folded = text.casefold()
+    vat_ids = offer_rules.find_vat_ids(text)
+    if vat_ids:
+        by_vat_id = {
+            template.vendor_vat_id: template
+            for template in db.scalars(
+                select(models.VendorTemplate).where(models.VendorTemplate.vendor_vat_id.in_(vat_ids))
+            )
+        }
+        for vat_id in vat_ids:
+            template = by_vat_id.get(vat_id)
+            if template is not None and template.vendor_name.casefold() in folded:
+                return template
+    candidates = db.scalars(
+        select(models.VendorTemplate)
+        .where(models.VendorTemplate.fingerprint == fingerprint(text))
+        .order_by(models.VendorTemplate.updated_at.desc())
+    )
+    return next((template for template in candidates if template.vendor_name.casefold() in folded), None)
+
+
+def for_rules(template: Optional[models.VendorTemplate]) -> Optional[dict]:
+    """The template in the shape ``offer_rules.pre_extract`` takes."""
+    if template is None:
+        return None
+    return {"vendor_name": template.vendor_name, "vendor_vat_id": template.vendor_vat_id, **json.loads(template.content)}
+
+
+def _formats(value: Decimal) -> List[str]:
+    """How ``value`` may be printed: 1.552,26 / 1552,26 / 1552.26 / 1,552.26 (and 2100 for whole amounts)."""
+    value = Decimal(value).quantize(Decimal("0.01"))
+    us = f"{value:,.2f}"
+    german = us.replace(",", "_").replace(".", ",").replace("_", ".")
+    formats = [german, german.replace(".", ""), us.replace(",", ""), us]
+    if value == value.to_integral_value():
+        formats.append(str(int(value)))
+    return list(dict.fromkeys(formats))
+
+
+def label_of(text: str, value: Decimal) -> Optional[str]:
+    """The label printed before ``value`` on its line, e.g. "Angebotssumme (netto)"."""
+    for printed in _formats(value):
+        match = re.search(
+            rf"^[ \t]*(?P<label>[^\n\d]*?[^\W\d_][^\n\d]*?)[\s:€]*{re.escape(printed)}(?![\d,]|\.\d)", text, re.MULTILINE
+        )
+        if match:
+            label = match["label"].strip(" \t:€")
+            if label:
+                return label
+    return None
+
+
+def learn_line_pattern(text: str, line: ExtractedOrderLine) -> Optional[str]:
+    """
+    A regex for the vendor's line-item rows, derived from the row that printed ``line``.
+
+    The row is read from the right: the total, unit price, discount and quantity
+    become named groups, short words in between (units like "Stk." or "x")
+    become the unit, and everything before the quantity is the product.
+    """
+    for raw in text.splitlines():
+        tokens = raw.split()
+        parts, roles = [], set()
+        index = len(tokens) - 1
+        while index >= 0:
+            token = tokens[index].strip("€")
+            value = offer_rules.parse_money(token) if re.fullmatch(NUMBER, token) else None
+            if tokens[index] == "€":
+                parts.insert(0, "€")
+            elif token.endswith("%"):
+                parts.insert(0, rf"(?P<discount>{NUMBER})\s?%")
+            elif value is not None and "total" not in roles and value == line.total_price:
+                roles.add("total")
+                parts.insert(0, rf"€?\s?(?P<total>{NUMBER})")
+            elif value is not None and "unit_price" not in roles and value == line.unit_price:
+                roles.add("unit_price")
+                parts.insert(0, rf"€?\s?(?P<unit_price>{NUMBER})")
+            elif value is not None and "total" in roles and value == line.amount:
+                roles.add("amount")
+                parts.insert(0, r"(?P<amount>\d+(?:,\d+)?)")
+                break
+            elif value is None and "total" in roles and len(token) <= 6 and "unit" not in roles:
+                roles.add("unit")
+                parts.insert(0, r"(?P<unit>\S+)")
+            else:
+                break
+            index -= 1
+        if {"total", "unit_price", "amount"} <= roles and index > 0:
+            pattern = r"^(?:\d{1,3}\s+)?(?P<product>.+?)\s+" + r"\s+".join(parts) + r"\s*€?$"
+            try:
+                re.compile(pattern)
+            except re.error:
+                continue
+            return pattern
+    return None
+
+
+def _items(extraction: OfferExtraction) -> List[ExtractedOrderLine]:
+    return [line for line in extraction.order_lines if not SHIPPING_PRODUCT.search(line.product)]
+
+
+def _same_totals(lines, expected) -> bool:
+    return bool(lines) and Counter(line.total_price for line in lines) == Counter(line.total_price for line in expected)
+
+
+def learn_content(text: str, extraction: OfferExtraction) -> dict:
+    """The layout part of a template: labels, line parser or line pattern."""
+    items = _items(extraction)
+    shipping = sum((line.total_price for line in extraction.order_lines if line not in items), Decimal("0"))
+    labels = {"total_cost": label_of(text, extraction.total_cost)}
+    if shipping:
+        labels["shipping"] = label_of(text, shipping)
+        labels["positions_net"] = label_of(text, extraction.total_cost - shipping)
+    content = {"labels": {name: label for name, label in labels.items() if label}}
+
+    for name, parser in offer_rules.PARSERS.items():
+        if _same_totals(parser(text), items):
+            content["line_parser"] = name
+            return content
+    for item in items:
+        pattern = learn_line_pattern(text, item)
+        if pattern and _same_totals(offer_rules.parse_with_pattern(text, pattern), items):
+            content["line_pattern"] = pattern
+            return content
+    return content
+
+
+def confirmed(extraction: OfferExtraction) -> bool:
+    """Whether ``extraction`` is trustworthy enough to learn from."""
+    return (
+        extraction.source != "degraded"
+        and extraction.vendor_name not in ("", "Unknown Vendor")
+        and bool(_items(extraction))
+        and sum(line.total_price for line in extraction.order_lines) == extraction.total_cost
+    )
+
+
+def learn(db: Session, text: str, extraction: OfferExtraction) -> Optional[models.VendorTemplate]:
+    """
+    Create or refresh the vendor's template from a confirmed extraction, in the
+    caller's transaction: it is only kept if the caller commits.
+    """
+    if not confirmed(extraction):
+        return None
+    table = models.VendorTemplate
+    content = json.dumps(learn_content(text, extraction), sort_keys=True, ensure_ascii=False)
+    now = utcnow()
+    values = {"fingerprint": fingerprint(text), "vendor_name": extraction.vendor_name, "content": content}
+    vat_id = extraction.vendor_vat_id.replace(" ", "") if extraction.vendor_vat_id else None
+    if vat_id:
+        # an upsert, so a worker learning the same vendor concurrently confirms instead of conflicting
+        stmt = sqlite_insert(table).values(
+            vendor_vat_id=vat_id, confirmations=1, created_at=now, updated_at=now, **values
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["vendor_vat_id"],
+            set_={**values, "confirmations": table.confirmations + 1, "updated_at": now},
+        ).returning(table.id, table.confirmations)
+        template_id, confirmations = db.execute(stmt).one()
+        template = db.get(table, template_id, populate_existing=True)
+    else:
+        template = db.scalars(
+            select(table).where(table.vendor_vat_id.is_(None), table.fingerprint == values["fingerprint"])
+        ).first()
+        if template is None:
+            template = table(vendor_vat_id=None, confirmations=1, created_at=now, updated_at=now, **values)
+            db.add(template)
+            db.flush()
+        else:
+            for name, value in values.items():
+                setattr(template, name, value)
+            template.confirmations += 1
+            template.updated_at = now
+        confirmations = template.confirmations
+    metrics.VENDOR_TEMPLATES.inc(event="learned" if confirmations == 1 else "confirmed")
+    return template
@@ -0,0 +1,102 @@
+"""
+Upload store and garbage collection of orphaned offer files.
+
+Offer files live in ``UPLOAD_DIR`` and are referenced by ``attachments.path``.
+Everything in it is treated as an upload, so keep no other files there (the
+sample offers used by tests and benchmarks live in ``backend/samples``).
+Deleting requests (which cascades to attachments) leaves their files behind, as
+do uploads whose request creation failed afterwards. ``collect_garbage`` removes
+files that no attachment references; files younger than ``min_age`` are kept
+because their attachment row may not be committed yet.
+
+The background sweeper is opt-in: set ``UPLOAD_GC_INTERVAL`` (seconds) to run
+it from the API process, or run ``python -m app.gc_uploads`` from cron.
+"""
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import List
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..db import ArchiveSessionLocal, SessionLocal
+from .. import models
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_DIR = Path(os.getenv("UPLOAD_DIR", "uploads"))
+
+UPLOAD_GC_INTERVAL = float(os.getenv("UPLOAD_GC_INTERVAL", "0"))  # 0 disables the background sweeper
+UPLOAD_GC_MIN_AGE = float(os.getenv("UPLOAD_GC_MIN_AGE", "3600"))
+
+
+def referenced_files(db: Session) -> set:
+    """File names (relative to the upload dir) still referenced by a hot or archived attachment."""
+    from .archive import archived_attachment_paths
+
+    paths = list(db.scalars(select(models.Attachment.path).execution_options(yield_per=1000)))
+    with ArchiveSessionLocal() as archive_db:
+        paths += archived_attachment_paths(archive_db)
+    return {Path(path).name for path in paths}
+
+
+def collect_garbage(
+    db: Session,
+    upload_dir: Path = UPLOAD_DIR,
+    min_age: float = UPLOAD_GC_MIN_AGE,
+    dry_run: bool = False,
+) -> List[Path]:
+    """Delete unreferenced files older than ``min_age`` seconds. Returns the (would-be) removed paths."""
+    upload_dir = Path(upload_dir)
+    if not upload_dir.is_dir():
+        return []
+    # list files before reading references, so a file uploaded in between is never judged orphaned
+    cutoff = time.time() - min_age
+    candidates = [path for path in upload_dir.iterdir() if path.is_file() and path.stat().st_mtime < cutoff]
+    referenced = referenced_files(db)
+    db.rollback()
+
+    removed = []
+    for path in candidates:
+        if path.name in referenced:
+            continue
+        if not dry_run:
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                continue
+        removed.append(path)
+    return removed
+
+
+class UploadSweeper:
+    """Runs ``collect_garbage`` every ``interval`` seconds on a daemon thread."""
+
+    def __init__(self, interval: float, upload_dir: Path = UPLOAD_DIR, min_age: float = UPLOAD_GC_MIN_AGE):
+        self.interval = interval
+        self.upload_dir = upload_dir
+        self.min_age = min_age
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="upload-gc", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                with SessionLocal() as db:
+                    removed = collect_garbage(db, self.upload_dir, self.min_age)
+                if removed:
+                    logger.info(f"Upload GC removed {len(removed)} orphaned files")
+            except Exception:
+                logger.exception("Upload GC sweep failed")
@@ -0,0 +1 @@
+"""Offline micro-benchmarks for the CPU hot paths; run with ``python -m benchmarks`` from backend/."""
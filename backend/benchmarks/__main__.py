@@ -0,0 +1,76 @@
+"""
+Run the micro-benchmarks and store the results as JSON, optionally comparing
+them against a baseline.
+
+Typical use, from backend/:
+
+    python -m benchmarks --output baseline.json            # before a change
+    python -m benchmarks --compare baseline.json           # after it
+    python -m benchmarks --compare baseline.json --against after.json   # no run
+    python -m benchmarks --group db --sizes 1000 -k list   # a subset
+
+With --compare the exit status is 1 if any benchmark got slower than the
+threshold, so the comparison can gate CI.
+"""
+import argparse
+import logging
+import sys
+import tempfile
+from pathlib import Path
+
+from . import harness
+from .cases import DEFAULT_SIZES, GROUPS
+
+
+def collect(groups, sizes, data_dir, keyword=None):
+    for group in groups:
+        factory = GROUPS[group]
+        cases = factory(data_dir, sizes) if group == "db" else factory()
+        for name, func in cases:
+            if keyword is None or keyword in name:
+                yield name, func
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--group", action="append", choices=sorted(GROUPS), help="benchmark group (repeatable; default all)")
+    parser.add_argument("-k", dest="keyword", help="only run benchmarks whose name contains this string")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="seeded request counts for db cases")
+    parser.add_argument("--repeat", type=int, default=harness.DEFAULT_REPEAT)
+    parser.add_argument("--min-time", type=float, default=harness.DEFAULT_MIN_TIME, help="minimum seconds per timed run")
+    parser.add_argument("--data-dir", type=Path, default=Path(tempfile.gettempdir()) / "asklio-benchmarks",
+                        help="where seeded benchmark databases are kept between runs")
+    parser.add_argument("--output", type=Path, default=Path("benchmark-results.json"))
+    parser.add_argument("--compare", type=Path, metavar="BASELINE", help="compare against this results file")
+    parser.add_argument("--against", type=Path, metavar="RESULTS", help="with --compare: compare this file instead of running")
+    parser.add_argument("--threshold", type=float, default=harness.REGRESSION_THRESHOLD,
+                        help="relative median change reported as slower/faster (default 0.10)")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.INFO)  # the PDF and request paths log every call
+
+    if args.against:
+        if not args.compare:
+            parser.error("--against needs --compare")
+        current = harness.load(args.against)
+    else:
+        args.data_dir.mkdir(parents=True, exist_ok=True)
+        sizes = [int(size) for size in args.sizes.split(",") if size]
+        current = {}
+        for name, func in collect(args.group or list(GROUPS), sizes, args.data_dir, args.keyword):
+            current[name] = harness.measure(func, repeat=args.repeat, min_time=args.min_time)
+            print(harness.format_results({name: current[name]}), flush=True)
+        harness.save(args.output, current)
+        print(f"Wrote {len(current)} results to {args.output}")
+
+    if args.compare:
+        rows = harness.compare(harness.load(args.compare), current, args.threshold)
+        print()
+        print(harness.format_comparison(rows))
+        if any(row["verdict"] == "slower" for row in rows):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,190 @@
+"""
+Benchmark cases for the CPU hot paths of offer processing and the request API.
+
+Groups (select with ``--group``):
+
+- ``text``: ``sanitize_extracted_text`` on the text of the sample offers
+- ``pdf``: ``extract_text_from_pdf`` on every PDF in ``backend/samples``
+- ``validation``: ``clean_monetary_value`` and the ``OfferExtraction`` validators
+- ``db``: ``list_requests`` / ``get_request`` with response serialization at
+  each seeded size, and the ``create_request`` insert path
+
+Database cases run against their own SQLite files in ``--data-dir``, seeded
+once per size and schema through the bulk insert path and reused by later runs,
+so local.db is never touched. Nothing calls the LLM.
+"""
+import io
+import itertools
+import random
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Tuple
+
+from fastapi import Response
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from app import migrate, models, schemas
+from app.db import Base
+from app.routers.requests import (
+    _create_request,
+    extract_text_from_pdf,
+    get_request,
+    list_requests,
+    sanitize_extracted_text,
+)
+from app.seed_commodity_groups import COMMODITY_GROUPS
+from app.services import bulk
+from app.services.extractor import OfferExtraction, clean_monetary_value
+
+SAMPLES = Path(__file__).resolve().parent.parent / "samples"
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+
+DEPARTMENTS = ["IT", "Marketing", "HR", "Finance", "Operations", "Facilities"]
+VENDORS = ["Gärtner Gregg", "ACME Corp", "Büro Schmidt GmbH", "Dell Technologies", "Lyreco", "Würth"]
+
+MONEY_STRINGS = ["1.767,26 €", "150,00", "€ 2.499,99", "113.85", "EUR 19,90", "1,234.56 USD", 42, 9.99]
+
+EXTRACTION = {
+    "title": "Office Furniture Purchase",
+    "vendor_name": "Gärtner Gregg",
+    "vendor_vat_id": "DE198570491",
+    "department": None,
+    "order_lines": [
+        {
+            "product": f"Position {i}",
+            "description": f"Schreibtisch Modell {i}",
+            "unit_price": "1.299,00 €",
+            "amount": 2,
+            "unit": "Stk",
+            "total_price": "2.598,00 €",
+        }
+        for i in range(10)
+    ] + [{"product": "Versandkosten", "description": "Versandkosten", "unit_price": "113,85",
+          "amount": 1, "unit": None, "total_price": "113,85"}],
+    "total_cost": "26.093,85 €",
+}
+
+Case = Tuple[str, Callable[[], object]]
+
+
+def pdf_files() -> List[Path]:
+    return sorted(SAMPLES.glob("*.pdf"))
+
+
+def offer_texts() -> List[str]:
+    texts = [path.read_text(encoding="utf-8", errors="ignore") for path in sorted(SAMPLES.glob("*.txt"))]
+    texts += [extract_text_from_pdf(str(path)) for path in pdf_files()]
+    return texts
+
+
+def text_cases() -> Iterator[Case]:
+    texts = offer_texts()
+    # raw pdfplumber output still has the operators and control characters sanitize strips
+    noisy = "\n".join(texts) + "\x00\x07 BT /F1 12 Tf 72 712 Td (x) Tj ET " * 50
+    yield "text.sanitize.offers", lambda: [sanitize_extracted_text(text) for text in texts]
+    yield "text.sanitize.noisy", lambda: sanitize_extracted_text(noisy)
+
+
+def pdf_cases() -> Iterator[Case]:
+    for path in pdf_files():
+        contents = path.read_bytes()
+        yield f"pdf.extract.{path.stem}", lambda contents=contents: extract_text_from_pdf(io.BytesIO(contents))
+
+
+def validation_cases() -> Iterator[Case]:
+    yield "validation.clean_monetary_value", lambda: [clean_monetary_value(value) for value in MONEY_STRINGS]
+    yield "validation.offer_extraction", lambda: OfferExtraction.model_validate(EXTRACTION)
+
+
+def request_payloads(count: int, seed: int = 42) -> List[dict]:
+    rng = random.Random(seed)
+    payloads = []
+    for i in range(count):
+        lines = [
+            {
+                "description": f"Item {i}-{n}",
+                "unit_price": f"{rng.randint(100, 500_000) / 100:.2f}",
+                "amount": rng.randint(1, 20),
+                "unit": "pcs",
+            }
+            for n in range(rng.randint(1, 4))
+        ]
+        payloads.append({
+            "requestor_name": f"Requestor {i % 250}",
+            "title": f"Benchmark request {i}",
+            "department": rng.choice(DEPARTMENTS),
+            "vendor_name": rng.choice(VENDORS),
+            "vendor_vat_id": "DE123456789",
+            "order_lines": lines,
+        })
+    return payloads
+
+
+def _open(path: Path) -> sessionmaker:
+    """Sessions on the SQLite file ``path``, created with the current schema and commodity groups."""
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(
+            models.CommodityGroup.__table__.insert().prefix_with("OR IGNORE"),
+            [{"id": id, "category": category, "name": name} for id, category, name in COMMODITY_GROUPS],
+        )
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def seeded_sessionmaker(data_dir: Path, size: int) -> sessionmaker:
+    """Sessions on a database holding ``size`` requests; reused while the schema is unchanged."""
+    path = Path(data_dir) / f"requests-{size}-{migrate.schema_checksum()[:12]}.db"
+    factory = _open(path)
+    with factory() as db:
+        existing = db.scalar(select(func.count()).select_from(models.ProcurementRequest))
+        if existing != size:
+            if existing:
+                raise RuntimeError(f"{path} holds {existing} requests instead of {size}; delete it to reseed")
+            bulk.create_requests(db, request_payloads(size))
+    return factory
+
+
+def db_cases(data_dir: Path, sizes=DEFAULT_SIZES) -> Iterator[Case]:
+    adapter = TypeAdapter(List[schemas.ProcurementRequestOut])
+    single = TypeAdapter(schemas.ProcurementRequestOut)
+
+    for size in sizes:
+        factory = seeded_sessionmaker(data_dir, size)
+
+        def list_all(factory=factory):
+            with factory() as db:
+                rows = list_requests(filters=[], db=db)
+                return adapter.dump_json(adapter.validate_python(rows, from_attributes=True))
+
+        ids = itertools.cycle(random.Random(size).sample(range(1, size + 1), min(size, 1000)))
+
+        def get_one(factory=factory, ids=ids):
+            with factory() as db:
+                req = get_request(next(ids), Response(), db=db, archive_db=None)
+                return single.dump_json(single.validate_python(req, from_attributes=True))
+
+        yield f"db.list_requests.{size}", list_all
+        yield f"db.get_request.{size}", get_one
+
+    insert_path = Path(data_dir) / "insert.db"
+    insert_path.unlink(missing_ok=True)
+    insert_factory = _open(insert_path)
+    payloads = itertools.cycle(
+        [schemas.ProcurementRequestCreate.model_validate(payload) for payload in request_payloads(100, seed=7)]
+    )
+
+    def create_one():
+        with insert_factory() as db:
+            return _create_request(next(payloads), None, db)
+
+    yield "db.create_request", create_one
+
+
+GROUPS: Dict[str, Callable[..., Iterator[Case]]] = {
+    "text": text_cases,
+    "pdf": pdf_cases,
+    "validation": validation_cases,
+    "db": db_cases,
+}
@@ -0,0 +1,228 @@
+"""
+Local stand-in for the OpenAI chat-completions API, for load tests without network.
+
+Implements POST /v1/chat/completions as used by the extractor, commodity
+prediction (structured output via ``response_format`` json_schema, which the
+SDK's ``parse()`` sends) and chat (plain text). Structured responses are
+generated from the requested JSON schema; string fields with a ``pattern``
+reuse a matching token from the prompt, so commodity predictions are ids from
+the list the backend sent.
+
+    python -m benchmarks.fake_openai --port 8100 --latency lognormal:0.8,0.4 \\
+        --error-rate 0.02 --rate-limit 20 --burst 40
+
+    OPENAI_BASE_URL=http://127.0.0.1:8100/v1 OPENAI_API_KEY=fake uvicorn app.main:app
+
+Latency distributions: ``fixed:S``, ``uniform:LO,HI``, ``normal:MEAN,STD`` and
+``lognormal:MEDIAN,SIGMA`` (seconds). Injected errors return ``--error-status``
+(default 500); requests over the token-bucket rate limit get 429 with
+Retry-After, which the SDK retries like the real API. GET /stats reports counters.
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+CHAT_REPLY = (
+    "Based on the current procurement requests, everything looks on track. "
+    "Let me know if you want details on a specific request."
+)
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """``kind:params`` to a sampler of non-negative seconds."""
+    kind, _, params = spec.partition(":")
+    values = [float(value) for value in params.split(",") if value]
+    if kind == "fixed" and len(values) == 1:
+        return lambda rng: values[0]
+    if kind == "uniform" and len(values) == 2:
+        return lambda rng: rng.uniform(*values)
+    if kind == "normal" and len(values) == 2:
+        return lambda rng: max(0.0, rng.gauss(*values))
+    if kind == "lognormal" and len(values) == 2:
+        median, sigma = values
+        return lambda rng: rng.lognormvariate(math.log(median), sigma) if median > 0 else 0.0
+    raise ValueError(f"Unknown latency distribution {spec!r}; use fixed:S, uniform:LO,HI, normal:M,SD or lognormal:MEDIAN,SIGMA")
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+@dataclass
+class FakeConfig:
+    latency: str = "fixed:0"
+    error_rate: float = 0.0
+    error_status: int = 500
+    rate_limit: float = 0.0  # requests per second; 0 disables
+    burst: float = 0.0  # bucket size; defaults to rate_limit
+    seed: Optional[int] = None
+    stats: Counter = field(default_factory=Counter)
+
+
+def _tokens(text: str) -> int:
+    return max(1, len(text) // 4)  # the usual ~4 characters per token estimate
+
+
+def _resolve(schema: dict, defs: dict) -> dict:
+    while "$ref" in schema:
+        schema = defs[schema["$ref"].rsplit("/", 1)[-1]]
+    return schema
+
+
+def fake_instance(schema: dict, defs: dict, prompt: str, rng: random.Random, name: str = "value"):
+    """A value that validates against ``schema`` (the strict subset the SDK generates)."""
+    schema = _resolve(schema, defs)
+    if "anyOf" in schema:
+        options = [option for option in schema["anyOf"] if _resolve(option, defs).get("type") != "null"]
+        return fake_instance(options[0], defs, prompt, rng, name) if options else None
+    kind = schema.get("type")
+    if isinstance(kind, list):
+        kind = next((item for item in kind if item != "null"), "null")
+    if kind == "object":
+        return {
+            key: fake_instance(value, defs, prompt, rng, key) for key, value in schema.get("properties", {}).items()
+        }
+    if kind == "array":
+        return [fake_instance(schema.get("items", {}), defs, prompt, rng, name) for _ in range(rng.randint(1, 3))]
+    if kind == "integer":
+        return rng.randint(1, 10)
+    if kind == "number":
+        return round(rng.uniform(10, 2000), 2)
+    if kind == "boolean":
+        return rng.random() < 0.5
+    if kind == "string":
+        if "enum" in schema:
+            return rng.choice(schema["enum"])
+        if "pattern" in schema:
+            pattern = re.compile(schema["pattern"])
+            candidates = [token for token in re.findall(r"[\w-]+", prompt) if pattern.fullmatch(token)]
+            return candidates[0] if candidates else ""
+        return f"Fake {name.replace('_', ' ')}"
+    return None
+
+
+def completion_content(body: dict, rng: random.Random) -> str:
+    messages = body.get("messages", [])
+    prompt = "\n".join(str(message.get("content", "")) for message in messages if message.get("role") == "user")
+    response_format = body.get("response_format") or {}
+    if response_format.get("type") == "json_schema":
+        schema = response_format["json_schema"]["schema"]
+        return json.dumps(fake_instance(schema, schema.get("$defs", {}), prompt, rng))
+    if response_format.get("type") == "json_object":
+        return "{}"
+    return CHAT_REPLY
+
+
+def _error(status: int, message: str, error_type: str, headers: Optional[dict] = None) -> JSONResponse:
+    return JSONResponse(
+        {"error": {"message": message, "type": error_type, "param": None, "code": None}},
+        status_code=status,
+        headers=headers,
+    )
+
+
+def create_app(config: FakeConfig) -> FastAPI:
+    app = FastAPI(title="Fake OpenAI")
+    rng = random.Random(config.seed)
+    sample_latency = parse_latency(config.latency)
+    bucket = TokenBucket(config.rate_limit, config.burst or config.rate_limit) if config.rate_limit > 0 else None
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        config.stats["requests"] += 1
+        if bucket is not None and not bucket.take():
+            config.stats["rate_limited"] += 1
+            return _error(429, "Rate limit reached (fake server)", "rate_limit_exceeded", {"retry-after": "1"})
+
+        await asyncio.sleep(sample_latency(rng))
+        if config.error_rate and rng.random() < config.error_rate:
+            config.stats["errors"] += 1
+            return _error(config.error_status, "Injected failure (fake server)", "server_error")
+
+        content = completion_content(body, rng)
+        prompt_tokens = sum(_tokens(str(message.get("content", ""))) for message in body.get("messages", []))
+        completion_tokens = _tokens(content)
+        config.stats["completed"] += 1
+        return {
+            "id": f"chatcmpl-fake-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4o-mini"),
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content, "refusal": None},
+                    "finish_reason": "stop",
+                    "logprobs": None,
+                }
+            ],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    @app.get("/stats")
+    def stats():
+        return dict(config.stats)
+
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency", default="lognormal:0.8,0.4", help="latency distribution (see above)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="requests per second (0 = unlimited)")
+    parser.add_argument("--burst", type=float, default=0.0, help="rate-limit bucket size (default: --rate-limit)")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+
+    import uvicorn
+
+    parse_latency(args.latency)  # fail fast on a bad spec
+    config = FakeConfig(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        rate_limit=args.rate_limit,
+        burst=args.burst,
+        seed=args.seed,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
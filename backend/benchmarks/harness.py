@@ -0,0 +1,117 @@
+"""
+Timing, result files and baseline comparison for the benchmark suite.
+
+Each benchmark is a zero-argument callable. ``measure`` calibrates how many
+calls make one run of at least ``min_time`` seconds (like ``timeit`` autorange), then
+times ``repeat`` runs and reports per-call seconds. Comparisons use the median,
+which is less sensitive to a noisy run than the mean.
+"""
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import timeit
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+DEFAULT_REPEAT = 5
+DEFAULT_MIN_TIME = 0.2
+REGRESSION_THRESHOLD = 0.10  # 10% slower median counts as a regression
+
+
+def measure(func: Callable[[], object], repeat: int = DEFAULT_REPEAT, min_time: float = DEFAULT_MIN_TIME) -> dict:
+    timer = timeit.Timer(func)
+    number = 1
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= min_time:
+            break
+        number *= 2 if elapsed == 0 else max(2, min(10, int(min_time / elapsed) + 1))
+    runs = [elapsed / number] + [seconds / number for seconds in timer.repeat(repeat - 1, number)]
+    return {
+        "number": number,
+        "repeat": repeat,
+        "min": min(runs),
+        "median": statistics.median(runs),
+        "mean": statistics.fmean(runs),
+        "stdev": statistics.stdev(runs) if len(runs) > 1 else 0.0,
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def metadata() -> dict:
+    return {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": _git_commit(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+    }
+
+
+def save(path: Path, results: Dict[str, dict]) -> None:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({"meta": metadata(), "results": results}, indent=2) + "\n")
+
+
+def load(path: Path) -> Dict[str, dict]:
+    return json.loads(Path(path).read_text())["results"]
+
+
+def compare(baseline: Dict[str, dict], current: Dict[str, dict], threshold: float = REGRESSION_THRESHOLD) -> List[dict]:
+    """One row per benchmark in either run; ``change`` is the relative change of the median."""
+    rows = []
+    for name in sorted(set(baseline) | set(current)):
+        before, after = baseline.get(name), current.get(name)
+        row = {"name": name, "baseline": before and before["median"], "current": after and after["median"]}
+        if before and after:
+            row["change"] = after["median"] / before["median"] - 1 if before["median"] else 0.0
+            row["verdict"] = (
+                "slower" if row["change"] > threshold else "faster" if row["change"] < -threshold else "same"
+            )
+        else:
+            row["change"] = None
+            row["verdict"] = "new" if after else "missing"
+        rows.append(row)
+    return rows
+
+
+def format_seconds(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "-"
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.3g} {unit}"
+    return f"{seconds / 1e-9:.3g} ns"
+
+
+def format_results(results: Dict[str, dict]) -> str:
+    width = max([len(name) for name in results] + [36])
+    return "\n".join(
+        f"{name:<{width}}  median {format_seconds(stats['median']):>9}  "
+        f"min {format_seconds(stats['min']):>9}  (x{stats['number']}, {stats['repeat']} runs)"
+        for name, stats in results.items()
+    )
+
+
+def format_comparison(rows: List[dict]) -> str:
+    width = max((len(row["name"]) for row in rows), default=0)
+    lines = []
+    for row in rows:
+        change = "" if row["change"] is None else f"{row['change']:+.1%}"
+        lines.append(
+            f"{row['name']:<{width}}  {format_seconds(row['baseline']):>9} -> {format_seconds(row['current']):>9}"
+            f"  {change:>8}  {row['verdict']}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,200 @@
+"""
+End-to-end ingestion run: every sample offer in backend/samples through POST
+/requests/create-from-offer, with per-stage latency, token usage and
+field-level accuracy against the golden extractions in benchmarks/golden.
+
+LLM responses come from cassettes (see app/services/cassettes.py). Record them
+once with a real API key, then replay offline and deterministically:
+
+    python -m benchmarks.ingestion --mode record     # needs OPENAI_API_KEY
+    python -m benchmarks.ingestion                   # replay, no network
+    python -m benchmarks.ingestion --latency recorded --output ingestion.json
+
+The app runs in-process against a throwaway working directory (its own
+local.db and uploads/), so the real database is never touched. Stages:
+pdf_parse, llm_extractor and llm_commodity come from the /metrics registry,
+db from the X-DB-Time-Ms header; total is the wall time of the request.
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import statistics
+import sys
+import tempfile
+import time
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+from typing import Dict, List, Optional
+
+BENCHMARKS = Path(__file__).resolve().parent
+SAMPLES = BENCHMARKS.parent / "samples"
+GOLDEN_DIR = BENCHMARKS / "golden"
+CASSETTE_DIR = BENCHMARKS / "cassettes"
+
+STAGES = ["pdf_parse", "llm_extractor", "llm_commodity", "db", "total"]
+FIELDS = ["vendor_name", "vendor_vat_id", "total_cost", "order_line_count", "order_line_totals"]
+
+
+def golden_name(path: Path) -> str:
+    """Sample offers are named like uploads, '<request id>_<original name>'; goldens are keyed by the original name."""
+    return re.sub(r"^\d+_", "", path.stem)
+
+
+def load_golden(path: Path) -> Optional[dict]:
+    golden = GOLDEN_DIR / f"{golden_name(path)}.json"
+    return json.loads(golden.read_text(encoding="utf-8")) if golden.exists() else None
+
+
+def _normalize(value) -> str:
+    return re.sub(r"\s+", " ", str(value or "")).strip().casefold()
+
+
+def _money(value) -> Optional[Decimal]:
+    try:
+        return Decimal(str(value)).quantize(Decimal("0.01"))
+    except (InvalidOperation, TypeError):
+        return None
+
+
+def score(extracted: dict, golden: dict) -> Dict[str, bool]:
+    """Field-level comparison of a created request against its golden extraction."""
+    lines = extracted.get("order_lines", [])
+    return {
+        "vendor_name": _normalize(extracted.get("vendor_name")) == _normalize(golden["vendor_name"]),
+        "vendor_vat_id": _normalize(extracted.get("vendor_vat_id")).replace(" ", "")
+        == _normalize(golden.get("vendor_vat_id")).replace(" ", ""),
+        "total_cost": _money(extracted.get("total_cost")) == _money(golden["total_cost"]),
+        "order_line_count": len(lines) == len(golden["order_lines"]),
+        "order_line_totals": sorted(_money(line.get("total_price")) for line in lines)
+        == sorted(_money(line["total_price"]) for line in golden["order_lines"]),
+    }
+
+
+def _stage_totals(metrics) -> Dict[str, float]:
+    return {
+        "pdf_parse": metrics.PDF_PARSE_TIME.total(),
+        "llm_extractor": metrics.LLM_LATENCY.total(call_site="extractor"),
+        "llm_commodity": metrics.LLM_LATENCY.total(call_site="commodity"),
+        "prompt_tokens": metrics.LLM_TOKENS.total(kind="prompt"),
+        "completion_tokens": metrics.LLM_TOKENS.total(kind="completion"),
+    }
+
+
+def run(inputs: List[Path], client, metrics) -> List[dict]:
+    results = []
+    for path in inputs:
+        before = _stage_totals(metrics)
+        start = time.perf_counter()
+        response = client.post(
+            "/requests/create-from-offer",
+            files={"file": (path.name, path.read_bytes(), "application/octet-stream")},
+        )
+        total = time.perf_counter() - start
+        after = _stage_totals(metrics)
+        delta = {name: after[name] - before[name] for name in after}
+
+        result = {
+            "file": path.name,
+            "status": response.status_code,
+            "stages": {
+                "pdf_parse": delta["pdf_parse"],
+                "llm_extractor": delta["llm_extractor"],
+                "llm_commodity": delta["llm_commodity"],
+                "db": float(response.headers.get("x-db-time-ms", 0)) / 1000,
+                "total": total,
+            },
+            "tokens": {"prompt": int(delta["prompt_tokens"]), "completion": int(delta["completion_tokens"])},
+        }
+        if response.status_code != 200:
+            result["error"] = response.json().get("detail")
+        else:
+            golden = load_golden(path)
+            result["accuracy"] = score(response.json(), golden) if golden else None
+        results.append(result)
+    return results
+
+
+def summarize(results: List[dict]) -> dict:
+    ok = [result for result in results if result["status"] == 200]
+    scored = [result["accuracy"] for result in ok if result.get("accuracy")]
+    return {
+        "files": len(results),
+        "succeeded": len(ok),
+        "stages": {
+            stage: {
+                "mean": statistics.fmean(result["stages"][stage] for result in ok),
+                "max": max(result["stages"][stage] for result in ok),
+            }
+            for stage in STAGES
+        } if ok else {},
+        "tokens": {
+            kind: sum(result["tokens"][kind] for result in results) for kind in ("prompt", "completion")
+        },
+        "accuracy": {
+            field: sum(accuracy[field] for accuracy in scored) / len(scored) for field in FIELDS
+        } if scored else {},
+    }
+
+
+def print_report(results: List[dict], summary: dict) -> None:
+    width = max(len(result["file"]) for result in results)
+    print(f"{'file':<{width}}  status  " + "  ".join(f"{stage:>13}" for stage in STAGES) + "  tokens  accuracy")
+    for result in results:
+        stages = "  ".join(f"{result['stages'][stage] * 1000:>10.1f} ms" for stage in STAGES)
+        tokens = result["tokens"]["prompt"] + result["tokens"]["completion"]
+        if result["status"] != 200:
+            accuracy = f"error: {result['error']}"
+        elif result["accuracy"] is None:
+            accuracy = "no golden"
+        else:
+            accuracy = f"{sum(result['accuracy'].values())}/{len(FIELDS)}"
+        print(f"{result['file']:<{width}}  {result['status']:>6}  {stages}  {tokens:>6}  {accuracy}")
+
+    print(f"\n{summary['succeeded']}/{summary['files']} files ingested; tokens {summary['tokens']}")
+    for stage, values in summary["stages"].items():
+        print(f"  {stage:<14} mean {values['mean'] * 1000:8.1f} ms  max {values['max'] * 1000:8.1f} ms")
+    for field, accuracy in summary["accuracy"].items():
+        print(f"  {field:<18} {accuracy:.0%}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["replay", "record"], default="replay")
+    parser.add_argument("--cassettes", type=Path, default=CASSETTE_DIR, help="cassette directory")
+    parser.add_argument("--latency", default="0", help="replay delay per LLM call in seconds, or 'recorded'")
+    parser.add_argument("-k", dest="keyword", help="only ingest files whose name contains this string")
+    parser.add_argument("--output", type=Path, help="also write the results as JSON")
+    args = parser.parse_args(argv)
+
+    inputs = [
+        path for path in sorted(SAMPLES.iterdir())
+        if path.suffix.lower() in (".pdf", ".txt") and (args.keyword is None or args.keyword in path.name)
+    ]
+    cassette_dir = args.cassettes.resolve()
+    output = args.output.resolve() if args.output else None
+    logging.disable(logging.ERROR)  # failures are part of the report
+
+    # the app resolves local.db, archive.db and uploads/ against the working directory
+    os.chdir(tempfile.mkdtemp(prefix="asklio-ingestion-"))
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+    from app.services import cassettes, metrics
+
+    latency = args.latency if args.latency == "recorded" else float(args.latency)
+    cassette = cassettes.Cassette(mode=args.mode, directory=cassette_dir, latency=latency)
+    with cassettes.use(cassette), TestClient(app) as client:
+        results = run(inputs, client, metrics)
+
+    summary = summarize(results)
+    print_report(results, summary)
+    if output:
+        output.write_text(json.dumps({"summary": summary, "results": results}, indent=2, default=str) + "\n")
+        print(f"Wrote {output}")
+    return 0 if summary["succeeded"] == summary["files"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
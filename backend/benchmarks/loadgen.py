@@ -0,0 +1,278 @@
+"""
+Async load generator: mixed API workloads against a running backend, reporting
+throughput and p50/p95/p99 latency per operation.
+
+Operations (weights via --mix): list (GET /requests for the load-test
+department), get (GET /requests/{id}), status (POST /requests/{id}/status),
+offer (POST /requests/create-from-offer with the files in samples/) and chat
+(POST /chat). Setup bulk-creates --seed-requests requests in a fresh
+department, so list sizes stay fixed and real data is not modified.
+
+Against servers you started yourself:
+
+    python -m benchmarks.fake_openai --port 8100 &
+    OPENAI_BASE_URL=http://127.0.0.1:8100/v1 OPENAI_API_KEY=fake uvicorn app.main:app --workers 2 &
+    python -m benchmarks.loadgen --base-url http://127.0.0.1:8000 --duration 30 --concurrency 32
+
+Or let it start both (in a throwaway working directory, with its own local.db):
+
+    python -m benchmarks.loadgen --spawn --fake-latency lognormal:0.8,0.4 --duration 30
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+BACKEND = Path(__file__).resolve().parent.parent
+SAMPLES = BACKEND / "samples"
+
+DEFAULT_MIX = "list=30,get=35,status=20,offer=10,chat=5"
+STATUSES = ["Open", "In Progress", "Closed"]
+OPERATIONS = ["list", "get", "status", "offer", "chat"]
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown operation {name!r}; choose from {', '.join(OPERATIONS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class Workload:
+    def __init__(self, client: httpx.AsyncClient, department: str, ids: List[int], rng: random.Random):
+        self.client = client
+        self.department = department
+        self.ids = ids
+        self.rng = rng
+        self.offers = [(path.name, path.read_bytes()) for path in sorted(SAMPLES.iterdir()) if path.is_file()]
+
+    async def list(self):
+        return await self.client.get("/requests", params={"department": self.department})
+
+    async def get(self):
+        return await self.client.get(f"/requests/{self.rng.choice(self.ids)}")
+
+    async def status(self):
+        return await self.client.post(
+            f"/requests/{self.rng.choice(self.ids)}/status",
+            json={"to_status": self.rng.choice(STATUSES), "changed_by": "loadgen"},
+        )
+
+    async def offer(self):
+        name, contents = self.rng.choice(self.offers)
+        return await self.client.post("/requests/create-from-offer", files={"file": (name, contents)})
+
+    async def chat(self):
+        return await self.client.post("/chat", json={"message": "Which of my requests are still open?"})
+
+
+async def setup(client: httpx.AsyncClient, count: int) -> tuple:
+    department = f"Load-{uuid.uuid4().hex[:8]}"
+    payloads = [
+        {
+            "requestor_name": "Load Generator",
+            "title": f"Load request {i}",
+            "department": department,
+            "vendor_name": "Vendor L",
+            "order_lines": [{"description": "Thing", "unit_price": 10, "amount": 1 + i % 5}],
+        }
+        for i in range(count)
+    ]
+    response = await client.post("/requests/bulk", json=payloads)
+    response.raise_for_status()
+    ids = [result["id"] for result in response.json()["results"] if result["id"] is not None]
+    return department, ids
+
+
+async def run_load(
+    client: httpx.AsyncClient,
+    mix: Dict[str, float],
+    concurrency: int = 16,
+    duration: Optional[float] = 30.0,
+    total_requests: Optional[int] = None,
+    seed_requests: int = 200,
+    seed: Optional[int] = None,
+) -> dict:
+    """Run the workload until ``duration`` seconds or ``total_requests`` have passed; returns the report."""
+    department, ids = await setup(client, seed_requests)
+    rng = random.Random(seed)
+    workload = Workload(client, department, ids, rng)
+    names, weights = list(mix), list(mix.values())
+    latencies = defaultdict(list)
+    statuses = defaultdict(Counter)
+    issued = 0
+    start = time.perf_counter()
+    deadline = start + duration if duration else None
+
+    async def worker():
+        nonlocal issued
+        while (deadline is None or time.perf_counter() < deadline) and (total_requests is None or issued < total_requests):
+            issued += 1
+            name = rng.choices(names, weights)[0]
+            began = time.perf_counter()
+            try:
+                response = await getattr(workload, name)()
+                outcome = response.status_code
+            except httpx.HTTPError as e:
+                outcome = type(e).__name__
+            latencies[name].append(time.perf_counter() - began)
+            statuses[name][outcome] += 1
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return report(latencies, statuses, elapsed, concurrency)
+
+
+def report(latencies, statuses, elapsed: float, concurrency: int) -> dict:
+    operations = {}
+    for name in sorted(latencies):
+        values = sorted(latencies[name])
+        ok = sum(count for code, count in statuses[name].items() if isinstance(code, int) and code < 400)
+        conflicts = statuses[name][409]  # concurrent writes to one request lose the optimistic-lock race
+        operations[name] = {
+            "requests": len(values),
+            "ok": ok,
+            "conflicts": conflicts,
+            "errors": len(values) - ok - conflicts,
+            "throughput": len(values) / elapsed,
+            "p50": percentile(values, 0.50),
+            "p95": percentile(values, 0.95),
+            "p99": percentile(values, 0.99),
+            "max": values[-1],
+            "statuses": {str(code): count for code, count in sorted(statuses[name].items(), key=str)},
+        }
+    total = sum(operation["requests"] for operation in operations.values())
+    return {
+        "elapsed": elapsed,
+        "concurrency": concurrency,
+        "requests": total,
+        "throughput": total / elapsed if elapsed else 0.0,
+        "operations": operations,
+    }
+
+
+def print_report(result: dict) -> None:
+    print(
+        f"{result['requests']} requests in {result['elapsed']:.1f} s "
+        f"({result['throughput']:.1f} req/s, concurrency {result['concurrency']})"
+    )
+    print(
+        f"{'operation':<10} {'requests':>8} {'errors':>7} {'409s':>6} {'req/s':>8} "
+        f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}  statuses"
+    )
+    for name, op in result["operations"].items():
+        print(
+            f"{name:<10} {op['requests']:>8} {op['errors']:>7} {op['conflicts']:>6} {op['throughput']:>8.1f} "
+            f"{op['p50'] * 1000:>9.1f} {op['p95'] * 1000:>9.1f} {op['p99'] * 1000:>9.1f}  {op['statuses']}"
+        )
+
+
+def _wait_until_up(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout:.0f} s")
+
+
+def spawn_servers(args) -> List[subprocess.Popen]:
+    """Start the fake OpenAI server and uvicorn (in a temp working directory); returns the processes."""
+    workdir = tempfile.mkdtemp(prefix="asklio-load-")
+    fake = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.fake_openai", "--port", str(args.fake_port),
+         "--latency", args.fake_latency, "--error-rate", str(args.fake_error_rate),
+         "--rate-limit", str(args.fake_rate_limit)],
+        cwd=BACKEND,
+    )
+    env = dict(os.environ, OPENAI_BASE_URL=f"http://127.0.0.1:{args.fake_port}/v1", OPENAI_API_KEY="fake")
+    backend = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--app-dir", str(BACKEND), "--port", str(args.port),
+         "--workers", str(args.workers), "--log-level", "warning"],
+        cwd=workdir,
+        env=env,
+    )
+    processes = [fake, backend]
+    try:
+        _wait_until_up(f"http://127.0.0.1:{args.fake_port}/stats")
+        _wait_until_up(f"http://127.0.0.1:{args.port}/requests/counts")
+    except RuntimeError:
+        for process in processes:
+            process.terminate()
+        raise
+    return processes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"operation weights (default {DEFAULT_MIX})")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds to run")
+    parser.add_argument("--requests", type=int, help="stop after this many requests instead")
+    parser.add_argument("--seed-requests", type=int, default=200, help="requests created for the run")
+    parser.add_argument("--timeout", type=float, default=120.0, help="per-request timeout in seconds")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--output", type=Path, help="also write the report as JSON")
+    spawn = parser.add_argument_group("--spawn: start the fake OpenAI server and uvicorn")
+    spawn.add_argument("--spawn", action="store_true")
+    spawn.add_argument("--port", type=int, default=8000)
+    spawn.add_argument("--workers", type=int, default=1)
+    spawn.add_argument("--fake-port", type=int, default=8100)
+    spawn.add_argument("--fake-latency", default="lognormal:0.8,0.4")
+    spawn.add_argument("--fake-error-rate", type=float, default=0.0)
+    spawn.add_argument("--fake-rate-limit", type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    mix = parse_mix(args.mix)
+    processes = spawn_servers(args) if args.spawn else []
+    base_url = f"http://127.0.0.1:{args.port}" if args.spawn else args.base_url
+
+    async def go():
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+            return await run_load(
+                client, mix, args.concurrency, None if args.requests else args.duration,
+                args.requests, args.seed_requests, args.seed,
+            )
+
+    try:
+        result = asyncio.run(go())
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait(timeout=10)
+
+    print_report(result)
+    if args.output:
+        args.output.write_text(json.dumps(result, indent=2) + "\n")
+        print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
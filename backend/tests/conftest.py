@@ -0,0 +1,66 @@
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+# Keep the suite's database, archive and uploads out of the working tree; the
+# engines and UPLOAD_DIR read these when the app is first imported
+SANDBOX = tempfile.mkdtemp(prefix="asklio-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{SANDBOX}/local.db"
+os.environ["ARCHIVE_DATABASE_URL"] = f"sqlite:///{SANDBOX}/archive.db"
+os.environ["UPLOAD_DIR"] = os.path.join(SANDBOX, "uploads")
+
+import pytest
+
+from app.seed_commodity_groups import init_db
+from app.services import query_stats
+
+# Any endpoint that repeats the same SELECT this often in one request fails the test.
+N_PLUS_ONE_THRESHOLD = 3
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    init_db()
+    yield
+    shutil.rmtree(SANDBOX, ignore_errors=True)
+
+
+@pytest.fixture(autouse=True)
+def no_n_plus_one():
+    """Fail tests whose HTTP requests show N+1 query patterns."""
+    suspects = []
+
+    def observe(route, stats):
+        suspects.extend((route, count, statement) for statement, count in stats.repeated(N_PLUS_ONE_THRESHOLD))
+
+    query_stats.add_observer(observe)
+    yield
+    query_stats.remove_observer(observe)
+    assert not suspects, "Possible N+1 queries:\n" + "\n".join(
+        f"{route}: {count}x {statement}" for route, count, statement in suspects
+    )
+
+
+@pytest.fixture
+def query_budget():
+    """``with query_budget(4): client.get(...)`` fails if any request in the block runs more than 4 queries."""
+
+    @contextmanager
+    def budget(max_queries: int):
+        seen = []
+
+        def observe(route, stats):
+            seen.append((route, stats))
+
+        query_stats.add_observer(observe)
+        try:
+            yield seen
+        finally:
+            query_stats.remove_observer(observe)
+        for route, stats in seen:
+            assert stats.count <= max_queries, (
+                f"{route} ran {stats.count} queries (budget {max_queries}):\n" + "\n".join(stats.statements)
+            )
+
+    return budget
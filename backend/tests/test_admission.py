@@ -0,0 +1,108 @@
+import asyncio
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import admission
+from app.services.admission import BULK, INTERACTIVE, AdmissionController, Rejected
+
+client = TestClient(app)
+
+
+def _run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_full_queue_is_rejected_fast_with_retry_after():
+    async def scenario():
+        controller = AdmissionController(capacity=1, interactive_reserved=0, lanes={"chat": (INTERACTIVE, 1, 1)})
+        await controller.acquire("chat")
+        queued = asyncio.create_task(controller.acquire("chat"))
+        await asyncio.sleep(0)
+        with pytest.raises(Rejected) as rejected:
+            await controller.acquire("chat")
+        controller.release("chat", 0.1)
+        await queued
+        return rejected.value
+
+    rejected = _run(scenario())
+    assert rejected.reason == "queue_full"
+    assert rejected.retry_after >= 1
+
+
+def test_waiting_longer_than_max_wait_is_rejected():
+    async def scenario():
+        controller = AdmissionController(capacity=1, max_wait=0.05, lanes={"chat": (INTERACTIVE, 1, 5)})
+        await controller.acquire("chat")
+        with pytest.raises(Rejected) as rejected:
+            await controller.acquire("chat")
+        return controller, rejected.value
+
+    controller, rejected = _run(scenario())
+    assert rejected.reason == "timeout"
+    assert not controller.lanes["chat"].waiting
+
+
+def test_interactive_lanes_get_reserved_slots_and_go_first():
+    async def scenario():
+        controller = AdmissionController(
+            capacity=2, interactive_reserved=1, lanes={"ingest": (BULK, 5, 5), "chat": (INTERACTIVE, 5, 5)}
+        )
+        order = []
+
+        async def request(lane):
+            await controller.acquire(lane)
+            order.append(lane)
+
+        await request("ingest")
+        bulk_waiting = asyncio.create_task(request("ingest"))  # bulk may only use capacity - reserved
+        await asyncio.sleep(0)
+        await request("chat")  # the reserved slot is still free for interactive work
+        chat_waiting = asyncio.create_task(request("chat"))  # now everything is busy
+        await asyncio.sleep(0)
+
+        controller.release("ingest", 0.1)
+        await chat_waiting
+        controller.release("chat", 0.1)
+        await bulk_waiting
+        return order
+
+    assert _run(scenario()) == ["ingest", "chat", "chat", "ingest"]
+
+
+def test_cancelled_waiter_does_not_leak_a_slot():
+    async def scenario():
+        controller = AdmissionController(capacity=1, lanes={"chat": (INTERACTIVE, 1, 5)})
+        await controller.acquire("chat")
+        waiting = asyncio.create_task(controller.acquire("chat"))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        controller.release("chat", 0.1)
+        return controller
+
+    controller = _run(scenario())
+    assert controller.active == 0
+    assert not controller.lanes["chat"].waiting
+
+
+def test_endpoint_returns_429_when_lane_is_saturated(monkeypatch):
+    monkeypatch.setattr(
+        admission, "controller", AdmissionController(lanes={**admission.LANES, "chat": (INTERACTIVE, 0, 0)})
+    )
+    r = client.post("/chat", json={"message": "Hello"})
+    assert r.status_code == 429
+    assert int(r.headers["retry-after"]) >= 1
+
+
+def test_slots_are_released_after_the_request(monkeypatch):
+    controller = AdmissionController()
+    monkeypatch.setattr(admission, "controller", controller)
+    with patch("app.routers.requests.predict_commodity_group_id", return_value="031"):
+        r = client.post("/requests/predict-commodity-group", json={"title": "Laptops"})
+    assert r.status_code == 200
+    assert controller.active == 0
+    assert controller.lanes["predict"].active == 0
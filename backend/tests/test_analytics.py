@@ -0,0 +1,102 @@
+import uuid
+
+from fastapi.testclient import TestClient
+from app.main import app
+
+client = TestClient(app)
+
+
+def _create(department, vendor="Vendor A", unit_price=100, amount=1):
+    payload = {
+        "requestor_name": "Analyst",
+        "title": "Analytics Test",
+        "department": department,
+        "vendor_name": vendor,
+        "order_lines": [{"description": "Item", "unit_price": unit_price, "amount": amount}],
+    }
+    r = client.post("/requests", json=payload)
+    assert r.status_code == 200
+    return r.json()
+
+
+def _spend(**params):
+    r = client.get("/analytics/spend", params=params)
+    assert r.status_code == 200
+    return r.json()
+
+
+def test_spend_grouped_by_vendor_and_status():
+    department = f"Dept-{uuid.uuid4().hex[:8]}"
+    _create(department, vendor="Vendor A", unit_price="10.50", amount=2)
+    _create(department, vendor="Vendor A", unit_price=5)
+    _create(department, vendor="Vendor B", unit_price=100)
+
+    buckets = _spend(department=department, group_by=["vendor", "status"])
+    assert buckets == [
+        {
+            "department": None, "vendor_name": "Vendor A", "commodity_group_id": None, "category": None,
+            "status": "Open", "month": None, "request_count": 2, "total_cost": "26.00", "average_cost": "13.00",
+        },
+        {
+            "department": None, "vendor_name": "Vendor B", "commodity_group_id": None, "category": None,
+            "status": "Open", "month": None, "request_count": 1, "total_cost": "100.00", "average_cost": "100.00",
+        },
+    ]
+
+
+def test_spend_follows_status_and_commodity_group_changes():
+    department = f"Dept-{uuid.uuid4().hex[:8]}"
+    created = _create(department, unit_price=40)
+
+    client.post(f"/requests/{created['id']}/status", json={"to_status": "Closed"})
+    client.post(f"/requests/{created['id']}/commodity-group", json={"commodity_group_id": "029"})
+
+    buckets = _spend(department=department, group_by=["status", "category"])
+    assert [(b["status"], b["category"], b["total_cost"]) for b in buckets] == [
+        ("Closed", "Information Technology", "40.00"),
+    ]
+
+
+def test_rebuild_reconciles_drift():
+    from app.db import SessionLocal
+    from app.models import SpendRollup
+    from app.services import rollups
+
+    department = f"Dept-{uuid.uuid4().hex[:8]}"
+    _create(department, unit_price=12)
+
+    with SessionLocal() as db:
+        db.query(SpendRollup).filter(SpendRollup.department == department).update({"request_count": 7})
+        db.commit()
+        assert rollups.rebuild(db) >= 1
+        db.commit()
+
+    assert _spend(department=department)[0]["request_count"] == 1
+
+
+def test_request_counts_track_creates_and_status_changes():
+    department = f"Dept-{uuid.uuid4().hex[:8]}"
+    before = client.get("/requests/counts").json()
+
+    first = _create(department)
+    _create(department)
+    client.post(f"/requests/{first['id']}/status", json={"to_status": "In Progress"})
+
+    after = client.get("/requests/counts", params={"by_department": True}).json()
+    assert after["total"] == before["total"] + 2
+    assert after["by_status"]["Open"] == before["by_status"]["Open"] + 1
+    assert after["by_status"]["In Progress"] == before["by_status"]["In Progress"] + 1
+    assert after["by_department"][department] == {"Open": 1, "In Progress": 1, "Closed": 0}
+
+
+def test_rollup_check_reports_no_drift():
+    from app.db import SessionLocal
+    from app.services import rollups
+
+    department = f"Dept-{uuid.uuid4().hex[:8]}"
+    _create(department)
+    with SessionLocal() as db:
+        drift = rollups.check(db)
+    # other tests share the database; only this test's groups are its business
+    assert [entry for entry in drift["spend"] if entry[0][0] == department] == []
+    assert [entry for entry in drift["status_counts"] if entry[0][0] == department] == []
@@ -0,0 +1,100 @@
+import json
+import uuid
+from datetime import timedelta
+
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from app.main import app
+
+client = TestClient(app)
+
+
+def _closed_request(department):
+    r = client.post("/requests", json={
+        "requestor_name": "Archive Tester",
+        "title": "Old chairs",
+        "department": department,
+        "vendor_name": "Vendor A",
+        "order_lines": [{"description": "Chair", "unit_price": "80.50", "amount": 2}],
+    })
+    request_id = r.json()["id"]
+    client.post(f"/requests/{request_id}/status", json={"to_status": "Closed"})
+    client.post(f"/requests/{request_id}/upload-offer", files={"file": ("old.txt", b"old offer", "text/plain")})
+    return request_id
+
+
+def _age(request_id, days):
+    from app.db import SessionLocal
+
+    with SessionLocal() as db:
+        db.execute(
+            text("UPDATE procurement_requests SET status_changed_at = datetime('now', :age) WHERE id = :id"),
+            {"age": f"-{days} days", "id": request_id},
+        )
+        db.commit()
+
+
+def test_archive_moves_old_closed_requests_and_reads_through():
+    from app.db import SessionLocal
+    from app.services import archive, uploads
+    from app import models
+
+    department = f"Dept-{uuid.uuid4().hex[:8]}"
+    old_id = _closed_request(department)
+    recent_id = _closed_request(department)
+    _age(old_id, 400)
+    before = client.get(f"/requests/{old_id}").json()
+
+    assert archive.archive_closed_requests(timedelta(days=365)) >= 1
+
+    with SessionLocal() as db:
+        assert db.get(models.ProcurementRequest, old_id) is None
+        assert db.get(models.ProcurementRequest, recent_id) is not None
+        assert db.execute(text("SELECT COUNT(*) FROM order_lines WHERE request_id = :id"), {"id": old_id}).scalar() == 0
+        assert f"{old_id}_old.txt" in uploads.referenced_files(db)
+
+    r = client.get(f"/requests/{old_id}")
+    assert r.status_code == 200
+    assert r.headers["x-archived"] == "true"
+    assert r.json() == before
+
+    counts = client.get("/requests/counts", params={"by_department": True}).json()
+    assert counts["by_department"][department]["Closed"] == 1
+
+    r = client.post(f"/requests/{old_id}/status", json={"to_status": "Open"})
+    assert r.status_code == 404
+
+
+def test_export_can_include_archived_requests():
+    from app.services import archive
+
+    department = f"Dept-{uuid.uuid4().hex[:8]}"
+    old_id = _closed_request(department)
+    _age(old_id, 400)
+    archive.archive_closed_requests(timedelta(days=365))
+
+    hot = client.get("/requests/export", params={"department": department}).text.splitlines()
+    assert hot == []
+    lines = client.get(
+        "/requests/export", params={"department": department, "include_archived": True}
+    ).text.splitlines()
+    assert [json.loads(line)["id"] for line in lines] == [old_id]
+
+
+def test_archived_ids_are_not_reused():
+    from app.services import archive
+
+    department = f"Dept-{uuid.uuid4().hex[:8]}"
+    old_id = _closed_request(department)
+    _age(old_id, 400)
+    archive.archive_closed_requests(timedelta(days=365))
+
+    new_id = client.post("/requests", json={
+        "requestor_name": "Archive Tester",
+        "title": "New chairs",
+        "department": department,
+        "vendor_name": "Vendor A",
+        "order_lines": [{"description": "Chair", "unit_price": 80, "amount": 1}],
+    }).json()["id"]
+    assert new_id > old_id
@@ -0,0 +1,24 @@
+from benchmarks import harness
+from benchmarks.cases import validation_cases
+
+
+def test_measure_reports_per_call_statistics():
+    stats = harness.measure(lambda: sum(range(100)), repeat=3, min_time=0.01)
+    assert stats["repeat"] == 3
+    assert stats["number"] >= 1
+    assert 0 < stats["min"] <= stats["median"] < 0.01
+
+
+def test_compare_flags_regressions_beyond_threshold():
+    baseline = {"a": {"median": 1.0}, "b": {"median": 1.0}, "c": {"median": 1.0}, "gone": {"median": 1.0}}
+    current = {"a": {"median": 1.05}, "b": {"median": 1.5}, "c": {"median": 0.5}, "added": {"median": 1.0}}
+
+    verdicts = {row["name"]: row["verdict"] for row in harness.compare(baseline, current, threshold=0.1)}
+
+    assert verdicts == {"a": "same", "b": "slower", "c": "faster", "gone": "missing", "added": "new"}
+
+
+def test_results_round_trip_through_json(tmp_path):
+    results = {name: harness.measure(func, repeat=2, min_time=0.001) for name, func in validation_cases()}
+    harness.save(tmp_path / "results.json", results)
+    assert harness.load(tmp_path / "results.json") == results
@@ -0,0 +1,114 @@
+import uuid
+
+from fastapi.testclient import TestClient
+from app.main import app
+
+client = TestClient(app)
+
+
+def _payload(department, **overrides):
+    payload = {
+        "requestor_name": "Importer",
+        "title": "Historic PO",
+        "department": department,
+        "vendor_name": "Vendor H",
+        "order_lines": [
+            {"description": "Toner", "unit_price": "45.10", "amount": 3},
+            {"description": "Paper", "unit_price": 4, "amount": 10, "unit": "packs"},
+        ],
+    }
+    payload.update(overrides)
+    return payload
+
+
+def test_bulk_create_reports_per_item_results():
+    department = f"Dept-{uuid.uuid4().hex[:8]}"
+    items = [_payload(department), _payload(department, order_lines=[]), _payload(department, title="Second")]
+
+    r = client.post("/requests/bulk", json=items)
+    assert r.status_code == 200
+    data = r.json()
+    assert data["created"] == 2
+    assert data["failed"] == 1
+    ok, bad, second = data["results"]
+    assert bad["id"] is None and bad["errors"] and bad["errors"][0].startswith("order_lines")
+    assert ok["errors"] == [] and second["id"] > ok["id"]
+
+    created = client.get(f"/requests/{ok['id']}").json()
+    assert created["total_cost"] == "175.30"
+    assert [line["total_price"] for line in created["order_lines"]] == ["135.30", "40.00"]
+    assert [(e["from_status"], e["to_status"]) for e in created["status_events"]] == [(None, "Open")]
+
+
+def test_bulk_create_updates_rollups_and_counters():
+    department = f"Dept-{uuid.uuid4().hex[:8]}"
+    client.post("/requests/bulk", json=[_payload(department) for _ in range(3)])
+
+    counts = client.get("/requests/counts", params={"by_department": True}).json()
+    assert counts["by_department"][department]["Open"] == 3
+    spend = client.get("/analytics/spend", params={"department": department}).json()
+    assert spend[0]["request_count"] == 3
+    assert spend[0]["total_cost"] == "525.90"
+
+
+def test_bulk_create_chunks_transactions():
+    from app.db import SessionLocal
+    from app.services import bulk
+
+    department = f"Dept-{uuid.uuid4().hex[:8]}"
+    with SessionLocal() as db:
+        result = bulk.create_requests(db, [_payload(department) for _ in range(5)], chunk_size=2)
+    assert result["created"] == 5
+    ids = [item["id"] for item in result["results"]]
+    assert ids == sorted(ids)
+
+
+def test_batch_status_change_by_ids_records_from_status():
+    department = f"Dept-{uuid.uuid4().hex[:8]}"
+    ids = [item["id"] for item in client.post("/requests/bulk", json=[_payload(department)] * 3).json()["results"]]
+    client.post(f"/requests/{ids[0]}/status", json={"to_status": "In Progress"})
+    client.post(f"/requests/{ids[2]}/status", json={"to_status": "Closed"})
+
+    r = client.post(
+        "/requests/status:batch",
+        json={"to_status": "Closed", "changed_by": "Quarter close", "ids": ids + [999_999]},
+    )
+    assert r.status_code == 200
+    data = r.json()
+    assert data["updated"] == [ids[0], ids[1]]
+    assert data["skipped"] == [
+        {"id": ids[2], "reason": "already_in_status"},
+        {"id": 999_999, "reason": "not_found"},
+    ]
+
+    first = client.get(f"/requests/{ids[0]}").json()
+    assert first["current_status"] == "Closed"
+    assert [(e["from_status"], e["to_status"]) for e in first["status_events"]][-1] == ("In Progress", "Closed")
+    second = client.get(f"/requests/{ids[1]}").json()
+    assert second["status_events"][-1]["from_status"] == "Open"
+    assert second["status_events"][-1]["changed_by"] == "Quarter close"
+
+    counts = client.get("/requests/counts", params={"by_department": True}).json()
+    assert counts["by_department"][department] == {"Open": 0, "In Progress": 0, "Closed": 3}
+
+
+def test_batch_status_change_by_filter():
+    department = f"Dept-{uuid.uuid4().hex[:8]}"
+    client.post("/requests/bulk", json=[_payload(department)] * 2)
+
+    r = client.post(
+        "/requests/status:batch",
+        json={"to_status": "In Progress", "filter": {"department": department, "status": "Open"}},
+    )
+    assert len(r.json()["updated"]) == 2
+    spend = client.get("/analytics/spend", params={"department": department, "group_by": "status"}).json()
+    assert [(b["status"], b["request_count"]) for b in spend] == [("In Progress", 2)]
+
+
+def test_batch_status_change_requires_one_target():
+    r = client.post("/requests/status:batch", json={"to_status": "Closed"})
+    assert r.status_code == 422
+    r = client.post("/requests/status:batch", json={"to_status": "Closed", "filter": {}})
+    assert r.status_code == 422
+    r = client.post("/requests/status:batch", json={"to_status": "Closed", "filter": {"department": None}})
+    assert r.status_code == 422
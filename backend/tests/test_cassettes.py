@@ -0,0 +1,67 @@
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.services import cassettes, llm
+from app.services.commodity import CommodityPrediction, predict_commodity_group_id
+from benchmarks.ingestion import load_golden, score
+
+PREDICT_ARGS = dict(title="Laptops", department="IT", vendor_name="Dell", order_lines_text="", commodity_groups_text="")
+
+
+def _fake_client(group_id="031"):
+    fake = MagicMock()
+    completion = fake.chat.completions.parse.return_value
+    completion.model = "gpt-4o-mini"
+    parsed = CommodityPrediction(commodity_group_id=group_id)
+    completion.choices[0].message = SimpleNamespace(content=parsed.model_dump_json(), parsed=parsed, refusal=None)
+    completion.usage = SimpleNamespace(prompt_tokens=321, completion_tokens=9)
+    return fake
+
+
+def test_recorded_response_is_replayed_without_a_client(tmp_path):
+    with patch("app.services.llm.get_client", return_value=_fake_client()), \
+         cassettes.use(cassettes.Cassette(cassettes.RECORD, tmp_path)):
+        assert predict_commodity_group_id(**PREDICT_ARGS) == "031"
+    assert len(list((tmp_path / "commodity").iterdir())) == 1
+
+    with cassettes.use(cassettes.Cassette(cassettes.REPLAY, tmp_path)):
+        assert llm.get_client() is cassettes.REPLAY_CLIENT
+        assert predict_commodity_group_id(**PREDICT_ARGS) == "031"
+
+
+def test_replay_of_unrecorded_request_raises(tmp_path):
+    with cassettes.use(cassettes.Cassette(cassettes.REPLAY, tmp_path)):
+        with pytest.raises(cassettes.CassetteMiss):
+            predict_commodity_group_id(**{**PREDICT_ARGS, "title": "Never recorded"})
+
+
+def test_replay_applies_artificial_latency(tmp_path):
+    with patch("app.services.llm.get_client", return_value=_fake_client()), \
+         cassettes.use(cassettes.Cassette(cassettes.RECORD, tmp_path)):
+        predict_commodity_group_id(**PREDICT_ARGS)
+
+    with cassettes.use(cassettes.Cassette(cassettes.REPLAY, tmp_path, latency=0.05)):
+        start = time.perf_counter()
+        predict_commodity_group_id(**PREDICT_ARGS)
+        assert time.perf_counter() - start >= 0.05
+
+
+def test_golden_scoring_is_per_field():
+    golden = load_golden(Path("samples/2_Offer.txt"))
+    extracted = {
+        "vendor_name": "Global Tech Solutions ",
+        "vendor_vat_id": "DE 987654321",
+        "total_cost": "2100.0",
+        "order_lines": [{"total_price": "600.00"}, {"total_price": "1499.00"}],
+    }
+    assert score(extracted, golden) == {
+        "vendor_name": True,
+        "vendor_vat_id": True,
+        "total_cost": True,
+        "order_line_count": True,
+        "order_line_totals": False,
+    }
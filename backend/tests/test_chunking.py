@@ -0,0 +1,145 @@
+import re
+import threading
+import time
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+
+from app.services import chunking
+from app.services.admission import AdmissionController
+from app.services.circuit import CLOSED, HALF_OPEN, CircuitBreaker
+from app.services.extractor import extract_offer_text, merge_chunks, partial_extraction_model, reconcile
+
+PAGES = 4
+
+
+def _long_offer():
+    pages = []
+    for page in range(1, PAGES + 1):
+        body = "\n".join(
+            f"Leistungsbeschreibung Seite {page}, Absatz {i}: Pflege und Wartung nach Vereinbarung." for i in range(60)
+        )
+        pages.append(f"Seite {page} von {PAGES}\n{body}\nWartungspaket {page}   1   500,00   500,00")
+    return "\n\n".join(pages) + "\nNettosumme 2.000,00 €\n"
+
+
+def _line(product, total, amount=1):
+    return {"product": product, "amount": amount, "unit_price": Decimal(total), "total_price": Decimal(total)}
+
+
+def test_split_keeps_pages_and_tables_together():
+    table = "\n".join(f"{i} | Artikel {i} | 1 | 10,00" for i in range(30))
+    text = "\n\n".join(f"Seite {page}\n" + "Text " * 200 + f"\n{table}" for page in range(3))
+
+    chunks = chunking.split_text(text, 2000)
+
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 2000 for chunk in chunks)
+    assert re.sub(r"\s", "", "".join(chunks)) == re.sub(r"\s", "", text)
+    assert all(chunk.count("| Artikel 0 |") == chunk.count("| Artikel 29 |") for chunk in chunks)
+    assert chunking.split_text("short", 2000) == ["short"]
+
+
+def _parse(**kwargs):
+    content = kwargs["messages"][1]["content"]
+    pages = [int(page) for page in re.findall(r"^Seite (\d+) von", content, re.MULTILINE)]
+    lines = [_line(f"Wartungspaket {page}", "500.00") for page in pages]
+    if pages[0] > 1:  # a page break row carried over into the next chunk
+        lines.insert(0, _line(f"Wartungspaket {pages[0] - 1}", "500.00"))
+    model = kwargs["response_format"]
+    values = {"vendor_name": "Wartung & Service KG", "order_lines": lines, "title": "Wartungsvertrag"}
+    response = MagicMock()
+    response.choices[0].message.parsed = model(**{k: v for k, v in values.items() if k in model.model_fields})
+    return response
+
+
+def _extract(parse=_parse):
+    fake = MagicMock()
+    fake.chat.completions.parse.side_effect = parse
+    with patch("app.services.extractor.EXTRACTION_CHUNK_CHARS", 6000), \
+         patch("app.services.llm.get_client", return_value=fake):
+        return extract_offer_text(_long_offer()), fake
+
+
+def test_long_offers_are_extracted_in_chunks_without_truncation():
+    extraction, fake = _extract()
+
+    prompts = [call.kwargs["messages"][1]["content"] for call in fake.chat.completions.parse.call_args_list]
+    assert len(prompts) > 1
+    assert all(f"of {len(prompts)} of a long document" in prompt for prompt in prompts)
+    assert max(len(prompt) for prompt in prompts) < len(_long_offer()) / 2
+    assert [line.product for line in extraction.order_lines] == [f"Wartungspaket {page}" for page in range(1, PAGES + 1)]
+    assert extraction.total_cost == Decimal("2000.00")
+    assert extraction.vendor_name == "Wartung & Service KG"
+    assert extraction.source == "rules+llm"
+
+
+def test_parallel_chunk_calls_are_limited_to_free_admission_slots():
+    controller = AdmissionController(capacity=4, interactive_reserved=2)
+    controller.active = controller.bulk_active = 1  # the admitted request's own slot
+    lock = threading.Lock()
+    running, peak = [0], [0]
+
+    def parse(**kwargs):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+        return _parse(**kwargs)
+
+    with patch("app.services.admission.controller", controller):
+        extraction, fake = _extract(parse)
+
+    assert fake.chat.completions.parse.call_count == PAGES
+    assert peak[0] == 2  # one bulk slot was free
+    assert (controller.active, controller.bulk_active) == (1, 1)
+    assert len(extraction.order_lines) == PAGES
+
+
+def test_half_open_breaker_probes_with_the_first_chunk():
+    clock = [1000.0]
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=30, clock=lambda: clock[0])
+    breaker.record_failure()
+    clock[0] += 30
+    assert breaker.state == HALF_OPEN
+
+    with patch("app.services.llm.breaker", breaker):
+        extraction, fake = _extract()
+
+    assert breaker.state == CLOSED
+    assert fake.chat.completions.parse.call_count == PAGES
+    assert extraction.source == "rules+llm"
+    assert len(extraction.order_lines) == PAGES
+
+
+def test_reconcile_drops_repeats_only_when_that_matches_the_total():
+    lines = [(0, _line("Laptop", "1000.00")), (0, _line("Dock", "200.00")), (1, _line("Laptop 14\"", "1000.00"))]
+
+    kept, total = reconcile(lines, Decimal("1200.00"))
+    assert [line["product"] for line in kept] == ["Laptop", "Dock"]
+
+    kept, total = reconcile(lines, Decimal("2500.00"))
+    assert len(kept) == 3 and total == Decimal("2500.00")
+
+    kept, total = reconcile(lines, Decimal("0"))
+    assert len(kept) == 3 and total == Decimal("2200.00")
+
+
+def test_merge_keeps_repeated_lines_that_are_not_carried_over():
+    model = partial_extraction_model(("order_lines",))
+    parts = [
+        model(order_lines=[_line("Versandkosten", "50.00"), _line("Wartungspaket 1", "500.00")]),
+        model(order_lines=[
+            _line("Wartungspaket 1", "500.00"),  # carried over from the previous page
+            _line("Wartungspaket 2", "500.00"),
+            _line("Versandkosten", "50.00"),  # a second delivery
+        ]),
+    ]
+
+    merged, lines = merge_chunks(parts)
+    assert [(index, line["product"]) for index, line in lines] == [
+        (0, "Versandkosten"), (0, "Wartungspaket 1"), (1, "Wartungspaket 2"), (1, "Versandkosten"),
+    ]
+    kept, total = reconcile(lines, Decimal("1100.00"))
+    assert len(kept) == 4 and total == Decimal("1100.00")
@@ -0,0 +1,176 @@
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import httpx
+import openai
+import pytest
+from pydantic import ValidationError
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import llm, metrics
+from app.services.circuit import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpen
+from app.services.commodity import CommodityPrediction, classify_locally, predict_commodity_group_id
+from app.seed_commodity_groups import COMMODITY_GROUPS
+
+client = TestClient(app)
+
+GROUPS_TEXT = "\n".join(f"{id} | {category} | {name}" for id, category, name in COMMODITY_GROUPS)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _open_breaker():
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=60)
+    breaker.record_failure()
+    return breaker
+
+
+def _status_error(status_code):
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    return openai.APIStatusError(
+        f"HTTP {status_code}", response=httpx.Response(status_code, request=request), body=None
+    )
+
+
+def test_opens_after_consecutive_failures_and_fails_fast():
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=30, clock=clock)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success(0.1)  # a success in between resets the count
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+    clock.now += 10
+    with pytest.raises(CircuitOpen) as refused:
+        breaker.before_call()
+    assert refused.value.retry_after == 20
+
+
+def test_slow_calls_count_as_failures():
+    breaker = CircuitBreaker(failure_threshold=2, slow_call=5)
+    breaker.record_success(6)
+    breaker.record_success(7)
+    assert breaker.state == OPEN
+
+
+def test_half_open_lets_one_probe_through():
+    clock = Clock()
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=30, clock=clock)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.state == HALF_OPEN
+
+    breaker.before_call()  # the probe
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+    breaker.record_failure()  # probe failed: open for another cooldown
+    assert breaker.state == OPEN
+
+    clock.now += 30
+    breaker.before_call()
+    breaker.record_success(0.2)
+    assert breaker.state == CLOSED
+    breaker.before_call()
+
+
+def test_llm_gateway_short_circuits_and_ignores_client_errors():
+    fake = MagicMock()
+    fake.chat.completions.create.side_effect = _status_error(400)
+    with patch("app.services.llm.breaker", CircuitBreaker(failure_threshold=2)) as breaker:
+        for _ in range(3):
+            with pytest.raises(openai.APIStatusError):
+                llm.create("chat", fake, model="gpt-4o-mini", messages=[])
+        assert breaker.state == CLOSED  # a bad request says nothing about the provider
+
+        fake.chat.completions.create.side_effect = _status_error(503)
+        for _ in range(2):
+            with pytest.raises(openai.APIStatusError):
+                llm.create("chat", fake, model="gpt-4o-mini", messages=[])
+        short_circuited = metrics.LLM_SHORT_CIRCUITED.value(call_site="chat")
+        with pytest.raises(CircuitOpen):
+            llm.create("chat", fake, model="gpt-4o-mini", messages=[])
+
+    assert fake.chat.completions.create.call_count == 5
+    assert metrics.LLM_SHORT_CIRCUITED.value(call_site="chat") == short_circuited + 1
+
+
+def test_only_provider_errors_count_as_failures():
+    from app.services.circuit import is_provider_failure
+    from app.services.extractor import OfferExtraction
+
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    assert is_provider_failure(openai.APITimeoutError(request=request))
+    assert is_provider_failure(openai.APIConnectionError(request=request))
+    assert is_provider_failure(_status_error(429))
+    assert is_provider_failure(_status_error(502))
+
+    assert not is_provider_failure(_status_error(400))
+    assert not is_provider_failure(openai.LengthFinishReasonError(completion=MagicMock()))
+    with pytest.raises(ValidationError) as invalid:
+        OfferExtraction(total_cost="not a number")
+    assert not is_provider_failure(invalid.value)
+    assert not is_provider_failure(TimeoutError("not from the client"))
+
+
+def test_local_classification_matches_group_names():
+    assert classify_locally("Adobe Photoshop software licenses", GROUPS_TEXT) == "031"
+    assert classify_locally("Laptop hardware", GROUPS_TEXT) == "029"
+    assert classify_locally("Moosbild", GROUPS_TEXT) is None
+
+
+def test_commodity_prediction_falls_back_to_cache_then_keywords():
+    fake = MagicMock()
+    parsed = CommodityPrediction(commodity_group_id="036")
+    fake.chat.completions.parse.return_value.choices[0].message = SimpleNamespace(parsed=parsed, refusal=None)
+    args = dict(department="Marketing", vendor_name="Cache Vendor", order_lines_text="", commodity_groups_text=GROUPS_TEXT)
+
+    with patch("app.services.llm.get_client", return_value=fake):
+        assert predict_commodity_group_id(title="Billboard campaign", **args) == "036"
+        with patch("app.services.llm.breaker", _open_breaker()):
+            assert predict_commodity_group_id(title="Billboard campaign", **args) == "036"
+            assert predict_commodity_group_id(title="New laptop hardware", **args) == "029"
+            with pytest.raises(CircuitOpen):
+                predict_commodity_group_id(title="Moosbild", **args)
+    assert fake.chat.completions.parse.call_count == 1
+
+
+def test_offer_upload_uses_rule_based_extraction_while_open():
+    # no itemised lines the rules could parse, so the LLM would normally be asked
+    contents = (
+        b"Vendor Name: Global Tech Solutions\nVAT ID: DE987654321\n\n"
+        b"Adobe licenses as discussed on the phone.\n\nTotal Offer Cost: \xe2\x82\xac2100\n"
+    )
+    fallbacks = metrics.LLM_FALLBACKS.value(call_site="extractor", source="rules")
+    with patch("app.services.llm.get_client", return_value=MagicMock()) as get_client, \
+         patch("app.services.llm.breaker", _open_breaker()):
+        response = client.post("/requests/create-from-offer", files={"file": ("Offer.txt", contents, "text/plain")})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["vendor_name"] == "Global Tech Solutions"
+    assert body["vendor_vat_id"] == "DE987654321"
+    assert body["total_cost"] == "2100.00"
+    assert [line["product"] for line in body["order_lines"]] == ["Offer positions"]
+    get_client.return_value.chat.completions.parse.assert_not_called()
+    assert metrics.LLM_FALLBACKS.value(call_site="extractor", source="rules") == fallbacks + 1
+
+
+def test_chat_fails_fast_with_503_while_open():
+    with patch("app.services.llm.get_client", return_value=MagicMock()) as get_client, \
+         patch("app.services.llm.breaker", _open_breaker()):
+        response = client.post("/chat", json={"message": "Anything open?"})
+
+    assert response.status_code == 503
+    assert int(response.headers["retry-after"]) >= 1
+    get_client.return_value.chat.completions.create.assert_not_called()
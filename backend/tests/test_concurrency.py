@@ -0,0 +1,116 @@
+import uuid
+
+from fastapi.testclient import TestClient
+from app.main import app
+
+client = TestClient(app)
+
+
+def _create(department=None):
+    payload = {
+        "requestor_name": "Concurrency Tester",
+        "title": "Monitors",
+        "department": department or f"Dept-{uuid.uuid4().hex[:8]}",
+        "vendor_name": "Vendor C",
+        "order_lines": [{"description": "Monitor", "unit_price": 200, "amount": 2}],
+    }
+    r = client.post("/requests", json=payload)
+    assert r.status_code == 200
+    return r.json()
+
+
+def test_version_and_etag_advance_on_each_mutation():
+    created = _create()
+    assert created["version"] == 1
+
+    r = client.get(f"/requests/{created['id']}")
+    assert r.headers["etag"] == '"1"'
+
+    r = client.post(f"/requests/{created['id']}/status", json={"to_status": "In Progress"})
+    assert r.status_code == 200
+    assert r.json()["version"] == 2
+    assert r.headers["etag"] == '"2"'
+
+    r = client.post(f"/requests/{created['id']}/commodity-group", json={"commodity_group_id": "031"})
+    assert r.json()["version"] == 3
+
+
+def test_stale_if_match_is_rejected_without_side_effects():
+    created = _create()
+    client.post(f"/requests/{created['id']}/status", json={"to_status": "In Progress"})
+
+    r = client.post(
+        f"/requests/{created['id']}/status",
+        json={"to_status": "Closed"},
+        headers={"If-Match": '"1"'},
+    )
+    assert r.status_code == 409
+
+    current = client.get(f"/requests/{created['id']}").json()
+    assert current["current_status"] == "In Progress"
+    assert [e["to_status"] for e in current["status_events"]] == ["Open", "In Progress"]
+
+    r = client.post(
+        f"/requests/{created['id']}/status",
+        json={"to_status": "Closed"},
+        headers={"If-Match": 'W/"2"'},
+    )
+    assert r.status_code == 200
+
+
+def test_expected_version_in_body():
+    created = _create()
+    r = client.post(
+        f"/requests/{created['id']}/commodity-group",
+        json={"commodity_group_id": "031", "expected_version": 5},
+    )
+    assert r.status_code == 409
+
+    r = client.post(
+        f"/requests/{created['id']}/commodity-group",
+        json={"commodity_group_id": "031", "expected_version": 1},
+    )
+    assert r.status_code == 200
+
+
+def test_malformed_if_match_is_a_bad_request():
+    created = _create()
+    r = client.post(
+        f"/requests/{created['id']}/status",
+        json={"to_status": "Closed"},
+        headers={"If-Match": "abc"},
+    )
+    assert r.status_code == 400
+
+
+def test_concurrent_writer_loses_compare_and_swap():
+    from sqlalchemy.orm.exc import StaleDataError
+    from app.db import SessionLocal
+    from app import models
+
+    created = _create()
+    with SessionLocal() as first, SessionLocal() as second:
+        a = first.get(models.ProcurementRequest, created["id"])
+        b = second.get(models.ProcurementRequest, created["id"])
+        a.current_status = "In Progress"
+        first.commit()
+
+        b.current_status = "Closed"
+        try:
+            second.commit()
+            raised = False
+        except StaleDataError:
+            second.rollback()
+            raised = True
+    assert raised
+
+    current = client.get(f"/requests/{created['id']}").json()
+    assert current["current_status"] == "In Progress"
+    assert current["version"] == 2
+
+
+def test_batch_status_change_bumps_version():
+    created = _create()
+    r = client.post("/requests/status:batch", json={"to_status": "Closed", "ids": [created["id"]]})
+    assert r.json()["updated"] == [created["id"]]
+    assert client.get(f"/requests/{created['id']}").json()["version"] == 2
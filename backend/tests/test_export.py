@@ -0,0 +1,72 @@
+import csv
+import io
+import json
+import uuid
+
+from fastapi.testclient import TestClient
+from app.main import app
+
+client = TestClient(app)
+
+
+def _create(department, lines):
+    payload = {
+        "requestor_name": "Finance",
+        "title": "Export Test",
+        "department": department,
+        "vendor_name": "Vendor E",
+        "order_lines": lines,
+    }
+    return client.post("/requests", json=payload).json()
+
+
+def test_export_ndjson_streams_filtered_requests():
+    department = f"Dept-{uuid.uuid4().hex[:8]}"
+    first = _create(department, [{"description": "Paper", "unit_price": "2.50", "amount": 4}])
+    second = _create(department, [{"description": "Pens", "unit_price": 1, "amount": 10}])
+    client.post(f"/requests/{second['id']}/status", json={"to_status": "Closed"})
+
+    r = client.get("/requests/export", params={"department": department})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in r.text.splitlines()]
+    assert [row["id"] for row in rows] == [first["id"], second["id"]]
+    assert rows[0]["total_cost"] == "10.00"
+    assert rows[0]["order_lines"][0]["description"] == "Paper"
+
+    closed = client.get("/requests/export", params={"department": department, "status": "Closed"})
+    assert [json.loads(line)["id"] for line in closed.text.splitlines()] == [second["id"]]
+
+    listed = client.get("/requests", params={"department": department, "status": "Closed"}).json()
+    assert [row["id"] for row in listed] == [second["id"]]
+
+
+def test_export_csv_has_one_row_per_order_line():
+    department = f"Dept-{uuid.uuid4().hex[:8]}"
+    created = _create(
+        department,
+        [
+            {"description": "Chair", "unit_price": 120, "amount": 2},
+            {"description": "Desk", "unit_price": "310.99", "amount": 1},
+        ],
+    )
+
+    r = client.get("/requests/export", params={"department": department, "format": "csv"})
+    assert r.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(r.text)))
+    assert [row["description"] for row in rows] == ["Chair", "Desk"]
+    assert {row["request_id"] for row in rows} == {str(created["id"])}
+    assert rows[1]["unit_price"] == "310.99"
+    assert rows[0]["total_cost"] == "550.99"
+
+
+def test_export_batches_keep_order_across_pages():
+    from app.routers.requests import request_filters
+    from app.services import export
+
+    department = f"Dept-{uuid.uuid4().hex[:8]}"
+    ids = [_create(department, [{"description": "Item", "unit_price": 1, "amount": 1}])["id"] for _ in range(5)]
+
+    batches = list(export.iter_request_batches(request_filters(department=department), batch_size=2))
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert [req.id for batch in batches for req in batch] == ids
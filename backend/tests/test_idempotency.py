@@ -0,0 +1,228 @@
+import threading
+import uuid
+from decimal import Decimal
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from fastapi.testclient import TestClient
+from app.main import app
+
+client = TestClient(app)
+
+
+def _payload(department):
+    return {
+        "requestor_name": "Retry Tester",
+        "title": "Laptops",
+        "department": department,
+        "vendor_name": "Vendor R",
+        "order_lines": [{"description": "Laptop", "unit_price": 1000, "amount": 2}],
+    }
+
+
+def _extraction(vendor_name="Seating GmbH"):
+    from app.services.extractor import OfferExtraction, ExtractedOrderLine
+
+    return OfferExtraction(
+        title="Chairs",
+        vendor_name=vendor_name,
+        vendor_vat_id=None,
+        department=None,
+        order_lines=[
+            ExtractedOrderLine(
+                product="Chair",
+                description="Office chair",
+                unit_price=Decimal("150.00"),
+                amount=4,
+                unit="pcs",
+                total_price=Decimal("600.00"),
+            ),
+        ],
+        total_cost=Decimal("600.00"),
+    )
+
+
+def test_retry_with_same_key_returns_original_response():
+    department = f"Dept-{uuid.uuid4().hex[:8]}"
+    headers = {"Idempotency-Key": uuid.uuid4().hex}
+
+    first = client.post("/requests", json=_payload(department), headers=headers)
+    retry = client.post("/requests", json=_payload(department), headers=headers)
+
+    assert first.status_code == retry.status_code == 200
+    assert retry.json() == first.json()
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert len(client.get("/requests", params={"department": department}).json()) == 1
+
+
+def test_key_reused_with_different_payload_is_rejected():
+    department = f"Dept-{uuid.uuid4().hex[:8]}"
+    headers = {"Idempotency-Key": uuid.uuid4().hex}
+
+    assert client.post("/requests", json=_payload(department), headers=headers).status_code == 200
+    changed = dict(_payload(department), title="Desktops")
+    assert client.post("/requests", json=changed, headers=headers).status_code == 422
+
+
+def test_failed_call_releases_the_key():
+    headers = {"Idempotency-Key": uuid.uuid4().hex}
+    offer = ("offer.txt", b"Chairs offer", "text/plain")
+
+    with patch("app.routers.requests.extract_offer_text", side_effect=RuntimeError("LLM down")):
+        r = client.post("/requests/create-from-offer", files={"file": offer}, headers=headers)
+    assert r.status_code == 502
+
+    with patch("app.routers.requests.extract_offer_text", return_value=_extraction()), \
+         patch("app.routers.requests.predict_commodity_group_id", return_value="999"):
+        r = client.post("/requests/create-from-offer", files={"file": offer}, headers=headers)
+    assert r.status_code == 200
+    assert r.json()["title"] == "Chairs"
+
+
+def test_same_key_on_two_routes_does_not_collide():
+    key = uuid.uuid4().hex
+    offer = ("offer.txt", b"Chairs offer, shared key", "text/plain")
+
+    created = client.post("/requests", json=_payload(f"Dept-{uuid.uuid4().hex[:8]}"), headers={"Idempotency-Key": key})
+    with patch("app.routers.requests.extract_offer_text", return_value=_extraction()), \
+         patch("app.routers.requests.predict_commodity_group_id", return_value="999"):
+        from_offer = client.post("/requests/create-from-offer", files={"file": offer}, headers={"Idempotency-Key": key})
+
+    assert created.status_code == from_offer.status_code == 200
+    assert "idempotent-replayed" not in from_offer.headers
+    assert from_offer.json()["id"] != created.json()["id"]
+
+
+def test_failure_before_commit_creates_nothing_and_retry_creates_once():
+    headers = {"Idempotency-Key": uuid.uuid4().hex}
+    vendor = f"Vendor-{uuid.uuid4().hex[:8]}"
+    offer = ("offer.txt", b"Chairs offer, disk full", "text/plain")
+
+    with patch("app.routers.requests.extract_offer_text", return_value=_extraction(vendor)), \
+         patch("app.routers.requests.predict_commodity_group_id", return_value="999"):
+        with patch.object(Path, "write_bytes", side_effect=OSError("disk full")), pytest.raises(OSError):
+            client.post("/requests/create-from-offer", files={"file": offer}, headers=headers)
+        assert client.get("/requests", params={"vendor_name": vendor}).json() == []
+
+        r = client.post("/requests/create-from-offer", files={"file": offer}, headers=headers)
+        retry = client.post("/requests/create-from-offer", files={"file": offer}, headers=headers)
+
+    assert r.status_code == retry.status_code == 200
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert len(client.get("/requests", params={"vendor_name": vendor}).json()) == 1
+
+
+def test_offer_retry_does_not_call_llm_again():
+    headers = {"Idempotency-Key": uuid.uuid4().hex}
+    offer = ("offer.txt", b"Chairs offer, 4 pcs", "text/plain")
+
+    with patch("app.routers.requests.extract_offer_text", return_value=_extraction()) as extract, \
+         patch("app.routers.requests.predict_commodity_group_id", return_value="999") as predict:
+        first = client.post("/requests/create-from-offer", files={"file": offer}, headers=headers)
+        retry = client.post("/requests/create-from-offer", files={"file": offer}, headers=headers)
+
+    assert first.status_code == retry.status_code == 200
+    assert retry.json()["id"] == first.json()["id"]
+    assert extract.call_count == 1
+    assert predict.call_count == 1
+
+
+def test_concurrent_duplicate_waits_for_in_flight_call():
+    headers = {"Idempotency-Key": uuid.uuid4().hex}
+    offer = ("offer.txt", b"Chairs offer, concurrent", "text/plain")
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def slow_extraction(text, template=None):
+        calls.append(text)
+        started.set()
+        release.wait(5)
+        return _extraction()
+
+    responses = []
+    with patch("app.routers.requests.extract_offer_text", side_effect=slow_extraction), \
+         patch("app.routers.requests.predict_commodity_group_id", return_value="999"):
+        first = threading.Thread(
+            target=lambda: responses.append(
+                client.post("/requests/create-from-offer", files={"file": offer}, headers=headers)
+            )
+        )
+        first.start()
+        assert started.wait(5)
+        second = threading.Thread(
+            target=lambda: responses.append(
+                client.post("/requests/create-from-offer", files={"file": offer}, headers=headers)
+            )
+        )
+        second.start()
+        release.set()
+        first.join(10)
+        second.join(10)
+
+    assert len(calls) == 1
+    assert [r.status_code for r in responses] == [200, 200]
+    assert responses[0].json()["id"] == responses[1].json()["id"]
+
+
+def test_waiting_duplicate_holds_no_admission_slot(monkeypatch):
+    import time
+
+    from app.services import admission
+    from app.services.admission import BULK
+
+    # one ingest slot and no queue: a duplicate holding a slot would starve the call it waits for
+    monkeypatch.setattr(
+        admission, "controller", admission.AdmissionController(lanes={**admission.LANES, "ingest": (BULK, 1, 0)})
+    )
+    headers = {"Idempotency-Key": uuid.uuid4().hex}
+    offer = ("offer.txt", b"Chairs offer, one slot", "text/plain")
+    started, waiting, release = threading.Event(), threading.Event(), threading.Event()
+    sleep = time.sleep
+
+    def slow_extraction(text, template=None):
+        started.set()
+        release.wait(5)
+        return _extraction()
+
+    def polling(seconds):
+        waiting.set()
+        sleep(seconds)
+
+    responses = []
+    post = lambda: responses.append(client.post("/requests/create-from-offer", files={"file": offer}, headers=headers))
+    with patch("app.routers.requests.extract_offer_text", side_effect=slow_extraction), \
+         patch("app.routers.requests.predict_commodity_group_id", return_value="999"), \
+         patch("app.services.idempotency.time.sleep", side_effect=polling):
+        first = threading.Thread(target=post)
+        first.start()
+        assert started.wait(5)
+        second = threading.Thread(target=post)
+        second.start()
+        assert waiting.wait(5)  # the duplicate is polling its claim
+        assert admission.controller.lanes["ingest"].active == 1
+        release.set()
+        first.join(10)
+        second.join(10)
+
+    assert [r.status_code for r in responses] == [200, 200]
+    assert responses[0].json()["id"] == responses[1].json()["id"]
+
+
+def test_sweep_removes_expired_keys():
+    from app import models
+    from app.db import SessionLocal
+    from app.services import idempotency
+    from app.services.status_metrics import utcnow
+
+    key = uuid.uuid4().hex
+    with SessionLocal() as db:
+        db.add(models.IdempotencyKey(
+            key=key, scope="POST /requests", request_hash="x", status=idempotency.COMPLETED,
+            created_at=utcnow(), expires_at=utcnow() - idempotency.IDEMPOTENCY_TTL,
+        ))
+        db.commit()
+        assert idempotency.sweep(db) >= 1
+        assert db.get(models.IdempotencyKey, (key, "POST /requests")) is None
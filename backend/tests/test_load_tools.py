@@ -0,0 +1,82 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from openai import OpenAI
+
+from app.main import app
+from app.services.commodity import CommodityPrediction
+from app.services.extractor import OfferExtraction
+from benchmarks import loadgen
+from benchmarks.fake_openai import FakeConfig, create_app, parse_latency
+
+
+def _sdk_client(config):
+    return OpenAI(api_key="fake", base_url="http://testserver/v1", http_client=TestClient(create_app(config)), max_retries=0)
+
+
+def test_fake_server_answers_structured_parse_with_valid_models():
+    client = _sdk_client(FakeConfig(seed=1))
+
+    extraction = client.chat.completions.parse(
+        model="gpt-4o-mini", messages=[{"role": "user", "content": "Offer"}], response_format=OfferExtraction
+    )
+    prediction = client.chat.completions.parse(
+        model="gpt-4o-mini",
+        messages=[{"role": "user", "content": "Commodity groups:\n031 | IT | Laptops\n032 | IT | Software"}],
+        response_format=CommodityPrediction,
+    )
+    chat = client.chat.completions.create(model="gpt-4o-mini", messages=[{"role": "user", "content": "Hi"}])
+
+    assert isinstance(extraction.choices[0].message.parsed, OfferExtraction)
+    assert extraction.usage.completion_tokens > 0
+    assert prediction.choices[0].message.parsed.commodity_group_id == "031"
+    assert chat.choices[0].message.content
+
+
+def test_fake_server_injects_errors_and_rate_limits():
+    from openai import InternalServerError, RateLimitError
+
+    with pytest.raises(InternalServerError):
+        _sdk_client(FakeConfig(error_rate=1.0)).chat.completions.create(model="m", messages=[])
+
+    limited = _sdk_client(FakeConfig(rate_limit=0.001, burst=1))
+    limited.chat.completions.create(model="m", messages=[])
+    with pytest.raises(RateLimitError):
+        limited.chat.completions.create(model="m", messages=[])
+
+
+def test_latency_specs():
+    import random
+
+    rng = random.Random(0)
+    assert parse_latency("fixed:0.25")(rng) == 0.25
+    assert 0.1 <= parse_latency("uniform:0.1,0.2")(rng) <= 0.2
+    assert parse_latency("lognormal:0.5,0.3")(rng) > 0
+    with pytest.raises(ValueError):
+        parse_latency("gamma:1")
+
+
+def test_percentile_is_nearest_rank():
+    values = list(range(1, 101))
+    assert loadgen.percentile(values, 0.50) == 50
+    assert loadgen.percentile(values, 0.95) == 95
+    assert loadgen.percentile(values, 0.99) == 99
+    assert loadgen.percentile([7], 0.99) == 7
+
+
+def test_load_run_reports_each_operation():
+    async def go():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+            return await loadgen.run_load(
+                client, loadgen.parse_mix("list=1,get=1,status=1"), concurrency=3,
+                duration=None, total_requests=30, seed_requests=5, seed=1,
+            )
+
+    result = asyncio.run(go())
+    assert result["requests"] == 30
+    assert set(result["operations"]) <= {"list", "get", "status"}
+    assert all(op["errors"] == 0 for op in result["operations"].values())
+    assert all(op["p50"] <= op["p99"] for op in result["operations"].values())
@@ -0,0 +1,89 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.routers.requests import extract_text_from_pdf
+from app.services import metrics
+from app.services.commodity import predict_commodity_group_id
+
+client = TestClient(app)
+
+
+def _scrape():
+    r = client.get("/metrics")
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/plain")
+    return r.text
+
+
+def test_histogram_exposition_is_cumulative():
+    histogram = metrics.Histogram("test_seconds", "Test.", ["site"], buckets=(0.1, 1.0))
+    histogram.observe(0.05, site="a")
+    histogram.observe(0.5, site="a")
+    histogram.observe(5, site="a")
+    lines = histogram.render()
+    assert 'test_seconds_bucket{site="a",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{site="a",le="1.0"} 2' in lines
+    assert 'test_seconds_bucket{site="a",le="+Inf"} 3' in lines
+    assert 'test_seconds_count{site="a"} 3' in lines
+
+
+def test_label_values_are_escaped():
+    counter = metrics.Counter("test_total", "Test.", ["error"])
+    counter.inc(error='bad "quote"\n')
+    assert 'test_total{error="bad \\"quote\\"\\n"} 1' in counter.render()
+
+
+def test_requests_are_recorded_per_route_template():
+    client.get("/requests/counts")
+    r = client.post("/requests", json={
+        "requestor_name": "Metrics Tester",
+        "title": "Metrics",
+        "department": "Metrics",
+        "vendor_name": "Vendor M",
+        "order_lines": [{"description": "Thing", "unit_price": 1, "amount": 1}],
+    })
+    before = metrics.HTTP_LATENCY.count(method="GET", route="/requests/{request_id}")
+    client.get(f"/requests/{r.json()['id']}")
+    client.get("/no/such/path")
+
+    assert metrics.HTTP_LATENCY.count(method="GET", route="/requests/{request_id}") == before + 1
+    text = _scrape()
+    assert 'http_requests_total{method="GET",route="/requests/counts",status="200"}' in text
+    assert 'http_requests_total{method="GET",route="unmatched",status="404"}' in text
+    assert 'http_request_db_queries_count{method="POST",route="/requests"}' in text
+    assert "/no/such/path" not in text
+    # everything finished, so nothing is left in flight
+    assert metrics.HTTP_IN_FLIGHT.value(method="GET", route="/requests/counts") == 0
+
+
+def test_pdf_parse_records_pages_and_time():
+    pages_before = metrics.PDF_PAGES.count()
+    extract_text_from_pdf("samples/12_AN-4120-Kdnr-14918.pdf")
+    assert metrics.PDF_PAGES.count() == pages_before + 1
+    assert "pdf_parse_duration_seconds_count" in _scrape()
+
+
+def test_llm_calls_record_latency_tokens_and_errors():
+    fake = MagicMock()
+    completion = fake.chat.completions.parse.return_value
+    completion.choices[0].message.parsed.commodity_group_id = "031"
+    completion.usage.prompt_tokens = 120
+    completion.usage.completion_tokens = 8
+    tokens_before = metrics.LLM_TOKENS.value(call_site="commodity", model="gpt-4o-mini", kind="prompt")
+
+    with patch("app.services.llm.get_client", return_value=fake):
+        predict_commodity_group_id(
+            title="Laptops", department="IT", vendor_name="V", order_lines_text="", commodity_groups_text=""
+        )
+        fake.chat.completions.parse.side_effect = TimeoutError("slow")
+        with pytest.raises(TimeoutError):
+            predict_commodity_group_id(
+                title="Laptops", department="IT", vendor_name="V", order_lines_text="", commodity_groups_text=""
+            )
+
+    assert metrics.LLM_TOKENS.value(call_site="commodity", model="gpt-4o-mini", kind="prompt") == tokens_before + 120
+    assert metrics.LLM_ERRORS.value(call_site="commodity", error="TimeoutError") >= 1
+    assert 'llm_request_duration_seconds_count{call_site="commodity",model="gpt-4o-mini"}' in _scrape()
@@ -0,0 +1,148 @@
+import sqlite3
+import threading
+import time
+
+from sqlalchemy import create_engine
+
+from app import migrate
+
+LEGACY_SCHEMA = """
+CREATE TABLE commodity_groups (
+    id VARCHAR(3) NOT NULL, category VARCHAR(100) NOT NULL, name VARCHAR(150) NOT NULL, PRIMARY KEY (id)
+);
+CREATE TABLE procurement_requests (
+    id INTEGER NOT NULL, requestor_name VARCHAR(200) NOT NULL, title VARCHAR(250) NOT NULL,
+    department VARCHAR(200) NOT NULL, vendor_name VARCHAR(250) NOT NULL, vendor_vat_id VARCHAR(50),
+    commodity_group_id VARCHAR(3), total_cost NUMERIC(12, 2) NOT NULL, current_status VARCHAR(30) NOT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL, PRIMARY KEY (id),
+    FOREIGN KEY(commodity_group_id) REFERENCES commodity_groups (id)
+);
+CREATE TABLE order_lines (
+    id INTEGER NOT NULL, request_id INTEGER NOT NULL, description VARCHAR(500) NOT NULL,
+    unit_price NUMERIC(12, 2) NOT NULL, amount INTEGER NOT NULL, unit VARCHAR(50),
+    total_price NUMERIC(12, 2) NOT NULL, PRIMARY KEY (id),
+    FOREIGN KEY(request_id) REFERENCES procurement_requests (id)
+);
+CREATE TABLE attachments (
+    id INTEGER NOT NULL, request_id INTEGER NOT NULL, filename VARCHAR(255) NOT NULL, path VARCHAR(500) NOT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL, PRIMARY KEY (id),
+    FOREIGN KEY(request_id) REFERENCES procurement_requests (id)
+);
+CREATE TABLE status_events (
+    id INTEGER NOT NULL, request_id INTEGER NOT NULL, from_status VARCHAR(30), to_status VARCHAR(30) NOT NULL,
+    changed_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL, changed_by VARCHAR(200), PRIMARY KEY (id),
+    FOREIGN KEY(request_id) REFERENCES procurement_requests (id)
+);
+INSERT INTO procurement_requests (id, requestor_name, title, department, vendor_name, total_cost, current_status)
+VALUES (1, 'Legacy', 'Old PO', 'IT', 'Vendor L', 12.5, 'Open');
+INSERT INTO order_lines (request_id, description, unit_price, amount, total_price) VALUES (1, 'Cable', 6.25, 2, 12.5);
+INSERT INTO status_events (request_id, from_status, to_status) VALUES (1, NULL, 'Open');
+"""
+
+
+def test_init_db_fast_path_skips_upgrade(monkeypatch):
+    migrate.init_db()  # the shared test database is current after this
+
+    def fail(conn):
+        raise AssertionError("upgrade should not run for a current database")
+
+    monkeypatch.setattr(migrate, "upgrade", fail)
+    migrate.init_db()
+
+
+def test_legacy_database_is_upgraded_in_order(tmp_path, monkeypatch):
+    path = tmp_path / "legacy.db"
+    conn = sqlite3.connect(path)
+    conn.executescript(LEGACY_SCHEMA)
+    conn.close()
+    monkeypatch.setattr(migrate, "engine", create_engine(f"sqlite:///{path}"))
+
+    conn = migrate._connect()
+    try:
+        applied = migrate.upgrade(conn)
+        assert applied == [name for _, name, _ in migrate.MIGRATIONS]
+        assert migrate.is_current(migrate.read_state(conn))
+
+        assert conn.execute("SELECT total_cost_cents, version FROM procurement_requests").fetchone() == (1250, 1)
+        assert conn.execute("SELECT unit_price_cents, product FROM order_lines").fetchone() == (625, None)
+        assert conn.execute("SELECT COUNT(*) FROM commodity_groups").fetchone()[0] == 50
+        fks = conn.execute("PRAGMA foreign_key_list(order_lines)").fetchall()
+        assert fks[0][6] == "CASCADE"
+
+        assert migrate.upgrade(conn) == []
+    finally:
+        conn.close()
+
+
+def test_changed_seed_data_is_reseeded(tmp_path, monkeypatch):
+    path = tmp_path / "fresh.db"
+    monkeypatch.setattr(migrate, "engine", create_engine(f"sqlite:///{path}"))
+    migrate.init_db()
+
+    monkeypatch.setattr(migrate, "COMMODITY_GROUPS", migrate.COMMODITY_GROUPS + [("051", "Test", "New group")])
+    conn = migrate._connect()
+    try:
+        assert not migrate.is_current(migrate.read_state(conn))
+    finally:
+        conn.close()
+    migrate.init_db()
+
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT name FROM commodity_groups WHERE id = '051'").fetchone() == ("New group",)
+    conn.close()
+
+
+def test_concurrent_workers_upgrade_once(tmp_path, monkeypatch):
+    path = tmp_path / "legacy.db"
+    conn = sqlite3.connect(path)
+    conn.executescript(LEGACY_SCHEMA)
+    conn.close()
+    monkeypatch.setattr(migrate, "engine", create_engine(f"sqlite:///{path}"))
+
+    upgrade = migrate.upgrade
+    runs = []
+
+    def slow_upgrade(conn):
+        runs.append(threading.get_ident())
+        time.sleep(0.2)  # long enough for the other worker to find the database outdated
+        return upgrade(conn)
+
+    monkeypatch.setattr(migrate, "upgrade", slow_upgrade)
+    workers = [threading.Thread(target=migrate.init_db) for _ in range(3)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(30)
+
+    assert len(runs) == 1
+    conn = migrate._connect()
+    try:
+        assert migrate.is_current(migrate.read_state(conn))
+    finally:
+        conn.close()
+
+
+def test_upgrade_fills_new_rollup_tables_from_existing_requests(tmp_path, monkeypatch):
+    path = tmp_path / "legacy.db"
+    conn = sqlite3.connect(path)
+    conn.executescript(LEGACY_SCHEMA)
+    conn.executescript("""
+    INSERT INTO procurement_requests (id, requestor_name, title, department, vendor_name, total_cost, current_status)
+    VALUES (2, 'Legacy', 'Closed PO', 'IT', 'Vendor L', 100, 'Closed');
+    INSERT INTO order_lines (request_id, description, unit_price, amount, total_price) VALUES (2, 'Desk', 100, 1, 100);
+    INSERT INTO status_events (request_id, from_status, to_status) VALUES (2, NULL, 'Open');
+    INSERT INTO status_events (request_id, from_status, to_status) VALUES (2, 'Open', 'Closed');
+    """)
+    conn.close()
+    monkeypatch.setattr(migrate, "engine", create_engine(f"sqlite:///{path}"))
+
+    conn = migrate._connect()
+    try:
+        migrate.upgrade(conn)
+        counts = dict(conn.execute("SELECT status, count FROM status_counts WHERE department = 'IT'").fetchall())
+        assert counts == {"Open": 1, "Closed": 1}
+        spend = conn.execute("SELECT SUM(request_count), SUM(total_cost_cents) FROM spend_rollups").fetchone()
+        assert spend == (2, 11250)
+        assert conn.execute("SELECT SUM(count) FROM status_throughput").fetchone()[0] == 3
+    finally:
+        conn.close()
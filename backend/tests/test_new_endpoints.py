@@ -8,7 +8,8 @@ client = TestClient(app)
 def test_predict_commodity_group():
     """Test the predict commodity group endpoint."""
     # Mock the OpenAI client
-    with patch('app.services.commodity.client') as mock_client:
+    with patch('app.services.llm.get_client') as get_client:
+        mock_client = get_client.return_value
         # Create a mock response
         mock_response = MagicMock()
         mock_response.choices = [MagicMock()]
@@ -63,7 +64,8 @@ def test_delete_all_requests():
 def test_chat_endpoint():
     """Test the chat endpoint."""
     # Mock the OpenAI client
-    with patch('app.routers.chat.client') as mock_client:
+    with patch('app.services.llm.get_client') as get_client:
+        mock_client = get_client.return_value
         # Create a mock response
         mock_response = MagicMock()
         mock_response.choices = [MagicMock()]
@@ -85,7 +87,7 @@ def test_chat_endpoint():
 
 def test_chat_endpoint_no_api_key():
     """Test the chat endpoint when OpenAI is not configured."""
-    with patch('app.routers.chat.client', None):
+    with patch('app.services.llm.get_client', return_value=None):
         response = client.post(
             "/chat",
             json={"message": "Hello"}
@@ -0,0 +1,110 @@
+from decimal import Decimal
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+from app.routers.requests import extract_text_from_pdf
+from app.services import offer_rules
+from app.services.extractor import ExtractedOrderLine, extract_offer_text, partial_extraction_model
+from benchmarks.ingestion import load_golden, score
+
+PDF_OFFER = Path("samples/12_AN-4120-Kdnr-14918.pdf")
+TXT_OFFER = Path("samples/2_Offer.txt")
+
+TABLE_OFFER = """ACME Büromöbel GmbH | Werkstr. 1 | 12345 Berlin
+Angebot 77
+Pos. | Bezeichnung | Menge | Einheit | Preis/Einh € | Rabatt | Gesamt €
+1 | Bürostuhl Ergo | 4 | Stk. | 250,00 | -10,00% | 900,00
+2 | Schreibtisch 160x80 | 2 | Stk. | 480,00 |  | 960,00
+Nettosumme 1.860,00 €
+Umsatzsteuer 19% 353,40 €
+Gesamtsumme 2.213,40 €
+USt-IdNr.: DE123456789
+"""
+
+
+def _scored(extraction, path):
+    return score(extraction.model_dump(mode="json"), load_golden(path))
+
+
+def test_german_pdf_offer_is_fully_resolved():
+    pre = offer_rules.pre_extract(extract_text_from_pdf(str(PDF_OFFER)))
+
+    assert pre.complete
+    extraction = pre.extraction()
+    assert all(_scored(extraction, PDF_OFFER).values())
+    assert extraction.order_lines[0].product == "Moosbild Mix-Moos 160x80 cm"
+    assert extraction.order_lines[0].unit_price == Decimal("894.08")  # before the 20% discount
+    assert "vertikal" not in " ".join(line.product for line in extraction.order_lines)  # alternative position
+
+
+def test_product_blocks_and_pipe_tables_are_parsed():
+    pre = offer_rules.pre_extract(TXT_OFFER.read_text())
+    assert pre.complete
+    assert all(_scored(pre.extraction(), TXT_OFFER).values())
+
+    pre = offer_rules.pre_extract(TABLE_OFFER)
+    assert pre.complete
+    assert pre.values["vendor_name"] == "ACME Büromöbel GmbH"
+    assert pre.values["total_cost"] == Decimal("1860.00")
+    assert [(line.product, line.amount, line.total_price) for line in pre.values["order_lines"]] == [
+        ("Bürostuhl Ergo", 4, Decimal("900.00")),
+        ("Schreibtisch 160x80", 2, Decimal("960.00")),
+    ]
+
+
+TWO_PAGE_OFFER = """ACME Büromöbel GmbH | Werkstr. 1 | 12345 Berlin
+Pos. | Bezeichnung | Menge | Einheit | Preis/Einh € | Gesamt €
+1 | Rollcontainer | 1 | Stk. | 100,00 | 100,00
+Zwischensumme 100,00 €
+
+Pos. | Bezeichnung | Menge | Einheit | Preis/Einh € | Gesamt €
+2 | Garderobe | 1 | Stk. | 100,00 | 100,00
+Nettosumme 200,00 €
+"""
+
+
+def test_page_subtotal_is_not_taken_for_the_net_total():
+    pre = offer_rules.pre_extract(TWO_PAGE_OFFER)
+    assert pre.values["total_cost"] == Decimal("200.00")
+    assert [line.product for line in pre.values["order_lines"]] == ["Rollcontainer", "Garderobe"]
+
+    # without an explicit net total the last subtotal stands in for it
+    pre = offer_rules.pre_extract(TWO_PAGE_OFFER.replace("Nettosumme 200,00", "Zwischensumme 200,00"))
+    assert pre.values["total_cost"] == Decimal("200.00")
+
+
+def test_lines_that_do_not_add_up_stay_unresolved():
+    pre = offer_rules.pre_extract(TABLE_OFFER.replace("Nettosumme 1.860,00", "Nettosumme 1.990,00"))
+    assert pre.missing == ["order_lines"]
+
+
+def test_complete_offers_skip_the_llm():
+    with patch("app.services.llm.get_client") as get_client:
+        extraction = extract_offer_text(TXT_OFFER.read_text())
+
+    get_client.assert_not_called()
+    assert extraction.vendor_name == "Global Tech Solutions"
+    assert extraction.title == "Procurement Order from Global Tech Solutions"
+
+
+def test_llm_is_asked_only_for_unresolved_fields():
+    text = TABLE_OFFER.replace("ACME Büromöbel GmbH | Werkstr. 1 | 12345 Berlin", "Werkstr. 1, 12345 Berlin")
+    text = text.replace("Nettosumme", "Lieferung frei Haus, Montage nach Absprache.\n" * 60 + "Nettosumme")
+    text += "Mit freundlichen Grüßen\nIhr Team von Sitzwerk\n"
+    model = partial_extraction_model(("vendor_name",))
+    fake = MagicMock()
+    fake.chat.completions.parse.return_value.choices[0].message.parsed = model(vendor_name="Sitzwerk")
+
+    with patch("app.services.llm.get_client", return_value=fake):
+        extraction = extract_offer_text(text)
+
+    kwargs = fake.chat.completions.parse.call_args.kwargs
+    prompt = kwargs["messages"][1]["content"]
+    assert kwargs["response_format"] is model
+    assert "Return only: vendor_name." in prompt
+    assert prompt.count("Montage nach Absprache") < 20  # only the spans the vendor is looked for in
+    assert len(prompt) < len(text) / 2
+    assert extraction.vendor_name == "Sitzwerk"
+    assert extraction.vendor_vat_id == "DE123456789"
+    assert len(extraction.order_lines) == 2
+    assert isinstance(extraction.order_lines[0], ExtractedOrderLine)
@@ -0,0 +1,103 @@
+import pstats
+import uuid
+from decimal import Decimal
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import profiling
+from app.services.extractor import ExtractedOrderLine, OfferExtraction
+
+client = TestClient(app)
+
+EXTRACTION = OfferExtraction(
+    title="Profiled offer",
+    vendor_name="Profile GmbH",
+    vendor_vat_id=None,
+    department=None,
+    order_lines=[
+        ExtractedOrderLine(
+            product="Widget", description="Widget", unit_price=Decimal("5.00"),
+            amount=2, unit="pcs", total_price=Decimal("10.00"),
+        ),
+    ],
+    total_cost=Decimal("10.00"),
+)
+
+
+@pytest.fixture
+def profiling_enabled(monkeypatch, tmp_path):
+    monkeypatch.setattr(profiling, "PROFILING_TOKEN", "secret")
+    monkeypatch.setattr(profiling, "PROFILE_DIR", tmp_path)
+    return tmp_path
+
+
+def _upload(headers=None):
+    with patch("app.routers.requests.extract_offer_text", return_value=EXTRACTION), \
+         patch("app.routers.requests.predict_commodity_group_id", return_value="031"):
+        return client.post(
+            "/requests/create-from-offer",
+            files={"file": ("offer.txt", b"Widget offer", "text/plain")},
+            headers=headers or {},
+        )
+
+
+def test_profile_is_stored_when_token_matches(profiling_enabled):
+    r = _upload({"X-Profile-Token": "secret"})
+    assert r.status_code == 200
+
+    path = profiling_enabled / r.headers["x-profile"]
+    stats = pstats.Stats(str(path))
+    assert any(function == "_create_from_offer" for _, _, function in stats.stats)
+
+
+def test_no_profile_without_header(profiling_enabled):
+    r = _upload()
+    assert r.status_code == 200
+    assert "x-profile" not in r.headers
+    assert list(profiling_enabled.iterdir()) == []
+
+
+def test_wrong_token_is_rejected(profiling_enabled):
+    assert _upload({"X-Profile-Token": "guess"}).status_code == 403
+
+
+def test_wrong_token_does_not_claim_the_idempotency_key(profiling_enabled):
+    from app import models
+    from app.db import SessionLocal
+
+    key = uuid.uuid4().hex
+    assert _upload({"X-Profile-Token": "guess", "Idempotency-Key": key}).status_code == 403
+    with SessionLocal() as db:
+        assert db.query(models.IdempotencyKey).filter_by(key=key).count() == 0
+
+    r = _upload({"Idempotency-Key": key})
+    assert r.status_code == 200
+    assert "idempotent-replayed" not in r.headers
+
+
+def test_profiling_disabled_without_admin_setting(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILING_TOKEN", "")
+    assert _upload({"X-Profile-Token": ""}).status_code == 403
+
+
+def test_extract_offer_can_be_profiled(profiling_enabled):
+    r = client.post("/requests", json={
+        "requestor_name": "Profiler",
+        "title": "Draft",
+        "department": "Profiling",
+        "vendor_name": "Unknown",
+        "order_lines": [{"description": "Thing", "unit_price": 1, "amount": 1}],
+    })
+    request_id = r.json()["id"]
+    client.post(f"/requests/{request_id}/upload-offer", files={"file": ("offer.txt", b"Widget offer", "text/plain")})
+
+    with patch("app.routers.requests.extract_offer_text", return_value=EXTRACTION), \
+         patch("app.routers.requests.predict_commodity_group_id", return_value="031"):
+        r = client.post(f"/requests/{request_id}/extract-offer", headers={"X-Profile-Token": "secret"})
+
+    assert r.status_code == 200
+    assert r.json()["vendor_name"] == "Profile GmbH"
+    assert (profiling_enabled / r.headers["x-profile"]).exists()
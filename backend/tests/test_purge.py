@@ -0,0 +1,109 @@
+import os
+import time
+import uuid
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+from app.main import app
+
+client = TestClient(app)
+
+
+def _create(department):
+    r = client.post("/requests", json={
+        "requestor_name": "Purge Tester",
+        "title": "Desks",
+        "department": department,
+        "vendor_name": "Vendor P",
+        "order_lines": [{"description": "Desk", "unit_price": 250, "amount": 2}],
+    })
+    assert r.status_code == 200
+    return r.json()
+
+
+def _orphans(db):
+    return {
+        table: db.execute(
+            text(f"SELECT COUNT(*) FROM {table} WHERE request_id NOT IN (SELECT id FROM procurement_requests)")
+        ).scalar()
+        for table in ("order_lines", "attachments", "status_events")
+    }
+
+
+def test_foreign_keys_are_enforced():
+    from app.db import SessionLocal
+
+    with SessionLocal() as db:
+        assert db.execute(text("PRAGMA foreign_keys")).scalar() == 1
+
+
+def test_purge_cascades_to_children_in_chunks():
+    from app.db import SessionLocal
+    from app.services import bulk
+    from app import models
+
+    department = f"Dept-{uuid.uuid4().hex[:8]}"
+    ids = [_create(department)["id"] for _ in range(5)]
+    client.post(f"/requests/{ids[0]}/upload-offer", files={"file": ("purge.txt", b"offer", "text/plain")})
+
+    with SessionLocal() as db:
+        deleted = bulk.purge_requests(db, [models.ProcurementRequest.department == department], chunk_size=2)
+        assert deleted == 5
+        assert _orphans(db) == {"order_lines": 0, "attachments": 0, "status_events": 0}
+        assert db.query(models.ProcurementRequest).filter_by(department=department).count() == 0
+
+    counts = client.get("/requests/counts", params={"by_department": True}).json()
+    assert department not in counts["by_department"]
+    assert client.get("/analytics/spend", params={"department": department}).json() == []
+
+
+def test_delete_all_keeps_metrics_of_requests_created_during_the_purge():
+    from app.db import SessionLocal
+    from app.services import bulk, rollups
+    from app import models
+
+    department = f"Dept-{uuid.uuid4().hex[:8]}"
+    purge = bulk.purge_requests
+
+    def purge_racing_a_create(db, *args, **kwargs):
+        deleted = purge(db, *args, **kwargs)
+        _create(department)  # committed after the last chunk
+        return deleted
+
+    with patch("app.routers.requests.bulk.purge_requests", side_effect=purge_racing_a_create):
+        assert client.delete("/requests").status_code == 200
+
+    counts = client.get("/requests/counts", params={"by_department": True}).json()
+    assert counts["by_department"][department]["Open"] == 1
+    with SessionLocal() as db:
+        assert rollups.check(db) == {"spend": [], "status_counts": []}
+        assert db.query(models.StatusThroughput).filter_by(department=department).count() == 1
+
+
+def test_collect_garbage_removes_only_old_unreferenced_files(tmp_path):
+    from app.db import SessionLocal
+    from app.services import uploads
+    from app import models
+
+    req = _create(f"Dept-{uuid.uuid4().hex[:8]}")
+    referenced = tmp_path / f"{req['id']}_kept.pdf"
+    orphaned = tmp_path / "999999_orphan.pdf"
+    fresh = tmp_path / "999999_fresh.pdf"
+    for path in (referenced, orphaned, fresh):
+        path.write_bytes(b"%PDF")
+    old = time.time() - 2 * 3600
+    for path in (referenced, orphaned):
+        os.utime(path, (old, old))
+
+    with SessionLocal() as db:
+        db.add(models.Attachment(request_id=req["id"], filename="kept.pdf", path=str(referenced)))
+        db.commit()
+
+        assert uploads.collect_garbage(db, tmp_path, min_age=3600, dry_run=True) == [orphaned]
+        assert orphaned.exists()
+        assert uploads.collect_garbage(db, tmp_path, min_age=3600) == [orphaned]
+
+    assert not orphaned.exists()
+    assert referenced.exists() and fresh.exists()
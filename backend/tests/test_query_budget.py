@@ -0,0 +1,55 @@
+import uuid
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+from app.main import app
+
+client = TestClient(app)
+
+
+def _create_many(department, count=6):
+    for i in range(count):
+        r = client.post("/requests", json={
+            "requestor_name": "Budget Tester",
+            "title": f"Item {i}",
+            "department": department,
+            "vendor_name": "Vendor Q",
+            "order_lines": [{"description": "Thing", "unit_price": 10, "amount": 1}],
+        })
+        client.post(f"/requests/{r.json()['id']}/commodity-group", json={"commodity_group_id": "031"})
+
+
+def test_responses_report_query_count_and_time():
+    r = client.get("/requests/counts")
+    assert int(r.headers["x-db-query-count"]) >= 1
+    assert float(r.headers["x-db-time-ms"]) >= 0
+
+
+def test_list_requests_query_count_is_independent_of_row_count(query_budget):
+    department = f"Dept-{uuid.uuid4().hex[:8]}"
+    _create_many(department)
+    with query_budget(4):
+        r = client.get("/requests", params={"department": department})
+    assert len(r.json()) == 6
+    assert all(item["commodity_group"]["id"] == "031" for item in r.json())
+
+
+def test_chat_context_is_built_with_one_query(query_budget):
+    _create_many(f"Dept-{uuid.uuid4().hex[:8]}")
+    with patch("app.services.llm.get_client") as get_client:
+        get_client.return_value.chat.completions.create.return_value.choices[0].message.content = "Hi"
+        with query_budget(1):
+            r = client.post("/chat", json={"message": "Which requests use software?"})
+    assert r.status_code == 200
+    system_prompt = get_client.return_value.chat.completions.create.call_args.kwargs["messages"][0]["content"]
+    assert "Commodity Group: Software" in system_prompt
+
+
+def test_detector_flags_lazy_loads_in_a_loop():
+    from app.services.query_stats import QueryStats
+
+    stats = QueryStats()
+    for request_id in range(5):
+        stats.record("SELECT * FROM order_lines WHERE ? = order_lines.request_id", (request_id,), 0.0)
+    stats.record("SELECT * FROM procurement_requests WHERE id > ? LIMIT ?", (0, 500), 0.0, batched=True)
+    assert stats.repeated(3) == [("SELECT * FROM order_lines WHERE ? = order_lines.request_id", 5)]
@@ -137,3 +137,31 @@ def test_create_from_offer_unsupported_file_type():
     )
     assert r.status_code == 400
     assert "Supported offer types" in r.json()["detail"]
+
+
+def test_money_is_stored_as_cents_and_returned_as_decimal_strings():
+    """Money columns hold integer cents in SQLite but the API keeps returning two-place decimals."""
+    from sqlalchemy import text
+    from app.db import SessionLocal
+
+    payload = {
+        "requestor_name": "Jane Doe",
+        "title": "Monitor Arms",
+        "department": "IT",
+        "vendor_name": "Vendor Y",
+        "order_lines": [
+            {"description": "Monitor arm", "unit_price": "19.99", "amount": 3, "unit": "pcs"},
+            {"description": "Cable kit", "unit_price": 5.5, "amount": 2},
+        ],
+    }
+    data = client.post("/requests", json=payload).json()
+    assert data["total_cost"] == "70.97"
+    assert data["currency"] == "EUR"
+    assert data["order_lines"][0]["unit_price"] == "19.99"
+    assert data["order_lines"][0]["total_price"] == "59.97"
+
+    with SessionLocal() as db:
+        stored = db.execute(
+            text("SELECT total_cost_cents FROM procurement_requests WHERE id = :id"), {"id": data["id"]}
+        ).scalar_one()
+    assert stored == 7097
@@ -0,0 +1,59 @@
+import uuid
+from datetime import timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+
+pa = pytest.importorskip("pyarrow")
+import pyarrow.parquet as pq  # noqa: E402
+
+client = TestClient(app)
+
+
+def _create(department):
+    payload = {
+        "requestor_name": "Analyst",
+        "title": "Snapshot Test",
+        "department": department,
+        "vendor_name": "Vendor S",
+        "order_lines": [{"description": "Item", "unit_price": "12.34", "amount": 2}],
+    }
+    return client.post("/requests", json=payload).json()
+
+
+def test_snapshot_endpoint_streams_arrow_with_cents():
+    department = f"Dept-{uuid.uuid4().hex[:8]}"
+    created = _create(department)
+
+    r = client.get("/analytics/snapshot/procurement_requests", params={"format": "arrow"})
+    assert r.status_code == 200
+    table = pa.ipc.open_stream(r.content).read_all()
+    rows = [row for row in table.to_pylist() if row["department"] == department]
+    assert [row["id"] for row in rows] == [created["id"]]
+    assert rows[0]["total_cost_cents"] == 2468
+
+
+def test_incremental_snapshot_only_contains_changes(tmp_path):
+    from app.services import snapshot
+
+    _create(f"Dept-{uuid.uuid4().hex[:8]}")
+    full = snapshot.write_snapshot(tmp_path, fmt="parquet")
+    assert full["since"] is None
+    assert full["tables"]["procurement_requests"]["rows"] >= 1
+
+    # rewind the watermark so the next snapshot covers the request changed below
+    latest = tmp_path / "latest.json"
+    watermark = snapshot.utcnow().replace(microsecond=0)
+    latest.write_text(f'{{"watermark": "{watermark.isoformat()}"}}')
+    changed = _create(f"Dept-{uuid.uuid4().hex[:8]}")
+    client.post(f"/requests/{changed['id']}/status", json={"to_status": "Closed"})
+
+    incremental = snapshot.write_snapshot(tmp_path, fmt="parquet", incremental=True)
+    assert incremental["since"] == watermark.isoformat()
+    snapshot_dir = tmp_path / incremental["watermark"].replace("-", "").replace(":", "")
+    requests = pq.read_table(snapshot_dir / "procurement_requests.parquet").to_pylist()
+    assert changed["id"] in [row["id"] for row in requests]
+    assert all(row["updated_at"].replace(tzinfo=None) >= watermark - timedelta(seconds=1) for row in requests)
+    events = pq.read_table(snapshot_dir / "status_events.parquet").to_pylist()
+    assert {"Open", "Closed"} <= {row["to_status"] for row in events if row["request_id"] == changed["id"]}
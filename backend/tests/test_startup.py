@@ -0,0 +1,64 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).parent.parent
+
+# Default check, independent of the machine: `import app.main` may take at most this multiple of
+# importing the frameworks it is built on. Importing openai eagerly alone roughly doubles it.
+IMPORT_RATIO_LIMIT = 1.75
+FRAMEWORK_IMPORTS = "import fastapi, fastapi.testclient, sqlalchemy.orm"
+
+# Opt-in wall-clock budget (seconds) for `import app.main` in a fresh interpreter. FastAPI and
+# SQLAlchemy alone take most of a second, so only set it on hardware with a known baseline.
+IMPORT_BUDGET_SECONDS = float(os.getenv("STARTUP_IMPORT_BUDGET", "0"))
+
+# Imported on first use only (LLM calls, PDF offers, columnar snapshots).
+HEAVY_MODULES = ["openai", "pdfplumber", "pyarrow"]
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+{imports}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def _probe(imports="import app.main"):
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE.format(imports=imports, heavy=HEAVY_MODULES)],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def _best_of_three(imports="import app.main"):
+    # keeps scheduler noise out of the measurement
+    return min(_probe(imports)["seconds"] for _ in range(3))
+
+
+def test_app_import_does_not_load_heavy_dependencies():
+    assert _probe()["loaded"] == []
+
+
+def test_app_import_is_close_to_its_frameworks():
+    frameworks = _best_of_three(FRAMEWORK_IMPORTS)
+    seconds = _best_of_three()
+    assert seconds < IMPORT_RATIO_LIMIT * frameworks, (
+        f"import app.main took {seconds:.3f}s, {seconds / frameworks:.2f}x the {frameworks:.3f}s of "
+        f"{FRAMEWORK_IMPORTS!r} (limit {IMPORT_RATIO_LIMIT}x)"
+    )
+
+
+@pytest.mark.skipif(not IMPORT_BUDGET_SECONDS, reason="set STARTUP_IMPORT_BUDGET to check the import time")
+def test_app_import_within_budget():
+    seconds = _best_of_three()
+    assert seconds < IMPORT_BUDGET_SECONDS, f"import app.main took {seconds:.3f}s (budget {IMPORT_BUDGET_SECONDS}s)"
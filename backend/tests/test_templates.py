@@ -0,0 +1,198 @@
+import json
+import random
+import sqlite3
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+
+from fastapi.testclient import TestClient
+
+from app.db import SessionLocal
+from app.main import app
+from app.services import offer_rules, templates
+from app.services.extractor import ExtractedOrderLine, OfferExtraction, partial_extraction_model
+
+client = TestClient(app)
+
+# a layout the generic rules can't read: unknown total label, no position numbers, no vendor line with "|"
+OFFER = """Sitzwerk Möbelmanufaktur {suffix} - Holzweg 3 - 70173 Stuttgart
+An: {customer}, Agnes-Pockels-Bogen 1, 80992 München
+Angebot Nr. {number} vom 02.03.2026
+
+Artikel                        Anz.   Stückpreis      Betrag
+{rows}
+
+Angebotssumme (netto): {total} EUR
+zzgl. 19% MwSt.
+USt-IdNr. {vat_id}
+"""
+
+
+def _offer(vat_id, suffix, rows, total, customer="Lio Technologies GmbH", number=311):
+    return OFFER.format(vat_id=vat_id, suffix=suffix, rows="\n".join(rows), total=total, customer=customer, number=number)
+
+
+def _vendor():
+    return f"DE{random.randint(100_000_000, 999_999_999)}", f"{random.randint(0, 10**6):06d}"
+
+
+def _confirmed_extraction(suffix):
+    return OfferExtraction(
+        title="Office Chairs and Desks",
+        vendor_name=f"Sitzwerk Möbelmanufaktur {suffix}",
+        order_lines=[
+            ExtractedOrderLine(product="Bürostuhl Ergo", unit_price=Decimal("250.00"), amount=4, total_price=Decimal("1000.00")),
+            ExtractedOrderLine(product="Schreibtisch Eiche 160x80", unit_price=Decimal("480.00"), amount=2, total_price=Decimal("960.00")),
+        ],
+        total_cost=Decimal("1960.00"),
+    )
+
+
+FIRST_ROWS = [
+    "Bürostuhl Ergo                 4 x    250,00          1.000,00",
+    "Schreibtisch Eiche 160x80      2 x    480,00            960,00",
+]
+
+
+def test_learned_template_reads_the_vendors_layout():
+    vat_id, suffix = _vendor()
+    text = _offer(vat_id, suffix, FIRST_ROWS, "1.960,00")
+    assert offer_rules.pre_extract(text).missing == ["vendor_name", "total_cost", "order_lines"]
+
+    content = templates.learn_content(text, _confirmed_extraction(suffix))
+    assert content["labels"] == {"total_cost": "Angebotssumme (netto)"}
+    assert "line_pattern" in content
+
+    later = _offer(vat_id, suffix, ["Rollcontainer 3 x 150,00 450,00", "Garderobe 1 x 89,90 89,90"], "539,90")
+    template = {"vendor_name": f"Sitzwerk Möbelmanufaktur {suffix}", "vendor_vat_id": vat_id, **content}
+    pre = offer_rules.pre_extract(later, template)
+    assert pre.complete
+    assert pre.values["total_cost"] == Decimal("539.90")
+    assert [(line.product, line.amount, line.unit_price) for line in pre.values["order_lines"]] == [
+        ("Rollcontainer", 3, Decimal("150.00")),
+        ("Garderobe", 1, Decimal("89.90")),
+    ]
+
+
+def test_degraded_or_unreconciled_extractions_are_not_learned():
+    vat_id, suffix = _vendor()
+    text = _offer(vat_id, suffix, FIRST_ROWS, "1.960,00")
+    extraction = _confirmed_extraction(suffix)
+    extraction.total_cost = Decimal("2000.00")
+    assert not templates.confirmed(extraction)
+
+    extraction = _confirmed_extraction(suffix)
+    extraction._source = "degraded"
+    with SessionLocal() as db:
+        assert templates.learn(db, text, extraction) is None
+
+
+def test_fingerprint_lookup_needs_the_vendor_name_in_the_text():
+    _, suffix = _vendor()
+    extraction = _confirmed_extraction(suffix)
+    text = _offer("", suffix, FIRST_ROWS, "1.960,00")
+    with SessionLocal() as db:
+        learned = templates.learn(db, text, extraction)
+        db.commit()
+        assert learned.vendor_vat_id is None
+
+        other_customer = _offer("", suffix, FIRST_ROWS, "1.960,00", customer="Other Customer AG", number=999)
+        assert templates.find(db, other_customer).id == learned.id
+        assert templates.find(db, other_customer.replace(f"Möbelmanufaktur {suffix} -", "-")) is None
+
+
+def test_repeat_offers_from_a_vendor_skip_the_llm():
+    vat_id, suffix = _vendor()
+    fields = ("vendor_name", "total_cost", "order_lines", "title", "department")
+    confirmed = _confirmed_extraction(suffix)
+    fake = MagicMock()
+    fake.chat.completions.parse.return_value.choices[0].message.parsed = partial_extraction_model(fields)(
+        **{name: getattr(confirmed, name) for name in fields}
+    )
+
+    first = _offer(vat_id, suffix, FIRST_ROWS, "1.960,00").encode()
+    later = _offer(vat_id, suffix, ["Rollcontainer 3 x 150,00 450,00"], "450,00", number=412).encode()
+    with patch("app.services.llm.get_client", return_value=fake), \
+         patch("app.routers.requests.predict_commodity_group_id", return_value="015"):
+        r1 = client.post("/requests/create-from-offer", files={"file": ("offer.txt", first, "text/plain")})
+        r2 = client.post("/requests/create-from-offer", files={"file": ("offer.txt", later, "text/plain")})
+
+    assert r1.status_code == r2.status_code == 200
+    assert fake.chat.completions.parse.call_count == 1
+    assert r2.json()["vendor_name"] == f"Sitzwerk Möbelmanufaktur {suffix}"
+    assert r2.json()["vendor_vat_id"] == vat_id
+    assert r2.json()["total_cost"] == "450.00"
+    assert [line["product"] for line in r2.json()["order_lines"]] == ["Rollcontainer"]
+
+    with SessionLocal() as db:
+        template = templates.find(db, later.decode())
+        assert template.confirmations == 2
+        assert json.loads(template.content)["labels"]["total_cost"] == "Angebotssumme (netto)"
+
+
+def test_vat_id_lookup_ignores_unlabelled_ids_and_needs_the_vendor_name():
+    vat_id, suffix = _vendor()
+    extraction = _confirmed_extraction(suffix)
+    extraction.vendor_vat_id = vat_id
+    with SessionLocal() as db:
+        assert templates.learn(db, _offer(vat_id, suffix, FIRST_ROWS, "1.960,00"), extraction).vendor_vat_id == vat_id
+        db.commit()
+
+        other_vendor = _offer("DE111111111", f"{suffix}-Konkurrenz", FIRST_ROWS, "1.960,00").replace(
+            f"Sitzwerk Möbelmanufaktur {suffix}-Konkurrenz", "Stuhlfabrik Nord"
+        )
+        quoted = other_vendor + f"Referenz Rahmenvertrag {vat_id}\n"
+        assert templates.find(db, quoted) is None
+
+        labelled_buyer_id = other_vendor + f"Ihre USt-IdNr.: {vat_id}\n"
+        assert templates.find(db, labelled_buyer_id) is None
+        assert templates.find(db, _offer(vat_id, suffix, FIRST_ROWS, "99,00", number=5)).vendor_vat_id == vat_id
+
+
+def test_learning_is_undone_with_the_callers_transaction():
+    vat_id, suffix = _vendor()
+    extraction = _confirmed_extraction(suffix)
+    extraction.vendor_vat_id = vat_id
+    text = _offer(vat_id, suffix, FIRST_ROWS, "1.960,00")
+    with SessionLocal() as db:
+        assert templates.learn(db, text, extraction).confirmations == 1
+        db.rollback()
+        assert templates.find(db, text) is None
+
+        templates.learn(db, text, extraction)
+        db.commit()
+        assert templates.learn(db, text, extraction).confirmations == 2
+        db.commit()
+        assert templates.find(db, text).confirmations == 2
+
+
+def test_other_writers_are_not_blocked_during_commodity_prediction():
+    from app.db import engine
+
+    vat_id, suffix = _vendor()
+    text = _offer(vat_id, suffix, FIRST_ROWS, "1.960,00")
+    extraction = _confirmed_extraction(suffix)
+    extraction.vendor_vat_id = vat_id
+    writes = []
+
+    def predict_while_another_worker_writes(**kwargs):
+        conn = sqlite3.connect(engine.url.database, timeout=0.2)
+        try:
+            with conn:
+                conn.execute("UPDATE commodity_groups SET name = name WHERE id = '015'")
+            writes.append("ok")
+        except sqlite3.OperationalError as e:  # "database is locked"
+            writes.append(str(e))
+        finally:
+            conn.close()
+        return "015"
+
+    with patch("app.routers.requests.extract_offer_text", return_value=extraction), \
+         patch("app.routers.requests.predict_commodity_group_id", side_effect=predict_while_another_worker_writes):
+        created = client.post("/requests/create-from-offer", files={"file": ("offer.txt", text.encode(), "text/plain")})
+        request_id = created.json()["id"]
+        extracted = client.post(f"/requests/{request_id}/extract-offer")
+
+    assert created.status_code == extracted.status_code == 200
+    assert writes == ["ok", "ok"]
+    with SessionLocal() as db:
+        assert templates.find(db, text).confirmations == 2